@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Compares the CSV serialization engine with the str.format templates that
+were used before it. Run it with::
+
+  PYTHONPATH=. python benchmarks/bench_csv.py [row_count]
+"""
+
+import sys
+import time
+
+
+legacy_formats = {
+    'ShutterStock': '{filename},"{description}","{keywords}","{category1},'
+                    '{category2}",{editorial}',
+    'AdobeStock': '{filename},"{title}","{keywords}",{category},"{releases}"',
+    'GettyImages': '{filename},"{description}",{country},"{title}",'
+                   '"{keywords}",{poster_timecode}',
+}
+
+
+def legacy_shutter_stock_row(s, template=legacy_formats['ShutterStock']):
+    return template.format(
+        filename=s.filename, description=s.description,
+        keywords=','.join(s.keywords), category1=s.category1,
+        category2=s.category2, editorial='yes' if s.editorial else 'no'
+    )
+
+
+def legacy_adobe_stock_row(s, template=legacy_formats['AdobeStock']):
+    return template.format(
+        filename=s.filename, title=s.title,
+        category=s.category_dict[s.category],
+        keywords=','.join(s.keywords), releases=','.join(s.releases)
+    )
+
+
+def legacy_getty_images_row(s, template=legacy_formats['GettyImages']):
+    return template.format(
+        filename=s.filename, description=s.description, country=s.country,
+        title=s.title, keywords=','.join(s.keywords),
+        poster_timecode=s.poster_timecode
+    )
+
+
+def create_stocks(count):
+    from stocker.models import GenericStock, ShutterStock, AdobeStock, \
+        GettyImages
+    gst = GenericStock(
+        filename='clip_000001.mov', title='A drone shot of the Bosphorus',
+        description='A drone shot of the Bosphorus bridge at sunset',
+        category1='Transportation', category2='Holidays',
+        keywords=['drone', 'bridge', 'sunset', 'istanbul', 'city', 'sea'] * 4,
+        country='Turkey'
+    )
+    return [
+        (ShutterStock, [gst.to(ShutterStock)] * count,
+         legacy_shutter_stock_row),
+        (AdobeStock, [gst.to(AdobeStock)] * count, legacy_adobe_stock_row),
+        (GettyImages, [gst.to(GettyImages)] * count,
+         legacy_getty_images_row),
+    ]
+
+
+def main(count=1000000):
+    from stocker.serialization import get_csv_plan
+    for target_class, stocks, legacy_row in create_stocks(count):
+        start = time.perf_counter()
+        '\n'.join([legacy_row(s) for s in stocks])
+        legacy = time.perf_counter() - start
+
+        format_row = get_csv_plan(target_class).format_row
+        start = time.perf_counter()
+        '\n'.join([format_row(s) for s in stocks])
+        engine = time.perf_counter() - start
+
+        print('%-14s %i rows  legacy: %6.3fs  engine: %6.3fs  (%.2fx)' % (
+            target_class.__name__, count, legacy, engine, legacy / engine
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Measures the per record memory usage of the stock classes.
+
+Compares the slotted :class:`stocker.models.GenericStock` with a plain class
+that stores the same attributes in a per instance ``__dict__``. Run it with::
+
+  PYTHONPATH=. python benchmarks/bench_memory.py [record_count]
+"""
+
+import sys
+import tracemalloc
+
+
+class DictGenericStock:
+    """A plain class with the same attributes of GenericStock
+    """
+
+    def __init__(self, filename="", path="", title="", description="",
+                 category1="", category2="", keywords=None, country="",
+                 poster_timecode="00:00:05:00", releases=None,
+                 editorial=False):
+        self.filename = filename
+        self.path = path
+        self.title = title
+        self.keywords = keywords
+        self.description = description
+        self.category1 = category1
+        self.category2 = category2
+        self.country = country
+        self.poster_timecode = poster_timecode
+        self.releases = releases
+        self.editorial = editorial
+
+
+def measure(klass, count):
+    """Returns the memory used by ``count`` instances of the given class in
+    bytes.
+    """
+    # share the attribute values between the records, so only the record
+    # overhead is measured
+    keywords = ['keyword 1', 'keyword 2', 'keyword 3']
+    releases = []
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    records = [
+        klass(filename='clip.mov', path='/path/to/media', title='Title',
+              description='Description', category1='Nature',
+              category2='Holidays', keywords=keywords, country='Turkey',
+              releases=releases)
+        for _ in range(count)
+    ]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del records
+    return used
+
+
+def main(count=100000):
+    from stocker.models import GenericStock
+    results = []
+    for klass in [DictGenericStock, GenericStock]:
+        used = measure(klass, count)
+        results.append(used)
+        print('%-20s %10.1f MB %8.1f bytes/record' % (
+            klass.__name__, used / 1024.0 / 1024.0, used / float(count)
+        ))
+
+    print('saving: %.1f bytes/record (%.0f%%)' % (
+        (results[0] - results[1]) / float(count),
+        100.0 * (results[0] - results[1]) / results[0]
+    ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Times the hot paths of stocker over synthetic catalogs and tracks their
+peak memory usage.
+
+The catalogs are created by :mod:`catalog` on tmpfs. Run the suite with
+pytest-benchmark, the catalog sizes are set with the ``STOCKER_BENCH_SIZES``
+environment variable::
+
+  STOCKER_BENCH_SIZES=1000,100000 PYTHONPATH=. \
+      python -m pytest benchmarks/bench_suite.py --benchmark-save=baseline
+  PYTHONPATH=. python -m pytest benchmarks/bench_suite.py \
+      --benchmark-compare=0001 --benchmark-compare-fail=mean:10%
+
+The peak memory of each phase is stored in the ``extra_info`` of the
+benchmark results. Without pytest-benchmark run it as a script, which runs
+each phase once and prints a table::
+
+  PYTHONPATH=. python benchmarks/bench_suite.py [count]
+"""
+
+import collections
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from catalog import default_root, generate_catalog  # noqa: E402
+
+
+def convert_all(media, target_class):
+    """converts the given media to the given target one by one
+    """
+    return [m.to(target_class) for m in media]
+
+
+def read_all(sidecar_paths):
+    """reads the given sidecar files one by one
+    """
+    from stocker.models import GenericStock
+    media = []
+    for path in sidecar_paths:
+        gst = GenericStock()
+        gst.from_file(path)
+        media.append(gst)
+    return media
+
+
+def write_all(media):
+    """writes the sidecar files of the given media one by one
+    """
+    for m in media:
+        m.to_sidecar_file()
+
+
+def get_phases(path):
+    """Returns the phases to measure for the catalog in the given folder.
+
+    :param str path: The root folder of the catalog.
+    :return: An ordered dict of phase name -> callable.
+    """
+    from stocker.models import StockManager, ShutterStock, AdobeStock, \
+        GettyImages
+    sm = StockManager()
+    sm.discover_media(path, recursive=True)
+    sidecar_paths = [m.sidecar_full_path for m in sm.media]
+
+    phases = collections.OrderedDict()
+    phases['discover_media'] = functools.partial(
+        StockManager().discover_media, path, recursive=True
+    )
+    phases['from_file'] = functools.partial(read_all, sidecar_paths)
+    for target_class in [ShutterStock, AdobeStock, GettyImages]:
+        phases['to_%s' % target_class.__name__] = functools.partial(
+            convert_all, sm.media, target_class
+        )
+    for target_class in [ShutterStock, AdobeStock, GettyImages]:
+        phases['generate_csv_%s' % target_class.__name__] = \
+            functools.partial(sm.generate_csv, target_class)
+    phases['to_sidecar_file'] = functools.partial(write_all, sm.media)
+    return phases
+
+
+phase_names = [
+    'discover_media', 'from_file', 'to_ShutterStock', 'to_AdobeStock',
+    'to_GettyImages', 'generate_csv_ShutterStock', 'generate_csv_AdobeStock',
+    'generate_csv_GettyImages', 'to_sidecar_file',
+]
+
+
+def measure_peak_memory(func):
+    """Runs the given callable once and returns its peak memory usage in
+    bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def get_sizes():
+    """returns the catalog sizes from the STOCKER_BENCH_SIZES environment
+    variable
+    """
+    return [
+        int(size)
+        for size in os.environ.get('STOCKER_BENCH_SIZES', '1000').split(',')
+    ]
+
+
+if __name__ != '__main__':
+    # collected by pytest
+    import pytest
+    pytest.importorskip('pytest_benchmark')
+
+    @pytest.fixture(scope='module', params=get_sizes(),
+                    ids=lambda size: '%i' % size)
+    def catalog_phases(request):
+        """creates a synthetic catalog and returns its phases
+        """
+        path = tempfile.mkdtemp(prefix='stocker_bench_', dir=default_root())
+        try:
+            generate_catalog(path, request.param)
+            yield get_phases(path)
+        finally:
+            shutil.rmtree(path)
+
+    @pytest.mark.parametrize('phase', phase_names)
+    def test_phase(benchmark, catalog_phases, phase):
+        """measures the given phase
+        """
+        func = catalog_phases[phase]
+        benchmark.extra_info['peak_memory'] = measure_peak_memory(func)
+        benchmark.pedantic(func, rounds=3, iterations=1)
+
+
+def main(count=10000):
+    path = tempfile.mkdtemp(prefix='stocker_bench_', dir=default_root())
+    try:
+        start = time.perf_counter()
+        generate_catalog(path, count)
+        print('created %i media in %.2fs' % (
+            count, time.perf_counter() - start
+        ))
+        phases = get_phases(path)
+        print('%-28s %10s %12s' % ('phase', 'seconds', 'peak MB'))
+        for name, func in phases.items():
+            start = time.perf_counter()
+            func()
+            duration = time.perf_counter() - start
+            peak = measure_peak_memory(func)
+            print('%-28s %10.3f %12.1f' % (
+                name, duration, peak / 1024.0 / 1024.0
+            ))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Generates synthetic media and sidecar file trees for the benchmarks.
+
+The media files are empty, the sidecar files have random but reproducible
+titles, descriptions, categories and keywords. The trees are created on
+tmpfs (``/dev/shm``) if it is available, so the disk speed doesn't affect
+the results. Run it with::
+
+  PYTHONPATH=. python benchmarks/catalog.py [count] [path]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+
+
+words = [
+    'aerial', 'autumn', 'beach', 'bridge', 'business', 'city', 'cloud',
+    'coast', 'desert', 'drone', 'family', 'forest', 'green', 'harbor',
+    'highway', 'island', 'lake', 'light', 'mountain', 'night', 'ocean',
+    'office', 'people', 'rain', 'river', 'road', 'sea', 'ship', 'sky', 'snow',
+    'street', 'summer', 'sunrise', 'sunset', 'technology', 'timelapse',
+    'traffic', 'travel', 'tree', 'urban', 'valley', 'water', 'wave', 'winter',
+]
+
+countries = ['Turkey', 'Italy', 'Norway', 'Japan', 'Chile', 'Canada']
+
+
+def default_root():
+    """Returns the folder to create the synthetic trees in, tmpfs if it is
+    available.
+
+    :return str:
+    """
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def sidecar_data(rng):
+    """Returns random sidecar data.
+
+    :param rng: A :class:`random.Random` instance.
+    :return dict:
+    """
+    from stocker.models import GenericStock
+    title = ' '.join(rng.sample(words, 4)).capitalize()
+    return {
+        'title': title,
+        'description': '%s, %s' % (title, ' '.join(rng.sample(words, 8))),
+        'category1': rng.choice(GenericStock.categories),
+        'category2': rng.choice(GenericStock.categories),
+        'keywords': rng.sample(words, rng.randint(10, 40)),
+        'country': rng.choice(countries),
+        'poster_timecode': '00:00:05:00',
+        'releases': [],
+        'editorial': rng.random() < 0.1,
+    }
+
+
+def generate_catalog(path, count, per_folder=1000, seed=0):
+    """Creates ``count`` media and sidecar file pairs in the given folder.
+
+    The pairs are split into sub folders of ``per_folder`` pairs, like
+    ``path/0000/clip_0000000.mov``, so the tree looks like a real ingest
+    folder and no folder gets too big to list.
+
+    :param str path: The root folder, it is created if it doesn't exist.
+    :param int count: The number of media.
+    :param int per_folder: The maximum number of media in a sub folder.
+    :param int seed: The random seed, the same seed creates the same tree.
+    :return list: The full paths of the sidecar files.
+    """
+    rng = random.Random(seed)
+    sidecar_paths = []
+    folder = None
+    for i in range(count):
+        if i % per_folder == 0:
+            folder = os.path.join(path, '%04i' % (i // per_folder))
+            os.makedirs(folder, exist_ok=True)
+        basename = os.path.join(folder, 'clip_%07i' % i)
+        with open('%s.mov' % basename, 'wb'):
+            pass
+        sidecar_path = '%s.json' % basename
+        with open(sidecar_path, 'w') as f:
+            json.dump(sidecar_data(rng), f)
+        sidecar_paths.append(sidecar_path)
+    return sidecar_paths
+
+
+def main(count=1000, path=None):
+    if path is None:
+        path = tempfile.mkdtemp(prefix='stocker_catalog_', dir=default_root())
+    generate_catalog(path, count)
+    print('created %i media in %s' % (count, path))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(*([int(args[0])] + args[1:2] if args else []))
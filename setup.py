@@ -9,11 +9,12 @@ META_PATH = os.path.join("stocker", "__init__.py")
 KEYWORDS = ['stock', 'ShutterStock', 'AdobeStock', 'GettyImages', 'video',
             'image']
 CLASSIFIERS = ["Programming Language :: Python",
-               "Programming Language :: Python :: 2.7",
-               "Programming Language :: Python :: 3.3",
-               "Programming Language :: Python :: 3.4",
-               "Programming Language :: Python :: 3.5",
-               "Programming Language :: Python :: 3.6",
+               "Programming Language :: Python :: 3",
+               "Programming Language :: Python :: 3 :: Only",
+               "Programming Language :: Python :: 3.9",
+               "Programming Language :: Python :: 3.10",
+               "Programming Language :: Python :: 3.11",
+               "Programming Language :: Python :: 3.12",
                "License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
                "Operating System :: OS Independent",
                "Development Status :: 5 - Production/Stable",
@@ -76,6 +77,7 @@ if __name__ == '__main__':
         include_package_data=True,
         data_files=DATA_FILES,
         zip_safe=True,
+        python_requires='>=3.9',
         test_suite='stocker',
         install_requires=INSTALL_REQUIRES,
         tests_require=TESTS_REQUIRE
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""asyncio support.
+
+The blocking file system calls of :class:`stocker.models.StockManager` are
+run in a bounded thread pool, so they don't block the event loop of the
+application.
+"""
+
+import asyncio
+import collections
+import functools
+import os
+
+from stocker import models
+from stocker.models import GenericStock, StockManager
+
+
+class AsyncStockManager(StockManager):
+    """A StockManager for asyncio applications.
+
+    The directory listing, sidecar reading and writing and the CSV generation
+    are run in a thread pool of ``workers`` threads. The discovered media can
+    be consumed as they are read with :meth:`.iter_media`, which can be
+    stopped at any time. Cancelling a coroutine of this class cancels the
+    file operations that are not started yet.
+
+    The media should not be changed while a CSV generation or export is
+    running, as they are read from a worker thread.
+
+    Example::
+
+      from stocker.aio import AsyncStockManager
+
+      async def scan(path):
+          async with AsyncStockManager(workers=8) as sm:
+              async for stock in sm.iter_media(path, recursive=True):
+                  print(stock.title)
+              return await sm.generate_csv_async()
+
+    :param bool intern_keywords: See :class:`stocker.models.StockManager`.
+    :param bool index_search: See :class:`stocker.models.StockManager`.
+    :param int workers: The maximum number of blocking calls that run at the
+      same time. The default is 4.
+    :param stats: See :class:`stocker.models.StockManager`.
+    """
+
+    def __init__(self, intern_keywords=False, index_search=False, workers=4,
+                 stats=None):
+        super(AsyncStockManager, self).__init__(
+            intern_keywords=intern_keywords, index_search=index_search,
+            stats=stats
+        )
+        if workers < 1:
+            raise ValueError(
+                '%s.workers should be a positive integer, not %r' % (
+                    self.__class__.__name__, workers
+                )
+            )
+        self.workers = workers
+        self._executor = None
+
+    def _get_executor(self):
+        """returns the thread pool, creates it if it is not created yet
+        """
+        if self._executor is None:
+            import concurrent.futures
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='stocker'
+            )
+        return self._executor
+
+    def _run(self, func, *args, **kwargs):
+        """runs the given function in the thread pool, returns an awaitable
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    def close(self):
+        """Shuts down the thread pool. The calls that are not started yet are
+        cancelled.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def scan_directory_async(self, path, recursive=False, include=None,
+                                   exclude=None, max_depth=None):
+        """Lists the media and sidecar files in the given path without
+        blocking the event loop, see
+        :meth:`stocker.models.StockManager.scan_directory`.
+
+        :return list: A list of ``(folder, media_filename, sidecar_filename)``
+          tuples.
+        """
+        return await self._run(
+            self.scan_directory, path, recursive=recursive, include=include,
+            exclude=exclude, max_depth=max_depth
+        )
+
+    async def iter_media(self, path, recursive=False, include=None,
+                         exclude=None, max_depth=None):
+        """Discovers the media in the given path and yields them as they are
+        read.
+
+        Replaces the ``media`` and ``discovery_errors`` like
+        :meth:`stocker.models.StockManager.discover_media`, each media is
+        appended to the ``media`` list before it is yielded. The sidecar files
+        are read by the thread pool, at most ``2 * workers`` files ahead of the
+        consumer. The media are yielded in the same order with
+        :meth:`.discover_media`.
+
+        Cancelling the consuming task stops the discovery right away, the
+        ``media`` list is left with the media that are yielded so far. The
+        search index is built only if the discovery is completed. Breaking
+        the loop does not stop the sidecar reads that are already started
+        until the generator is closed, which happens only when it is garbage
+        collected, so close it explicitly with :func:`contextlib.aclosing`
+        (Python 3.10+) or ``await media_iterator.aclose()``::
+
+          import contextlib
+
+          async with contextlib.aclosing(sm.iter_media(path)) as media:
+              async for gst in media:
+                  if gst.title == 'Found':
+                      break
+
+        :param path: The folder to search media in.
+        :param bool recursive: If True the sub folders are also searched.
+        :param list include: Shell style wildcards of the media files to
+          include.
+        :param list exclude: Shell style wildcards of the files and folders to
+          skip.
+        :param int max_depth: The maximum depth of the sub folders to search in
+          recursive mode.
+        :return: An async iterator of :class:`stocker.models.GenericStock`
+          instances.
+        """
+        self.media = []
+        self.discovery_errors = []
+        self.unknown_keys = []
+        self.search_index = None
+
+        pairs = iter(await self.scan_directory_async(
+            path, recursive=recursive, include=include, exclude=exclude,
+            max_depth=max_depth
+        ))
+
+        read_ahead = 2 * self.workers
+        pending = collections.deque()
+        try:
+            while True:
+                while len(pending) < read_ahead:
+                    pair = next(pairs, None)
+                    if pair is None:
+                        break
+                    sidecar_path = os.path.join(pair[0], pair[2])
+                    pending.append((
+                        pair, sidecar_path,
+                        self._run(models._read_sidecar_safe, sidecar_path)
+                    ))
+
+                if not pending:
+                    break
+
+                (folder, media_filename, sidecar_filename), sidecar_path, \
+                    future = pending.popleft()
+                data, error = await future
+                if error is not None:
+                    self.discovery_errors.append((sidecar_path, error))
+                    continue
+                gst = self._create_stock(folder, media_filename, data)
+                self.media.append(gst)
+                yield gst
+        finally:
+            for pair, sidecar_path, future in pending:
+                future.cancel()
+
+        if self.index_search:
+            self.build_search_index()
+
+    async def discover_media_async(self, path, recursive=False, include=None,
+                                   exclude=None, max_depth=None):
+        """Discovers the media in the given path without blocking the event
+        loop, see :meth:`.iter_media`.
+        """
+        async for stock in self.iter_media(
+                path, recursive=recursive, include=include, exclude=exclude,
+                max_depth=max_depth):
+            pass
+
+    async def from_file_async(self, path, media_filename=None):
+        """Reads the given sidecar file without blocking the event loop.
+
+        :param str path: The path of the sidecar file.
+        :param str media_filename: The file name of the media, see
+          :meth:`stocker.models.StockBase.from_file`.
+        :return GenericStock: The media, it is not added to the ``media``.
+        """
+        def load():
+            gst = GenericStock()
+            gst.from_file(path, media_filename=media_filename)
+            return gst
+        return await self._run(load)
+
+    async def generate_csv_async(self, target_class=None, changed_only=False,
+                                 manifest=None):
+        """Generates the CSV content in the thread pool, see
+        :meth:`stocker.models.StockManager.generate_csv`.
+
+        :return str: The CSV content.
+        """
+        return await self._run(
+            self.generate_csv, target_class, changed_only=changed_only,
+            manifest=manifest
+        )
+
+    async def export_all_async(self, targets=None, out_dir='.', max_rows=None,
+                               max_bytes=None, delta=False):
+        """Writes the CSV files of the given targets in the thread pool, see
+        :meth:`stocker.models.StockManager.export_all`.
+
+        :return dict: The target class to written file paths mapping.
+        """
+        return await self._run(
+            self.export_all, targets=targets, out_dir=out_dir,
+            max_rows=max_rows, max_bytes=max_bytes, delta=delta
+        )
+
+    async def save_all_async(self, compact=False):
+        """Writes the sidecar files of the changed media in the thread pool,
+        see :meth:`stocker.models.StockManager.save_all`.
+
+        :param bool compact: If True the JSON is written without indentation.
+        :return list: The media that are written.
+        """
+        dirty_media = [m for m in self.media if m.is_dirty]
+        errors = await asyncio.gather(*[
+            self._run(models._write_sidecar_safe, m, compact)
+            for m in dirty_media
+        ])
+        return self._sidecars_written(dirty_media, errors)
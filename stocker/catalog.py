@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+from array import array
+
+
+class StringTable:
+    """Interns strings to small integer ids.
+
+    Id 0 is always the empty string.
+    """
+
+    __slots__ = ('strings', 'ids')
+
+    def __init__(self):
+        self.strings = ['']
+        self.ids = {'': 0}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, string):
+        """Returns the id of the given string, adds it to the table if it is
+        not there.
+
+        :param str string: The string to intern. None is stored as the empty
+          string.
+        :return int:
+        """
+        if not string:
+            return 0
+        try:
+            return self.ids[string]
+        except KeyError:
+            id_ = len(self.strings)
+            self.ids[string] = id_
+            self.strings.append(string)
+            return id_
+
+    def get(self, string):
+        """Returns the id of the given string or None if it is not in the
+        table.
+        """
+        if not string:
+            return 0
+        return self.ids.get(string)
+
+
+class Catalog:
+    """A columnar, read only, in memory catalog of media.
+
+    Instead of one :class:`stocker.models.GenericStock` object per media, the
+    catalog keeps one compact column per field. Repeating string fields
+    (paths, categories, country, poster timecodes, keywords, releases) are
+    interned to integer ids stored in :class:`array.array` instances, lists
+    (keywords and releases) are stored as a flat id array with an offsets
+    array.
+
+    The category, country and editorial columns are also indexed, so
+    :meth:`.filter` answers queries with set operations instead of looping
+    over the media. GenericStock instances are created only when they are
+    requested with indexing or iteration.
+
+    Example::
+
+      from stocker.models import StockManager
+      sm = StockManager()
+      sm.discover_media('path')
+      catalog = sm.build_catalog()
+      for media in catalog.filter(category='Nature', editorial=False):
+          print(media.filename)
+
+    :param stocks: An iterable of GenericStock instances.
+    """
+
+    # the fields that can be used with the ``missing`` argument of filter()
+    missing_fields = [
+        'title', 'description', 'category1', 'category2', 'keywords',
+        'country', 'poster_timecode', 'releases'
+    ]
+
+    def __init__(self, stocks=()):
+        self.strings = StringTable()
+        self.filenames = []
+        self.titles = []
+        self.descriptions = []
+        self.path_ids = array('I')
+        self.category1_ids = array('I')
+        self.category2_ids = array('I')
+        self.country_ids = array('I')
+        self.poster_timecode_ids = array('I')
+        self.editorial = bytearray()
+        self.keyword_ids = array('I')
+        self.keyword_offsets = array('I', [0])
+        self.release_ids = array('I')
+        self.release_offsets = array('I', [0])
+
+        # value id -> set of row numbers
+        self._category_index = {}
+        self._country_index = {}
+
+        for stock in stocks:
+            self.append(stock)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def append(self, stock):
+        """Adds the given GenericStock to the catalog.
+
+        :param stock: A GenericStock instance.
+        :return int: The row number of the added media.
+        """
+        intern = self.strings.intern
+        row = len(self.filenames)
+
+        self.filenames.append(stock.filename)
+        self.titles.append(stock.title)
+        self.descriptions.append(stock.description)
+        self.path_ids.append(intern(stock.path))
+
+        category1_id = intern(stock.category1)
+        category2_id = intern(stock.category2)
+        self.category1_ids.append(category1_id)
+        self.category2_ids.append(category2_id)
+        for category_id in (category1_id, category2_id):
+            if category_id:
+                self._category_index.setdefault(category_id, set()).add(row)
+
+        country_id = intern(stock.country)
+        self.country_ids.append(country_id)
+        self._country_index.setdefault(country_id, set()).add(row)
+
+        self.poster_timecode_ids.append(intern(stock.poster_timecode))
+        self.editorial.append(1 if stock.editorial else 0)
+
+        self.keyword_ids.extend(intern(k) for k in (stock.keywords or ()))
+        self.keyword_offsets.append(len(self.keyword_ids))
+        self.release_ids.extend(intern(r) for r in (stock.releases or ()))
+        self.release_offsets.append(len(self.release_ids))
+        return row
+
+    def _strings(self, ids, offsets, row):
+        strings = self.strings.strings
+        return [strings[i] for i in ids[offsets[row]:offsets[row + 1]]]
+
+    def keywords(self, row):
+        """Returns the keywords of the media at the given row.
+        """
+        return self._strings(self.keyword_ids, self.keyword_offsets, row)
+
+    def releases(self, row):
+        """Returns the releases of the media at the given row.
+        """
+        return self._strings(self.release_ids, self.release_offsets, row)
+
+    def __getitem__(self, row):
+        """Creates a GenericStock instance from the given row.
+        """
+        from stocker.models import GenericStock
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('Catalog index out of range')
+
+        strings = self.strings.strings
+        gst = GenericStock(
+            filename=self.filenames[row],
+            path=strings[self.path_ids[row]],
+            keywords=self.keywords(row),
+            category1=strings[self.category1_ids[row]],
+            category2=strings[self.category2_ids[row]],
+            country=strings[self.country_ids[row]],
+            poster_timecode=strings[self.poster_timecode_ids[row]],
+            releases=self.releases(row),
+            editorial=bool(self.editorial[row])
+        )
+        # set them directly, the title and the description are filled from
+        # each other in GenericStock.__init__
+        gst.title = self.titles[row]
+        gst.description = self.descriptions[row]
+        return gst
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def iter_rows(self, rows):
+        """Yields GenericStock instances for the given row numbers.
+        """
+        for row in rows:
+            yield self[row]
+
+    def filter_rows(self, category=None, editorial=None, country=None,
+                    missing=None):
+        """Returns the row numbers of the media that matches all the given
+        conditions.
+
+        :param str category: The media that has this generic category either
+          as category1 or category2.
+        :param bool editorial: The media that is editorial or not.
+        :param str country: The media from this country.
+        :param list missing: The media that have all of these fields empty,
+          see ``missing_fields``.
+        :return list: The sorted row numbers.
+        """
+        rows = None
+
+        def intersect(current, other):
+            if current is None:
+                return set(other)
+            return current.intersection(other)
+
+        if category is not None:
+            rows = intersect(rows, self._category_index.get(
+                self.strings.get(category) or -1, ()
+            ))
+
+        if country is not None:
+            country_id = self.strings.get(country)
+            rows = intersect(rows, self._country_index.get(
+                -1 if country_id is None else country_id, ()
+            ))
+
+        if editorial is not None:
+            flag = 1 if editorial else 0
+            if rows is None:
+                rows = set(
+                    row for row, value in enumerate(self.editorial)
+                    if value == flag
+                )
+            else:
+                rows = set(row for row in rows if self.editorial[row] == flag)
+
+        if missing:
+            if isinstance(missing, str):
+                missing = [missing]
+            for field in missing:
+                if field not in self.missing_fields:
+                    raise ValueError(
+                        '%s.filter() missing should be one of %s, not %r' % (
+                            self.__class__.__name__,
+                            ', '.join(self.missing_fields), field
+                        )
+                    )
+                rows = intersect(rows, self._missing_rows(field))
+
+        if rows is None:
+            return list(range(len(self)))
+        return sorted(rows)
+
+    def _missing_rows(self, field):
+        """Returns the row numbers where the given field is empty.
+        """
+        if field in ('title', 'description'):
+            column = self.titles if field == 'title' else self.descriptions
+            return [row for row, value in enumerate(column) if not value]
+
+        if field in ('keywords', 'releases'):
+            offsets = self.keyword_offsets if field == 'keywords' \
+                else self.release_offsets
+            return [
+                row for row in range(len(self))
+                if offsets[row] == offsets[row + 1]
+            ]
+
+        if field == 'country':
+            return self._country_index.get(0, ())
+
+        column = getattr(self, '%s_ids' % field)
+        return [row for row, value in enumerate(column) if not value]
+
+    def filter(self, category=None, editorial=None, country=None,
+               missing=None):
+        """Returns the GenericStock instances that matches all the given
+        conditions, see :meth:`.filter_rows` for the arguments.
+
+        :return: A generator of GenericStock instances.
+        """
+        return self.iter_rows(self.filter_rows(
+            category=category, editorial=editorial, country=country,
+            missing=missing
+        ))
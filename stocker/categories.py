@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+class CategoryIndex:
+    """Immutable category lookup tables of the stock sites.
+
+    The tables are built and validated only once, when
+    :mod:`stocker.models` is imported, so converting between the stock
+    classes does not do any mapping work other than a dictionary lookup.
+
+    ShutterStock categories are used as the generic categories (see
+    :class:`stocker.models.GenericStock`). GettyImages does not use
+    categories.
+
+    The AdobeStock to generic category mapping is the reverse of
+    ``to_adobe_stock``, the AdobeStock categories that are mapped from more
+    than one generic category are mapped back to the first one. The AdobeStock
+    categories that no generic category maps to are taken from
+    ``unmapped_adobe_stock``.
+
+    :param list categories: The generic (ShutterStock) categories.
+    :param dict to_adobe_stock: Generic category name to AdobeStock category
+      name mapping. Should cover all the generic categories.
+    :param dict adobe_stock_ids: AdobeStock category name to AdobeStock
+      category id mapping.
+    :param dict unmapped_adobe_stock: AdobeStock category name to generic
+      category name mapping for the AdobeStock categories that are not in
+      the values of ``to_adobe_stock``.
+    """
+
+    def __init__(self, categories, to_adobe_stock, adobe_stock_ids,
+                 unmapped_adobe_stock=None):
+        from types import MappingProxyType
+
+        if unmapped_adobe_stock is None:
+            unmapped_adobe_stock = {}
+
+        self.categories = tuple(categories)
+        self.category_set = frozenset(categories)
+        self.to_adobe_stock = MappingProxyType(dict(to_adobe_stock))
+        self.unmapped_adobe_stock = MappingProxyType(
+            dict(unmapped_adobe_stock)
+        )
+        from_adobe_stock = {}
+        for generic, adobe in self.to_adobe_stock.items():
+            from_adobe_stock.setdefault(adobe, generic)
+        self.mapped_adobe_stock = frozenset(from_adobe_stock)
+        for adobe, generic in self.unmapped_adobe_stock.items():
+            from_adobe_stock.setdefault(adobe, generic)
+        self.from_adobe_stock = MappingProxyType(from_adobe_stock)
+        self.adobe_stock_ids = MappingProxyType(dict(adobe_stock_ids))
+        self.adobe_stock_names = MappingProxyType(
+            dict((v, k) for k, v in adobe_stock_ids.items())
+        )
+        self.validate()
+
+        # generic category -> AdobeStock category id
+        self.to_adobe_stock_ids = MappingProxyType(
+            dict((k, self.adobe_stock_ids[v])
+                 for k, v in self.to_adobe_stock.items())
+        )
+
+    def validate(self):
+        """Checks if the tables are complete and consistent, raises a
+        ValueError if not.
+        """
+        def check(names, message):
+            if names:
+                raise ValueError(
+                    '%s: %s' % (message, ', '.join(sorted(names)))
+                )
+
+        check(
+            self.category_set - set(self.to_adobe_stock),
+            'No AdobeStock category for generic categories'
+        )
+        check(
+            set(self.to_adobe_stock) - self.category_set,
+            'Unknown generic categories in to_adobe_stock'
+        )
+        check(
+            set(self.to_adobe_stock.values()) - set(self.adobe_stock_ids),
+            'Unknown AdobeStock categories in to_adobe_stock'
+        )
+        check(
+            set(self.unmapped_adobe_stock) & self.mapped_adobe_stock,
+            'AdobeStock categories in unmapped_adobe_stock are already mapped'
+        )
+        check(
+            set(self.unmapped_adobe_stock) - set(self.adobe_stock_ids),
+            'Unknown AdobeStock categories in unmapped_adobe_stock'
+        )
+        check(
+            set(self.unmapped_adobe_stock.values()) - self.category_set,
+            'Unknown generic categories in unmapped_adobe_stock'
+        )
+        check(
+            set(self.adobe_stock_ids) - set(self.from_adobe_stock),
+            'No generic category for AdobeStock categories'
+        )
+        # the categories should map back to themselves
+        check(
+            set(
+                adobe for adobe, generic in self.from_adobe_stock.items()
+                if adobe in self.mapped_adobe_stock
+                and self.to_adobe_stock.get(generic) != adobe
+            ),
+            'AdobeStock categories that do not map back'
+        )
+        if len(self.adobe_stock_names) != len(self.adobe_stock_ids):
+            raise ValueError('AdobeStock category ids are not unique')
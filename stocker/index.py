@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+class DiscoveryIndex:
+    """A persistent index of the parsed sidecar files.
+
+    The index is an SQLite database that stores the path, size, modification
+    time and the parsed content of each sidecar file. It is used by
+    :meth:`stocker.models.StockManager.discover_media` to parse only the
+    sidecar files that are added or changed since the last scan, the others
+    are loaded from the index after a single ``os.stat`` call.
+
+    Example::
+
+      from stocker.models import StockManager
+      sm = StockManager()
+      sm.discover_media('path', index='path/.stocker_index')
+
+    :param str path: The path of the index file. It is created if it doesn't
+      exist. Use ":memory:" for a temporary index.
+    """
+
+    schema_version = 1
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self._create_tables()
+
+    def _create_tables(self):
+        """creates the tables if they don't exist
+        """
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS sidecars ('
+                'path TEXT PRIMARY KEY, '
+                'folder TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'mtime_ns INTEGER NOT NULL, '
+                'data TEXT NOT NULL)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS sidecars_folder '
+                'ON sidecars (folder)'
+            )
+            self.connection.execute(
+                'PRAGMA user_version = %i' % self.schema_version
+            )
+
+    def close(self):
+        """closes the index file
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM sidecars'
+        ).fetchone()[0]
+
+    def read(self, sidecar_paths, reader, listed_folders=None, root=None):
+        """Returns the parsed content of the given sidecar files.
+
+        Only the sidecar files that are not in the index or that have a
+        different size or modification time are read with the given
+        ``reader``, the others are loaded from the index.
+
+        The index only keeps the sidecar files of the last scan. These entries
+        are removed from the index:
+
+        * The sidecar files that are not in ``sidecar_paths`` but in one of
+          their folders or in one of the ``listed_folders``. These are the
+          deleted sidecar files and also the ones that are skipped by the
+          include/exclude patterns of the scan.
+        * The sidecar files that can not be read or parsed, including the ones
+          that are in the index but changed since then.
+        * The sidecar files in the folders under ``root`` that do not exist
+          anymore.
+
+        :param list sidecar_paths: The full paths of the sidecar files.
+        :param reader: A callable that accepts a list of sidecar paths and
+          returns an iterable of ``(data, error)`` tuples in the same order.
+        :param list listed_folders: The folders that are listed to find the
+          ``sidecar_paths``, including the ones without any sidecar files.
+        :param str root: The folder that is scanned.
+        :return list: A list of ``(data, error)`` tuples in the same order with
+          ``sidecar_paths``.
+        """
+        import os
+        from stocker import json_backend
+
+        folders = set(os.path.dirname(p) for p in sidecar_paths)
+        if listed_folders is not None:
+            folders.update(listed_folders)
+
+        deleted_folders = []
+        if root is not None:
+            # the folders that are deleted since the last scan are not listed
+            prefix = os.path.join(root, '')
+            for (folder,) in self.connection.execute(
+                    'SELECT DISTINCT folder FROM sidecars'):
+                if folder not in folders and folder.startswith(prefix) \
+                   and not os.path.isdir(folder):
+                    deleted_folders.append((folder,))
+
+        cached = {}
+        for folder in folders:
+            for path, size, mtime_ns, data in self.connection.execute(
+                    'SELECT path, size, mtime_ns, data FROM sidecars '
+                    'WHERE folder = ?', (folder,)):
+                cached[path] = (size, mtime_ns, data)
+
+        results = [None] * len(sidecar_paths)
+        changed = []
+        for i, path in enumerate(sidecar_paths):
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                results[i] = (None, e)
+                continue
+
+            entry = cached.pop(path, None)
+            if entry is not None \
+               and entry[0] == stat.st_size \
+               and entry[1] == stat.st_mtime_ns:
+                results[i] = (json_backend.loads(entry[2]), None)
+            else:
+                changed.append((i, path, stat))
+
+        rows = []
+        for (i, path, stat), (data, error) in zip(
+                changed, reader([path for i, path, stat in changed])):
+            results[i] = (data, error)
+            if error is None:
+                rows.append((
+                    path, os.path.dirname(path), stat.st_size,
+                    stat.st_mtime_ns, json_backend.dumps(data, indent=False)
+                ))
+            else:
+                # do not keep the entry of the last readable version
+                cached[path] = None
+
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM sidecars WHERE folder = ?', deleted_folders
+            )
+            # whatever left in cached is deleted, skipped or failed to be read
+            self.connection.executemany(
+                'DELETE FROM sidecars WHERE path = ?',
+                [(path,) for path in cached]
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO sidecars '
+                '(path, folder, size, mtime_ns, data) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+
+        return results
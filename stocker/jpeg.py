@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Reads the metadata embedded in JPEG files.
+
+The titles, descriptions, keywords and countries are read from the XMP
+packet in the APP1 segment and from the IPTC-IIM records in the Photoshop
+APP13 segment. The file is memory mapped and only the segment headers and
+these two segments are read, the scan stops at the first SOS (start of
+scan) marker, so the compressed image data is never read or decoded.
+
+The values in the XMP packet take precedence over the IPTC values.
+
+Example::
+
+  from stocker.jpeg import read_embedded_metadata
+  data = read_embedded_metadata('still.jpg')
+  # {'title': '...', 'description': '...', 'keywords': [...]}
+"""
+
+import struct
+
+
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\0'
+PHOTOSHOP_HEADER = b'Photoshop 3.0\0'
+
+# the Photoshop image resource that holds the IPTC-IIM records
+IPTC_RESOURCE_ID = 0x0404
+
+# IPTC-IIM application record (2) dataset number -> GenericStock field
+iptc_fields = {
+    5: 'title',  # Object Name
+    25: 'keywords',  # Keywords, repeated
+    101: 'country',  # Country/Primary Location Name
+    120: 'description',  # Caption/Abstract
+}
+
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+DC = '{http://purl.org/dc/elements/1.1/}'
+PHOTOSHOP = '{http://ns.adobe.com/photoshop/1.0/}'
+IPTC_CORE = '{http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/}'
+
+
+def iter_segments(data):
+    """Yields the ``(marker, payload start, payload end)`` of the segments of
+    the given JPEG data up to the first SOS marker.
+
+    :param data: A bytes like object, like an :class:`mmap.mmap`, of the
+      whole file.
+    :raises ValueError: If the data is not a JPEG file.
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError('Not a JPEG file')
+    size = len(data)
+    offset = 2
+    while offset + 2 <= size:
+        if data[offset] != 0xff:
+            raise ValueError('Invalid JPEG marker at offset %i' % offset)
+        marker = data[offset + 1]
+        if marker == 0xff:
+            # fill byte
+            offset += 1
+            continue
+        offset += 2
+        if marker == 0x01 or 0xd0 <= marker <= 0xd7:
+            # the markers without a payload
+            continue
+        if marker == 0xda or marker == 0xd9:
+            # start of scan or end of image
+            return
+        if offset + 2 > size:
+            raise ValueError('Truncated JPEG segment at offset %i' % offset)
+        length = struct.unpack_from('>H', data, offset)[0]
+        if length < 2 or offset + length > size:
+            raise ValueError(
+                'Invalid JPEG segment length %i at offset %i' % (
+                    length, offset
+                )
+            )
+        yield marker, offset + 2, offset + length
+        offset += length
+
+
+def _decode(value, utf8):
+    """decodes an IPTC value
+    """
+    if utf8:
+        return value.decode('utf-8', 'replace')
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value.decode('latin-1')
+
+
+def parse_iptc(data):
+    """Parses the IPTC-IIM records in the given data.
+
+    :param bytes data: The IPTC-IIM records.
+    :return dict: The found fields, ``keywords`` is a list.
+    """
+    result = {}
+    utf8 = False
+    offset = 0
+    size = len(data)
+    while offset + 5 <= size and data[offset] == 0x1c:
+        record, dataset, length = struct.unpack_from('>BBH', data, offset + 1)
+        offset += 5
+        if length & 0x8000:
+            # extended dataset, the length is in the next bytes
+            length_size = length & 0x7fff
+            length = int.from_bytes(data[offset:offset + length_size], 'big')
+            offset += length_size
+        value = bytes(data[offset:offset + length])
+        offset += length
+
+        if record == 1 and dataset == 90:
+            # Coded Character Set, ESC % G is UTF-8
+            utf8 = value == b'\x1b%G'
+        elif record == 2 and dataset in iptc_fields:
+            field = iptc_fields[dataset]
+            value = _decode(value, utf8).strip()
+            if field == 'keywords':
+                result.setdefault('keywords', []).append(value)
+            else:
+                result[field] = value
+    return result
+
+
+def parse_photoshop_resources(data):
+    """Returns the IPTC-IIM records in the given Photoshop image resources.
+
+    :param bytes data: The payload of the APP13 segment after its header.
+    :return bytes: The IPTC-IIM records or None.
+    """
+    offset = 0
+    size = len(data)
+    while offset + 12 <= size and data[offset:offset + 4] == b'8BIM':
+        resource_id = struct.unpack_from('>H', data, offset + 4)[0]
+        # a Pascal string padded to an even size
+        name_length = data[offset + 6]
+        offset += 6 + name_length + 1 + ((name_length + 1) % 2)
+        if offset + 4 > size:
+            break
+        resource_size = struct.unpack_from('>I', data, offset)[0]
+        offset += 4
+        if resource_id == IPTC_RESOURCE_ID:
+            return bytes(data[offset:offset + resource_size])
+        offset += resource_size + (resource_size % 2)
+    return None
+
+
+def _xmp_text(element):
+    """returns the text of a simple or a language alternative XMP property
+    """
+    if element is None:
+        return None
+    items = element.findall('%sAlt/%sli' % (RDF, RDF))
+    if items:
+        for item in items:
+            if item.get('{http://www.w3.org/XML/1998/namespace}lang') \
+               == 'x-default':
+                return (item.text or '').strip()
+        return (items[0].text or '').strip()
+    return (element.text or '').strip()
+
+
+def parse_xmp(data):
+    """Parses the given XMP packet.
+
+    :param bytes data: The XMP packet.
+    :return dict: The found fields, ``keywords`` is a list.
+    :raises ValueError: If the packet is not valid XML.
+    """
+    import xml.etree.ElementTree as ElementTree
+    try:
+        root = ElementTree.fromstring(bytes(data).strip(b'\0 \t\r\n'))
+    except ElementTree.ParseError as e:
+        raise ValueError('Invalid XMP packet: %s' % e)
+
+    result = {}
+    for description in root.iter('%sDescription' % RDF):
+        for field, tag in [('title', DC + 'title'),
+                           ('description', DC + 'description'),
+                           ('country', PHOTOSHOP + 'Country'),
+                           ('country', IPTC_CORE + 'CountryName')]:
+            # properties can be attributes or elements
+            value = description.get(tag)
+            if value is None:
+                value = _xmp_text(description.find(tag))
+            if value and field not in result:
+                result[field] = value.strip()
+
+        subject = description.find(DC + 'subject')
+        if subject is not None and 'keywords' not in result:
+            keywords = [
+                (item.text or '').strip()
+                for item in subject.iter('%sli' % RDF)
+            ]
+            result['keywords'] = [k for k in keywords if k]
+    return result
+
+
+def parse_embedded_metadata(data):
+    """Parses the XMP and IPTC metadata of the given JPEG data.
+
+    :param data: A bytes like object, like an :class:`mmap.mmap`, of the
+      whole file.
+    :return dict: The found fields, like ``{'title': ..., 'keywords': [...]}``
+    :raises ValueError: If the data is not a valid JPEG file.
+    """
+    xmp = {}
+    iptc = {}
+    xmp_header_size = len(XMP_HEADER)
+    photoshop_header_size = len(PHOTOSHOP_HEADER)
+    for marker, start, end in iter_segments(data):
+        if marker == 0xe1 and not xmp \
+           and data[start:start + xmp_header_size] == XMP_HEADER:
+            xmp = parse_xmp(data[start + xmp_header_size:end])
+        elif marker == 0xed and not iptc \
+                and data[start:start + photoshop_header_size] \
+                == PHOTOSHOP_HEADER:
+            records = parse_photoshop_resources(
+                data[start + photoshop_header_size:end]
+            )
+            if records:
+                iptc = parse_iptc(records)
+    iptc.update(xmp)
+    return iptc
+
+
+def read_embedded_metadata(path):
+    """Reads the XMP and IPTC metadata of the given JPEG file.
+
+    :param str path: The path of the JPEG file.
+    :return dict: The found fields in the sidecar file format, like
+      ``{'title': ..., 'keywords': [...]}``.
+    :raises ValueError: If the file is not a valid JPEG file.
+    :raises OSError: If the file can not be read.
+    """
+    import mmap
+    import os
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('The JPEG file is empty: %s' % path)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return parse_embedded_metadata(data)
+            except (ValueError, struct.error) as e:
+                raise ValueError('%s: %s' % (e, path))
+
+
+def _read_embedded_metadata_safe(path):
+    """Returns ``(data, None)`` or ``(None, exception)`` for the given file.
+    """
+    try:
+        return read_embedded_metadata(path), None
+    except (OSError, ValueError) as e:
+        return None, e
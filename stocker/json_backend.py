@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Pluggable JSON backends for reading and writing sidecar files.
+
+The fastest installed backend is used, in the order of ``orjson``, ``ujson``
+and the standard library ``json`` module. A backend can be chosen explicitly
+with :func:`.set_backend` or with the ``STOCKER_JSON_BACKEND`` environment
+variable.
+
+All the backends read UTF-8 encoded bytes and write UTF-8 encoded bytes,
+the indented output uses two spaces and the compact output has no
+whitespace, so the files are the same regardless of the backend. The non
+ASCII characters are escaped as ``\\uXXXX`` like the standard library does
+by default, unless ``ensure_ascii`` is False, then they are written as they
+are, which is faster and smaller.
+"""
+
+import os
+
+
+class StdlibBackend:
+    """The standard library json module backend
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        import json
+        self.json = json
+
+    def loads(self, data):
+        return self.json.loads(data)
+
+    def dumps(self, obj, indent=True, ensure_ascii=True):
+        if indent:
+            return self.json.dumps(
+                obj, indent=2, ensure_ascii=ensure_ascii, default=list
+            ).encode('utf-8')
+        return self.json.dumps(
+            obj, separators=(',', ':'), ensure_ascii=ensure_ascii,
+            default=list
+        ).encode('utf-8')
+
+
+class OrjsonBackend:
+    """The orjson backend
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+    def dumps(self, obj, indent=True, ensure_ascii=True):
+        data = self.orjson.dumps(
+            obj, default=list,
+            option=self.orjson.OPT_INDENT_2 if indent else 0
+        )
+        # orjson has no option to escape the non ASCII characters
+        if ensure_ascii and not data.isascii():
+            return escape_non_ascii(data)
+        return data
+
+
+class UjsonBackend:
+    """The ujson backend
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+    def dumps(self, obj, indent=True, ensure_ascii=True):
+        if indent:
+            return self.ujson.dumps(
+                obj, indent=2, ensure_ascii=ensure_ascii,
+                escape_forward_slashes=False, default=list
+            ).encode('utf-8')
+        # ujson does not add any whitespace without indent
+        return self.ujson.dumps(
+            obj, ensure_ascii=ensure_ascii, escape_forward_slashes=False,
+            default=list
+        ).encode('utf-8')
+
+
+def _escape_character(match):
+    """returns the JSON escape sequence of the matched character
+    """
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u%04x' % code
+    # characters outside of the BMP are written as a surrogate pair
+    code -= 0x10000
+    return '\\u%04x\\u%04x' % (
+        0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff)
+    )
+
+
+def escape_non_ascii(data):
+    """Escapes the non ASCII characters and the DEL character of the given
+    JSON the same way the standard library json module does with
+    ``ensure_ascii=True``.
+
+    The non ASCII characters can only be in the strings of a JSON document,
+    so they can be escaped without parsing it.
+
+    :param bytes data: UTF-8 encoded JSON.
+    :return bytes: ASCII encoded JSON.
+    """
+    import re
+    return re.sub(
+        '[^\\x00-\\x7e]', _escape_character, data.decode('utf-8')
+    ).encode('ascii')
+
+
+# in the order of preference
+backend_classes = [OrjsonBackend, UjsonBackend, StdlibBackend]
+
+_backend = None
+
+
+def available_backends():
+    """Returns the names of the backends that can be used.
+
+    :return list:
+    """
+    names = []
+    for backend_class in backend_classes:
+        try:
+            backend_class()
+        except ImportError:
+            continue
+        names.append(backend_class.name)
+    return names
+
+
+def set_backend(name=None):
+    """Sets the JSON backend.
+
+    :param str name: One of "orjson", "ujson" or "json". The default is None,
+      which picks the fastest installed backend.
+    :return: The backend instance.
+    """
+    global _backend
+    if name is None:
+        for backend_class in backend_classes:
+            try:
+                _backend = backend_class()
+                return _backend
+            except ImportError:
+                continue
+
+    for backend_class in backend_classes:
+        if backend_class.name == name:
+            _backend = backend_class()
+            return _backend
+
+    raise ValueError(
+        'JSON backend should be one of %s, not %r' % (
+            ', '.join(b.name for b in backend_classes), name
+        )
+    )
+
+
+def get_backend():
+    """Returns the current JSON backend, selects one if there is none.
+    """
+    if _backend is None:
+        set_backend(os.environ.get('STOCKER_JSON_BACKEND') or None)
+    return _backend
+
+
+def loads(data):
+    """Parses the given JSON data.
+
+    :param data: JSON as UTF-8 encoded bytes or str.
+    """
+    return get_backend().loads(data)
+
+
+def dumps(obj, indent=True, ensure_ascii=True):
+    """Serializes the given object to JSON.
+
+    :param obj: The object to serialize.
+    :param bool indent: If True the output is indented with two spaces,
+      otherwise it is compact.
+    :param bool ensure_ascii: If True the non ASCII characters are escaped.
+      The default is True.
+    :return bytes: UTF-8 encoded JSON.
+    """
+    return get_backend().dumps(obj, indent=indent, ensure_ascii=ensure_ascii)
+
+
+def read_file(path):
+    """Reads and parses the given JSON file, the file is read in one call.
+
+    :param str path: The path of the JSON file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return get_backend().loads(data)
+
+
+def write_file(path, obj, indent=True, atomic=False, ensure_ascii=True):
+    """Serializes the given object to the given JSON file.
+
+    :param str path: The path of the JSON file.
+    :param obj: The object to serialize.
+    :param bool indent: If True the output is indented with two spaces,
+      otherwise it is compact.
+    :param bool atomic: If True the data is written to a temporary file in the
+      same folder which is then renamed to ``path``, so ``path`` either has
+      the old or the new content but never a partial one.
+    :param bool ensure_ascii: If True the non ASCII characters are escaped.
+      The default is True.
+    """
+    data = get_backend().dumps(obj, indent=indent, ensure_ascii=ensure_ascii)
+    if not atomic:
+        with open(path, 'wb') as f:
+            f.write(data)
+        return
+
+    folder, filename = os.path.split(path)
+    temp_path = os.path.join(
+        folder, '.%s.%s.tmp' % (filename, os.urandom(4).hex())
+    )
+    # the permissions of a new file are set by the kernel from the umask
+    fd = os.open(temp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            # keep the permissions of the existing file
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import hashlib
+import operator
+
+
+class ExportManifest:
+    """The content hashes of the media that are exported to a stock site.
+
+    The manifest maps the record id of each exported media (see
+    :attr:`stocker.models.StockBase.record_id`) to a hash of its fields. It is
+    used to export only the media that are new or changed since the last
+    export, see :meth:`stocker.models.StockManager.export_all`. The unchanged
+    media are skipped before they are converted to the target class, so a
+    delta export with no changes costs a single hash per media.
+
+    The hashes are calculated from the fields of the source media, so delete
+    the manifest file to export all the media again after changing how the
+    media are converted to the target, like the category mappings.
+
+    Example::
+
+      from stocker.manifest import ExportManifest
+      from stocker.models import ShutterStock
+      manifest = ExportManifest.load('ShutterStock.manifest.json')
+      csv_content = sm.generate_csv(ShutterStock, manifest=manifest)
+      manifest.prune(set(m.record_id for m in sm.media))
+      manifest.save('ShutterStock.manifest.json')
+
+    :param dict hashes: The record id to content hash mapping.
+    """
+
+    # the digest size of the content hashes in bytes
+    digest_size = 16
+
+    # stock class -> a callable that returns the field values in a fixed order
+    _field_getters = {}
+
+    def __init__(self, hashes=None):
+        if hashes is None:
+            hashes = {}
+        self.hashes = hashes
+
+    @classmethod
+    def load(cls, path):
+        """Loads the manifest from the given JSON file.
+
+        :param str path: The path of the manifest file. An empty manifest is
+          returned if the file doesn't exist.
+        :return ExportManifest:
+        """
+        import os
+        from stocker import json_backend
+        if not os.path.exists(path):
+            return cls()
+        hashes = json_backend.read_file(path)
+        if not isinstance(hashes, dict):
+            raise ValueError(
+                'The export manifest should contain a JSON object, not %s: '
+                '%s' % (hashes.__class__.__name__, path)
+            )
+        return cls(hashes)
+
+    def save(self, path):
+        """Writes the manifest to the given JSON file atomically.
+
+        :param str path: The path of the manifest file.
+        """
+        from stocker import json_backend
+        json_backend.write_file(path, self.hashes, indent=False, atomic=True)
+
+    @classmethod
+    def stock_hash(cls, stock):
+        """Returns the content hash of the given media.
+
+        The hash is calculated over a canonical encoding of the class name and
+        the ``fields`` of the media in sorted order, where the lists are
+        encoded as tuples.
+
+        :param stock: A :class:`stocker.models.StockBase` instance.
+        :return str: The hex digest of the BLAKE2b hash.
+        """
+        stock_class = stock.__class__
+        get_fields = cls._field_getters.get(stock_class)
+        if get_fields is None:
+            get_fields = cls._field_getters[stock_class] = \
+                operator.attrgetter(*sorted(stock_class.fields))
+
+        values = [stock_class.__name__]
+        for value in get_fields(stock):
+            if value.__class__ is not str and not isinstance(
+                    value, (bool, int, float, type(None))):
+                # lists and KeywordLists
+                value = tuple(value)
+            values.append(value)
+
+        return hashlib.blake2b(
+            repr(values).encode('utf-8'), digest_size=cls.digest_size
+        ).hexdigest()
+
+    def update(self, record_id, content_hash):
+        """Stores the given content hash of a media.
+
+        :param str record_id: The record id of the media.
+        :param str content_hash: The content hash of the media, see
+          :meth:`.stock_hash`.
+        :return bool: True if the media is new or changed since the last
+          export.
+        """
+        hashes = self.hashes
+        if hashes.get(record_id) == content_hash:
+            return False
+        hashes[record_id] = content_hash
+        return True
+
+    def prune(self, record_ids):
+        """Removes the hashes of the media that are not in the given record
+        ids, like the deleted media, so the manifest does not grow forever.
+        Use it only after a full export, the hashes of the media that are
+        not exported this time are lost.
+
+        :param record_ids: A set of the record ids of the current media.
+        :return int: The number of removed hashes.
+        """
+        hashes = self.hashes
+        stale_ids = [
+            record_id for record_id in hashes if record_id not in record_ids
+        ]
+        for record_id in stale_ids:
+            del hashes[record_id]
+        return len(stale_ids)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, record_id):
+        return record_id in self.hashes
@@ -16,6 +16,13 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with Stocker.  If not, see <http://www.gnu.org/licenses/>
 
+import collections
+import os
+
+from stocker.categories import CategoryIndex
+from stocker.serialization import get_csv_plan
+from stocker.vocabulary import KeywordList, KeywordVocabulary
+
 
 class Status:
     """Stock status
@@ -34,6 +41,16 @@ class StockManager:
     different format.
 
     Does several things mostly related to file system.
+
+    :param bool intern_keywords: If True the keywords of the discovered media
+      are stored as :class:`stocker.vocabulary.KeywordList` instances that
+      share the ``vocabulary`` of this StockManager. The default is False.
+    :param bool index_search: If True the ``search_index`` is built while
+      discovering the media, otherwise it is built on the first call to
+      :meth:`.search`. The default is False.
+    :param stats: A :class:`stocker.stats.Stats` instance to record the phase
+      timings and counters of :meth:`.discover_media` and the CSV generation
+      to. The default is None, which turns off the instrumentation.
     """
 
     media_file_extension = {
@@ -41,96 +58,1553 @@ class StockManager:
         'image': ['.jpg', '.jpeg', '.png'],
     }
 
-    def __init__(self):
-        self.media = []
+    # the media that can be discovered without a sidecar file, their fields
+    # are read from the metadata embedded in the file, see stocker.jpeg
+    embedded_metadata_extensions = ['.jpg', '.jpeg']
+
+    executors = ['thread', 'process']
 
-    def generate_csv(self, target_class=None):
+    # the fields that are indexed by the search index
+    search_fields = ['title', 'description', 'keywords']
+
+    def __init__(self, intern_keywords=False, index_search=False, stats=None):
+        from stocker.stats import null_stats
+        self.stats = stats if stats is not None else null_stats
+        self.media = []
+        self.discovery_errors = []
+        # (sidecar_path, [key, ...]), the keys in the sidecar files that are
+        # not fields of the media, which are probably typos
+        self.unknown_keys = []
+        self.save_errors = []
+        self.journal = []
+        # record id -> stocker.mp4.VideoInfo, see read_video_info()
+        self.video_info = {}
+        self.video_info_errors = []
+        # id(stock) -> stock, the media that have entries in the journal
+        self._changed_media = {}
+        # True if there are lazy media that are not loaded, see load_media()
+        self._lazy_media_pending = False
+        # the lazy media whose sidecar files can not be read, they are removed
+        # from the media list by the next load_media() call
+        self._failed_media = []
+        self.intern_keywords = intern_keywords
+        self.vocabulary = KeywordVocabulary()
+        self.index_search = index_search
+        self.search_index = None
+
+    def generate_csv(self, target_class=None, changed_only=False,
+                     manifest=None):
         """Generates CSV content for the given target.
 
         ``target`` is one of "ShutterStock", "AdobeStock" or "GettyImages".
         Default value is "ShutterStock".
 
+        This is a thin wrapper around :meth:`.iter_csv_rows`, use
+        :meth:`.write_csv` to write big catalogs directly to a file.
+
         :param target_class: The target stock class one of "ShutterStock",
           "AdobeStock" or "GettyImages". The default is ShutterStock
+        :param bool changed_only: If True only the media that are changed
+          since the ``journal`` is cleared are included.
+        :param manifest: A :class:`stocker.manifest.ExportManifest` of the
+          target. If given only the media that are new or changed since the
+          last export are included and the manifest is updated.
         :return str: Returns the creates CSV content.
         """
+        with self.stats.phase('generate_csv'):
+            rows = self.iter_csv_rows(target_class, changed_only, manifest)
+            # the header is always followed by a line break, like
+            # "header\n" when there are no media
+            header = next(rows)
+            return '%s\n%s' % (header, '\n'.join(rows))
+
+    def iter_csv_rows(self, target_class=None, changed_only=False,
+                      manifest=None):
+        """Generates the CSV rows for the given target one by one.
+
+        The first yielded row is the CSV header. Each media is converted to
+        the target class only when its row is requested, so the memory usage
+        does not grow with the number of media.
+
+        :param target_class: The target stock class one of "ShutterStock",
+          "AdobeStock" or "GettyImages". The default is ShutterStock
+        :param bool changed_only: If True only the media that are changed
+          since the ``journal`` is cleared are included.
+        :param manifest: A :class:`stocker.manifest.ExportManifest` of the
+          target. If given only the media that are new or changed since the
+          last export are included and the manifest is updated.
+        :return: A generator of CSV lines without the line terminators.
+        """
         if target_class is None:
             target_class = ShutterStock
 
-        csv_header = target_class.csv_header
-        converted_media = [m.to(target_class) for m in self.media]
-        csv_content = '\n'.join([m.to_csv() for m in converted_media])
+        yield get_csv_plan(target_class).header
+        yield from self._iter_rows(target_class, changed_only, manifest)
 
-        return '%s\n%s' % (csv_header, csv_content)
+    def _iter_rows(self, target_class, changed_only, manifest):
+        """generates the CSV rows of the media without the header
+        """
+        self._load_pending_media()
+        format_row = get_csv_plan(target_class).format_row
+        media = self.changed_media() if changed_only else self.media
+        if self.stats.enabled:
+            yield from self._iter_rows_with_stats(
+                target_class, format_row, media, manifest
+            )
+            return
+
+        if manifest is None:
+            for m in convert_many(media, target_class):
+                yield format_row(m)
+            return
+
+        update = manifest.update
+        stock_hash = manifest.stock_hash
+        converters = {}
+        for m in media:
+            if not update(m.record_id, stock_hash(m)):
+                continue
+            source_class = m.__class__
+            converter = converters.get(source_class)
+            if converter is None:
+                converter = converters[source_class] = \
+                    get_converter(source_class, target_class)
+            yield format_row(converter(m))
+
+    def _iter_rows_with_stats(self, target_class, format_row, media,
+                              manifest):
+        """same as _iter_rows() but records the conversion and formatting
+        times and the row counts to the ``stats``
+        """
+        import time
+        from stocker.serialization import _utf8_size
+        perf_counter = time.perf_counter
+        converters = {}
+        conversion_time = formatting_time = 0.0
+        row_count = byte_count = unchanged_count = 0
+        try:
+            for m in media:
+                if manifest is not None and not manifest.update(
+                        m.record_id, manifest.stock_hash(m)):
+                    unchanged_count += 1
+                    continue
+                start = perf_counter()
+                source_class = m.__class__
+                converter = converters.get(source_class)
+                if converter is None:
+                    converter = converters[source_class] = \
+                        get_converter(source_class, target_class)
+                converted = converter(m)
+                formatting_start = perf_counter()
+                row = format_row(converted)
+                end = perf_counter()
+                conversion_time += formatting_start - start
+                formatting_time += end - formatting_start
+                row_count += 1
+                # including the line terminator
+                byte_count += _utf8_size(row) + 1
+                yield row
+        finally:
+            stats = self.stats
+            stats.add_time('conversion', conversion_time)
+            stats.add_time('formatting', formatting_time)
+            stats.count('rows_written', row_count)
+            stats.count('bytes_written', byte_count)
+            if manifest is not None:
+                stats.count('rows_unchanged', unchanged_count)
+
+    def write_csv(self, target_class, fileobj, changed_only=False,
+                  manifest=None):
+        """Writes the CSV content for the given target to the given file
+        object.
+
+        The media are converted and formatted one by one and the rows are
+        written in batches, so the memory usage does not grow with the number
+        of media. The written content is the same with the one returned by
+        :meth:`.generate_csv`.
 
-    def discover_media(self, path):
-        """Discovers media in the given path.
+        :param target_class: The target stock class one of "ShutterStock",
+          "AdobeStock" or "GettyImages". The default is ShutterStock
+        :param fileobj: A file like object opened in text mode.
+        :param bool changed_only: If True only the media that are changed
+          since the ``journal`` is cleared are included.
+        :param manifest: A :class:`stocker.manifest.ExportManifest` of the
+          target. If given only the media that are new or changed since the
+          last export are included and the manifest is updated.
+        :return int: The number of media rows written.
+        """
+        if target_class is None:
+            target_class = ShutterStock
+
+        with self.stats.phase('write_csv'):
+            return get_csv_plan(target_class).write_rows(
+                fileobj, self._iter_rows(target_class, changed_only, manifest)
+            )
+
+    def write_csv_shards(self, target_class=None, out_dir='.',
+                         max_rows=None, max_bytes=None, delta=False):
+        """Writes the CSV content for the given target to numbered files that
+        has at most ``max_rows`` rows and ``max_bytes`` bytes.
+
+        Each file starts with the CSV header. The files are named after the
+        target class, like ``ShutterStock_001.csv``, or ``ShutterStock.csv``
+        if there are no limits. The rows are written as they are generated,
+        see :class:`stocker.serialization.ShardedCSVWriter`. The files of the
+        earlier export that are not written again are removed, see
+        :meth:`.export_all`.
+
+        :param target_class: The target stock class one of "ShutterStock",
+          "AdobeStock" or "GettyImages". The default is ShutterStock
+        :param str out_dir: The folder to write the CSV files to.
+        :param int max_rows: The maximum number of rows per file. The default
+          is the ``csv_max_rows`` of the target class.
+        :param int max_bytes: The maximum size of a file in bytes. The default
+          is the ``csv_max_bytes`` of the target class.
+        :param bool delta: If True only the media that are new or changed
+          since the last delta export are written, see :meth:`.export_all`.
+        :return list: The paths of the written files.
+        """
+        if target_class is None:
+            target_class = ShutterStock
+        return self.export_all(
+            targets=[target_class], out_dir=out_dir, max_rows=max_rows,
+            max_bytes=max_bytes, delta=delta
+        )[target_class]
+
+    def export_all(self, targets=None, out_dir='.', max_rows=None,
+                   max_bytes=None, delta=False):
+        """Writes the CSV files of all the given targets in one pass over the
+        media.
+
+        Each media is converted to each target and its row is written to the
+        CSV file of that target right away, so the media are walked only once
+        and nothing is kept in memory. The files are named after the target
+        classes, like ``ShutterStock.csv``. If there is a row or size limit the
+        rows are split into numbered files, like ``ShutterStock_001.csv``, see
+        :class:`stocker.serialization.ShardedCSVWriter`.
+
+        The files are written to temporary files first which replace the files
+        of the earlier export only if all the rows of all the targets are
+        written. If a media can not be converted, the earlier files are kept
+        as they are. The names of the written files are kept in a record for
+        each target, like ``.ShutterStock.files`` in ``out_dir``, and the
+        files of the earlier export that are not written again, like
+        ``ShutterStock_004.csv`` after an export that needs only three files,
+        are removed. The other files in ``out_dir`` are not removed.
+
+        :param list targets: The target stock classes. The default is
+          ``[ShutterStock, AdobeStock, GettyImages]``.
+        :param str out_dir: The folder to write the CSV files to.
+        :param int max_rows: The maximum number of rows per file. The default
+          is the ``csv_max_rows`` of each target class.
+        :param int max_bytes: The maximum size of a file in bytes. The default
+          is the ``csv_max_bytes`` of each target class.
+        :param bool delta: If True only the media that are new or changed
+          since the last delta export are written. The content hashes of the
+          exported media are kept in a manifest file for each target, like
+          ``ShutterStock.manifest.json`` in ``out_dir``, see
+          :class:`stocker.manifest.ExportManifest`. The manifest files are
+          updated only if all the files are written successfully, the media
+          that are removed since the last export are removed from the
+          manifests.
+        :return dict: The target class to written file paths mapping.
+        """
+        if targets is None:
+            targets = [ShutterStock, AdobeStock, GettyImages]
+        with self.stats.phase('export_all'):
+            return self._export_all(
+                targets, out_dir, max_rows, max_bytes, delta
+            )
+
+    def _export_all(self, targets, out_dir, max_rows, max_bytes, delta):
+        """writes the CSV files, see export_all()
+        """
+        from stocker.manifest import ExportManifest
+        from stocker.serialization import ShardedCSVWriter
+
+        self._load_pending_media()
+        outputs = []
+        manifests = {}
+        stats = self.stats
+        try:
+            for target_class in targets:
+                plan = get_csv_plan(target_class)
+                manifest = None
+                if delta:
+                    manifest_path = os.path.join(
+                        out_dir, '%s.manifest.json' % target_class.__name__
+                    )
+                    manifest = manifests[manifest_path] = \
+                        ExportManifest.load(manifest_path)
+                outputs.append((
+                    target_class, {}, plan.format_row, manifest,
+                    ShardedCSVWriter(
+                        plan.header, out_dir, target_class.__name__,
+                        max_rows=max_rows if max_rows is not None
+                        else target_class.csv_max_rows,
+                        max_bytes=max_bytes if max_bytes is not None
+                        else target_class.csv_max_bytes
+                    )
+                ))
+
+            stock_hash = ExportManifest.stock_hash
+            record_id = content_hash = None
+            # the record ids of all the media to prune the manifests
+            record_ids = set()
+            for m in self.media:
+                source_class = m.__class__
+                if delta:
+                    record_id = m.record_id
+                    record_ids.add(record_id)
+                    content_hash = stock_hash(m)
+                for target_class, converters, format_row, manifest, writer \
+                        in outputs:
+                    if manifest is not None \
+                       and not manifest.update(record_id, content_hash):
+                        continue
+                    converter = converters.get(source_class)
+                    if converter is None:
+                        converter = converters[source_class] = \
+                            get_converter(source_class, target_class)
+                    writer.write_row(format_row(converter(m)))
+        except BaseException:
+            # keep the files of the last export
+            for output in outputs:
+                output[-1].abort()
+            raise
+        else:
+            for output in outputs:
+                output[-1].close()
+        finally:
+            for output in outputs:
+                writer = output[-1]
+                stats.count('rows_written', writer.row_count)
+                stats.count('bytes_written', writer.byte_count)
+                stats.count('files_written', len(writer.paths))
+
+        for manifest_path, manifest in manifests.items():
+            # forget the media that are removed since the last export
+            manifest.prune(record_ids)
+            manifest.save(manifest_path)
+
+        return dict((output[0], output[-1].paths) for output in outputs)
+
+    def compact_keywords(self):
+        """Converts the keywords of the current media to
+        :class:`stocker.vocabulary.KeywordList` instances that share the
+        ``vocabulary`` of this StockManager.
+        """
+        for m in self.media:
+            if not isinstance(m.keywords, KeywordList) \
+               or m.keywords.vocabulary is not self.vocabulary:
+                m.keywords = KeywordList(self.vocabulary, m.keywords)
+
+    def keyword_frequencies(self):
+        """Returns how many media uses each keyword.
+
+        :return: A :class:`collections.Counter` of keywords.
+        """
+        import collections
+        vocabulary = self.vocabulary
+        keyword_ids = collections.Counter()
+        keywords = collections.Counter()
+        for m in self.media:
+            if isinstance(m.keywords, KeywordList) \
+               and m.keywords.vocabulary is vocabulary:
+                # counting integers is much cheaper than counting strings
+                keyword_ids.update(m.keywords.ids)
+            else:
+                keywords.update(m.keywords)
+
+        words = vocabulary.words
+        for keyword_id, count in keyword_ids.items():
+            keywords[words[keyword_id]] += count
+        return keywords
+
+    def find_keyword(self, keyword):
+        """Returns the media that have the given keyword.
+
+        :param str keyword: The keyword to search for.
+        :return list:
+        """
+        keyword_id = self.vocabulary.get(keyword)
+        result = []
+        for m in self.media:
+            keywords = m.keywords
+            if isinstance(keywords, KeywordList) \
+               and keywords.vocabulary is self.vocabulary:
+                if keyword_id is not None and keyword_id in keywords.ids:
+                    result.append(m)
+            elif keyword in keywords:
+                result.append(m)
+        return result
+
+    def build_search_index(self):
+        """Builds the ``search_index`` from the current media.
+
+        :return: The :class:`stocker.search.SearchIndex` instance.
+        """
+        from stocker.search import SearchIndex
+        self.search_index = SearchIndex(self.media)
+        return self.search_index
+
+    def search(self, all_of=None, any_of=None, none_of=None, prefix=None):
+        """Searches the media by their keywords and title/description words,
+        see :meth:`stocker.search.SearchIndex.search` for the arguments.
+
+        :return list: The matching media.
+        """
+        if self.search_index is None:
+            self.build_search_index()
+        return self.search_index.search(
+            all_of=all_of, any_of=any_of, none_of=none_of, prefix=prefix
+        )
+
+    def save_all(self, workers=8, compact=False):
+        """Writes the sidecar files of the changed media.
+
+        Only the media that are marked as dirty are written (see
+        :attr:`StockBase.is_dirty`). The files are written by a pool of
+        ``workers`` threads, each one is written to a temporary file first and
+        then renamed, so no sidecar file is left half written. The media that
+        can not be written are skipped and stored in the ``save_errors`` list
+        as ``(sidecar_path, exception)`` tuples.
+
+        :param int workers: The maximum number of files to write at the same
+          time.
+        :param bool compact: If True the JSON is written without indentation.
+        :return list: The media that are written.
+        """
+        dirty_media = [m for m in self.media if m.is_dirty]
+
+        def write(stock):
+            return _write_sidecar_safe(stock, compact)
+
+        if workers and workers > 1 and len(dirty_media) > 1:
+            import concurrent.futures
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers) as pool:
+                errors = list(pool.map(write, dirty_media))
+        else:
+            errors = [write(m) for m in dirty_media]
+
+        return self._sidecars_written(dirty_media, errors)
+
+    def _sidecars_written(self, media, errors):
+        """stores the errors in ``save_errors``, updates the indexes for the
+        written media and returns them
+        """
+        self.save_errors = []
+        saved = []
+        for stock, error in zip(media, errors):
+            if error is not None:
+                self.save_errors.append((stock.sidecar_full_path, error))
+                continue
+            saved.append(stock)
+            # the indexes are not thread safe, update them here
+            self.sidecar_written(stock)
+        return saved
+
+    def record_changed(self, stock, field, old_value, new_value):
+        """Called by the media of this StockManager when one of their fields is
+        changed, records the change in the ``journal`` and updates the
+        indexes.
+
+        :param stock: The changed media.
+        :param str field: The name of the changed field.
+        :param old_value: The old value of the field.
+        :param new_value: The new value of the field.
+        """
+        import time
+        if old_value is _missing:
+            old_value = None
+        record_id = stock.record_id
+        if field in ('path', 'filename'):
+            # identify the media with the path it had before this change
+            record_id = os.path.join(
+                old_value if field == 'path' else stock.path,
+                old_value if field == 'filename' else stock.filename
+            )
+        self.journal.append(Change(
+            record_id, field, _snapshot(old_value), _snapshot(new_value),
+            time.time()
+        ))
+        self._changed_media[id(stock)] = stock
+
+        if self.search_index is not None \
+           and field in self.search_fields and stock in self.search_index:
+            self.search_index.update(stock)
+
+    def changed_media(self):
+        """Returns the media that have entries in the ``journal``.
+
+        :return list: The changed media in the order of the ``media`` list.
+        """
+        changed_media = self._changed_media
+        return [m for m in self.media if id(m) in changed_media]
+
+    def clear_journal(self):
+        """Clears the ``journal``, for example after uploading the delta CSV
+        files.
+        """
+        self.journal = []
+        self._changed_media = {}
+
+    def sidecar_written(self, stock):
+        """Called by the media of this StockManager when their sidecar file is
+        written, updates the indexes.
+
+        :param stock: The media whose sidecar file is written.
+        """
+        if self.search_index is not None and stock in self.search_index:
+            self.search_index.update(stock)
 
-        Anything that has a .json sidecar file is considered as a media.
+    def add_media(self, stock):
+        """Adds the given media to this StockManager and updates the indexes.
 
-        :param path:
+        :param stock: A :class:`.StockBase` instance.
+        """
+        stock._manager = self
+        self.media.append(stock)
+        if self.search_index is not None:
+            self.search_index.add(stock)
+
+    def remove_media(self, *stocks):
+        """Removes the given media from this StockManager and updates the
+        indexes. The entries of the media in the ``journal`` are kept.
+
+        The ``media`` list is filtered once for all the given media, so
+        remove the media together instead of one by one. The media that are
+        not in the ``media`` list are skipped.
+
+        :param stocks: The :class:`.StockBase` instances of this
+          StockManager.
+        """
+        removed_ids = set(id(stock) for stock in stocks)
+        self.media[:] = [m for m in self.media if id(m) not in removed_ids]
+        for stock in stocks:
+            self._changed_media.pop(id(stock), None)
+            if self.search_index is not None and stock in self.search_index:
+                self.search_index.remove(stock)
+            stock._manager = None
+
+    def watch(self, path, **kwargs):
+        """Starts watching the given folder for media and sidecar file changes.
+
+        The returned watcher collects the file system events in the
+        background, call its :meth:`stocker.watch.MediaWatcher.process`
+        method to apply them to the ``media`` and the indexes. Use
+        :meth:`.discover_media` first to load the current media.
+
+        :param str path: The folder to watch.
+        :param kwargs: The other arguments of
+          :class:`stocker.watch.MediaWatcher`.
+        :return: The started :class:`stocker.watch.MediaWatcher` instance.
+        """
+        from stocker.watch import MediaWatcher
+        watcher = MediaWatcher(self, path, **kwargs)
+        watcher.start()
+        return watcher
+
+    def read_video_info(self, workers=None, cache=None):
+        """Reads the duration, resolution, frame rate and codec of the video
+        media, see :mod:`stocker.mp4`.
+
+        The media whose file extension is in ``media_file_extension['video']``
+        are read. The results are stored in the ``video_info`` dictionary by
+        the ``record_id`` of the media. The files that can not be read, like
+        empty or corrupt files, are skipped and stored in the
+        ``video_info_errors`` list as ``(media_path, exception)`` tuples.
+
+        :param int workers: The number of files to read at the same time. The
+          default is None, which reads them one after another.
+        :param cache: A :class:`stocker.mp4.VideoInfoCache` instance or the
+          path of a cache file. The files that are not changed since they are
+          cached are not read again.
+        :return dict: The ``video_info`` dictionary.
+        """
+        from stocker.mp4 import VideoInfoCache, read_video_infos
+        video_extensions = set(self.media_file_extension['video'])
+        videos = [
+            m for m in self.media
+            if os.path.splitext(m.filename)[1].lower() in video_extensions
+        ]
+
+        cache_path = None
+        if isinstance(cache, str):
+            cache_path = cache
+            cache = VideoInfoCache(cache_path)
+
+        media_paths = [m.record_id for m in videos]
+        self.video_info = {}
+        self.video_info_errors = []
+        for media_path, (info, error) in zip(
+                media_paths, read_video_infos(media_paths, workers, cache)):
+            if error is not None:
+                self.video_info_errors.append((media_path, error))
+            else:
+                self.video_info[media_path] = info
+
+        if cache_path is not None:
+            cache.save()
+        return self.video_info
+
+    def find_invalid_poster_timecodes(self):
+        """Returns the media whose ``poster_timecode`` is not in the clip,
+        using the ``video_info`` read by :meth:`.read_video_info`.
+
+        :return list: The media that have a poster timecode that is after the
+          end of the clip or that can not be parsed.
+        """
+        result = []
+        for m in self.media:
+            info = self.video_info.get(m.record_id)
+            if info is None or not getattr(m, 'poster_timecode', None):
+                continue
+            try:
+                if not info.contains_timecode(m.poster_timecode):
+                    result.append(m)
+            except ValueError:
+                result.append(m)
+        return result
+
+    def build_catalog(self):
+        """Creates a columnar catalog from the discovered media.
+
+        The catalog uses much less memory than the ``media`` list and can be
+        filtered quickly, see :class:`stocker.catalog.Catalog`.
+
+        :return: A :class:`stocker.catalog.Catalog` instance.
+        """
+        from stocker.catalog import Catalog
+        return Catalog(self.media)
+
+    def scan_directory(self, path, recursive=False, include=None,
+                       exclude=None, max_depth=None, unpaired=False,
+                       listed_folders=None, relative_folder=''):
+        """Lists the given folder once and pairs the media files with their
+        JSON sidecar files.
+
+        Only files with one of the extensions in ``media_file_extension`` are
+        considered as media. If there are more than one media file with the
+        same base name, the one that has the extension that comes first in
+        ``media_file_extension`` is used.
+
+        In recursive mode the sub folders are scanned with the same rules. The
+        sub folders that match one of the ``exclude`` patterns are skipped
+        without being listed.
+
+        The ``include`` and ``exclude`` patterns are shell style wildcards
+        (see :mod:`fnmatch`) and are matched against both the name and the
+        path relative to ``path`` (with "/" separators) of a file or folder.
+
+        :param str path: The folder to scan.
+        :param bool recursive: If True the sub folders are also scanned. The
+          default is False.
+        :param list include: If given, only the media files that match one of
+          these patterns are considered, like ``['*.mov', 'shoot1/*']``.
+        :param list exclude: The files and folders that match one of these
+          patterns are skipped, like ``['proxies', '.cache', '*_render']``.
+        :param int max_depth: The maximum depth of the sub folders to scan in
+          recursive mode, 0 is the given folder only, 1 is the folder and its
+          direct children etc. The default is None which means no limit.
+        :param bool unpaired: If True the media files that don't have a
+          sidecar file are also listed with None as their sidecar filename.
+          The default is False.
+        :param list listed_folders: If given, the paths of all the listed
+          folders are appended to this list, including the ones that don't
+          have any media.
+        :param str relative_folder: The path of ``path`` relative to the folder
+          that the ``include`` and ``exclude`` patterns are relative to, with
+          "/" separators and a trailing "/", like ``"shoot1/day1/"``. Used to
+          scan a sub folder with the patterns of its parent. The default is an
+          empty string.
+        :return list: A list of ``(path, media_filename, sidecar_filename)``
+          tuples sorted by the folder and the base name of the files.
+        """
+        import os
+        media_extensions = {}
+        for extensions in self.media_file_extension.values():
+            for ext in extensions:
+                media_extensions.setdefault(ext, len(media_extensions))
+
+        include_match = _compile_patterns(include)
+        exclude_match = _compile_patterns(exclude)
+
+        def is_excluded(name, relative_path):
+            return exclude_match is not None and (
+                exclude_match(name) or exclude_match(relative_path)
+            )
+
+        # (folder, [(basename, media filename, sidecar filename), ...])
+        chunks = []
+        folder_count = entry_count = 0
+        # (folder, relative folder, depth)
+        folders = [(path, relative_folder, 0)]
+        while folders:
+            folder, relative_folder, depth = folders.pop()
+            folder_count += 1
+            if listed_folders is not None:
+                listed_folders.append(folder)
+            # basename -> [media filename, sidecar filename, media priority]
+            pairs = {}
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    entry_count += 1
+                    name = entry.name
+                    # same as os.path.splitext() for the media and sidecar
+                    # files but much faster
+                    dot = name.rfind('.')
+                    if dot > 0:
+                        basename = name[:dot]
+                        ext = name[dot:].lower()
+                    else:
+                        basename = name
+                        ext = ''
+                    if ext == '.json':
+                        if entry.is_file() and not is_excluded(
+                                name, relative_folder + name):
+                            pair = pairs.get(basename)
+                            if pair is None:
+                                pairs[basename] = [None, name, None]
+                            else:
+                                pair[1] = name
+                    elif ext in media_extensions:
+                        if not entry.is_file() \
+                           or is_excluded(name, relative_folder + name) \
+                           or (include_match is not None
+                               and not include_match(name)
+                               and not include_match(relative_folder + name)):
+                            continue
+                        priority = media_extensions[ext]
+                        pair = pairs.get(basename)
+                        if pair is None:
+                            pairs[basename] = [name, None, priority]
+                        elif pair[0] is None or priority < pair[2]:
+                            pair[0] = name
+                            pair[2] = priority
+                    elif recursive \
+                            and (max_depth is None or depth < max_depth) \
+                            and entry.is_dir(follow_symlinks=False) \
+                            and not is_excluded(name, relative_folder + name):
+                        folders.append(
+                            (entry.path, '%s%s/' % (relative_folder, name),
+                             depth + 1)
+                        )
+
+            folder_pairs = [
+                (basename, pair[0], pair[1])
+                for basename, pair in pairs.items()
+                if pair[0] is not None and (unpaired or pair[1] is not None)
+            ]
+            folder_pairs.sort()
+            chunks.append((folder, folder_pairs))
+
+        chunks.sort(key=lambda chunk: chunk[0])
+        result = [
+            (folder, media_filename, sidecar_filename)
+            for folder, folder_pairs in chunks
+            for basename, media_filename, sidecar_filename in folder_pairs
+        ]
+        self.stats.count('folders_listed', folder_count)
+        self.stats.count('files_listed', entry_count)
+        return result
+
+    def discover_media(self, path, workers=None, executor='thread',
+                       index=None, recursive=False, include=None,
+                       exclude=None, max_depth=None, lazy=False,
+                       prefetch=1000, embedded=False):
+        """Discovers media in the given path.
+
+        Anything that has a .json sidecar file is considered as a media. The
+        folder is listed only once, see :meth:`.scan_directory`. If
+        ``embedded`` is True, the JPEG files without a sidecar file are also
+        considered as media and their fields are read from their embedded XMP
+        and IPTC metadata, see :mod:`stocker.jpeg`.
+
+        The sidecar files can be read and parsed in parallel by setting
+        ``workers``. The discovered media are always in the same order
+        regardless of the number of workers. Sidecar files that can not be
+        read or parsed do not stop the discovery, they are skipped and stored
+        in the ``discovery_errors`` list as ``(sidecar_path, exception)``
+        tuples. The keys of the sidecar files that are not fields of the media
+        are not loaded, they are stored in the ``unknown_keys`` list as
+        ``(sidecar_path, [key, ...])`` tuples and counted in the ``stats``.
+
+        :param path: The folder to search media in.
+        :param int workers: The number of sidecar files to read at the same
+          time. The default is None, which reads them one after another.
+        :param str executor: One of "thread" or "process". Threads are good
+          for slow (network) file systems, processes are good for big sidecar
+          files where the JSON parsing is the bottleneck. The default is
+          "thread".
+        :param index: A :class:`stocker.index.DiscoveryIndex` instance or the
+          path of an index file. If given, only the sidecar files that are
+          added or changed since the last scan are parsed, the others are
+          loaded from the index.
+        :param bool recursive: If True the sub folders are also searched.
+        :param list include: Shell style wildcards of the media files to
+          include, see :meth:`.scan_directory`.
+        :param list exclude: Shell style wildcards of the files and folders to
+          skip, see :meth:`.scan_directory`.
+        :param int max_depth: The maximum depth of the sub folders to search in
+          recursive mode.
+        :param bool lazy: If True the sidecar files are not read, the media
+          only have their ``path`` and ``filename`` and the other fields are
+          loaded on first access. The ``index`` is not used in lazy mode.
+          Sidecar files that can not be read are stored in the
+          ``discovery_errors`` when they are loaded, and the media is removed
+          from the ``media`` list by the next :meth:`.load_media` call or
+          export, until then its fields have their default values.
+        :param int prefetch: The number of the lazy media to load together
+          when a lazy media is loaded, it is loaded with the ones that come
+          after it in the ``media`` list. The sidecar files of a batch are
+          read with the given ``workers`` and ``executor``.
+        :param bool embedded: If True the files with one of the extensions in
+          ``embedded_metadata_extensions`` that don't have a sidecar file are
+          discovered by reading their embedded metadata. The files are read
+          with the given ``workers`` and ``executor``, also in lazy mode. The
+          files that can not be read are skipped and stored in the
+          ``discovery_errors`` list as ``(media_path, exception)`` tuples. A
+          sidecar file always takes precedence over the embedded metadata.
+          The default is False.
         :return:
         """
+        stats = self.stats
+        with stats.phase('discover_media'):
+            if lazy:
+                self._discover_media_lazy(
+                    path, workers, executor, recursive, include, exclude,
+                    max_depth, prefetch, embedded
+                )
+            else:
+                self._discover_media(
+                    path, workers, executor, index, recursive, include,
+                    exclude, max_depth, embedded
+                )
+        stats.count('media_discovered', len(self.media))
+        stats.count('errors', len(self.discovery_errors))
+
+    def _discover_media(self, path, workers, executor, index, recursive,
+                        include, exclude, max_depth, embedded):
+        """discovers the media, see discover_media()
+        """
         import os
-        import glob
         self.media = []
-        # get the json files
-        for file in glob.glob(os.path.join(path, '*.json')):
-            gst = GenericStock()
-            gst.from_file(file)
-            if gst.filename != '':
-                self.media.append(gst)
+        self.discovery_errors = []
+        self.unknown_keys = []
+        stats = self.stats
+
+        # the index drops the entries of the folders that are listed but have
+        # no sidecar files anymore
+        listed_folders = []
+        with stats.phase('listing'):
+            pairs = self.scan_directory(
+                path, recursive=recursive, include=include, exclude=exclude,
+                max_depth=max_depth, unpaired=embedded,
+                listed_folders=listed_folders
+            )
+        embedded_pairs = []
+        if embedded:
+            pairs, embedded_pairs = self._split_embedded_pairs(pairs)
+        sidecar_paths = [
+            os.path.join(folder, sidecar_filename)
+            for folder, media_filename, sidecar_filename in pairs
+        ]
+
+        def reader(paths):
+            stats.count('sidecars_parsed', len(paths))
+            return self._read_sidecars(paths, workers, executor)
+
+        with stats.phase('parsing'):
+            if index is None:
+                results = reader(sidecar_paths)
+            elif isinstance(index, str):
+                from stocker.index import DiscoveryIndex
+                with DiscoveryIndex(index) as discovery_index:
+                    results = discovery_index.read(
+                        sidecar_paths, reader, listed_folders, path
+                    )
+            else:
+                results = index.read(
+                    sidecar_paths, reader, listed_folders, path
+                )
+            if stats.enabled:
+                # the files are read one by one while iterating the results
+                # in serial mode, read them here to measure them separately
+                results = list(results)
+            items = zip(pairs, sidecar_paths, results)
+
+            if embedded_pairs:
+                embedded_items = self._read_embedded_pairs(
+                    embedded_pairs, workers, executor
+                )
+                if stats.enabled:
+                    embedded_items = list(embedded_items)
+                # keep the media sorted by the folder and the base name
+                import heapq
+                items = heapq.merge(
+                    items, embedded_items,
+                    key=lambda item: (
+                        item[0][0], os.path.splitext(item[0][1])[0]
+                    )
+                )
+
+        with stats.phase('media_creation'):
+            for (folder, media_filename, sidecar_filename), source_path, \
+                    (data, error) in items:
+                if error is not None:
+                    self.discovery_errors.append((source_path, error))
+                    continue
+                self.media.append(
+                    self._create_stock(folder, media_filename, data)
+                )
+
+        self.search_index = None
+        if self.index_search:
+            with stats.phase('search_indexing'):
+                self.build_search_index()
+
+    def _split_embedded_pairs(self, pairs):
+        """splits the pairs of scan_directory(unpaired=True) to the ones with
+        a sidecar file and the ones that can be read from the embedded
+        metadata, the others are dropped
+        """
+        embedded_extensions = set(self.embedded_metadata_extensions)
+        sidecar_pairs = []
+        embedded_pairs = []
+        for pair in pairs:
+            if pair[2] is not None:
+                sidecar_pairs.append(pair)
+            elif os.path.splitext(pair[1])[1].lower() in embedded_extensions:
+                embedded_pairs.append(pair)
+        return sidecar_pairs, embedded_pairs
+
+    def _read_embedded_pairs(self, pairs, workers, executor):
+        """reads the embedded metadata of the given media, returns an
+        iterable of ``(pair, media_path, (data, error))`` tuples
+        """
+        from stocker.jpeg import _read_embedded_metadata_safe
+        media_paths = [
+            os.path.join(folder, media_filename)
+            for folder, media_filename, sidecar_filename in pairs
+        ]
+        self.stats.count('embedded_parsed', len(media_paths))
+        return zip(
+            pairs, media_paths,
+            self._read_sidecars(
+                media_paths, workers, executor,
+                reader=_read_embedded_metadata_safe
+            )
+        )
+
+    def _discover_media_lazy(self, path, workers, executor, recursive,
+                             include, exclude, max_depth, prefetch,
+                             embedded):
+        """discovers the media without reading the sidecar files, see
+        discover_media()
+        """
+        import os
+        if executor not in self.executors:
+            # validate it now instead of the first access to a media
+            self._read_sidecars([], executor=executor)
+
+        self.media = []
+        self.discovery_errors = []
+        self.unknown_keys = []
+        self.search_index = None
+        self._prefetch = (prefetch, workers, executor)
+        self._lazy_media_pending = True
+        self._failed_media = []
+        stats = self.stats
+
+        with stats.phase('listing'):
+            pairs = self.scan_directory(
+                path, recursive=recursive, include=include, exclude=exclude,
+                max_depth=max_depth, unpaired=embedded
+            )
+
+        embedded_data = {}
+        if embedded:
+            # there is no sidecar file to load later, read them now together
+            pairs, embedded_pairs = self._split_embedded_pairs(pairs)
+            with stats.phase('parsing'):
+                for pair, media_path, (data, error) in \
+                        self._read_embedded_pairs(
+                            embedded_pairs, workers, executor):
+                    if error is not None:
+                        self.discovery_errors.append((media_path, error))
+                    else:
+                        embedded_data[pair[0], pair[1]] = data
+            if embedded_data:
+                import heapq
+                pairs = heapq.merge(
+                    pairs, [(f, m, None) for f, m in embedded_data],
+                    key=lambda pair: (pair[0], os.path.splitext(pair[1])[0])
+                )
+
+        with stats.phase('media_creation'):
+            media = self.media
+            new_lazy = GenericStock._new_lazy
+            for folder, media_filename, sidecar_filename in pairs:
+                if sidecar_filename is None:
+                    media.append(self._create_stock(
+                        folder, media_filename,
+                        embedded_data[folder, media_filename]
+                    ))
+                    continue
+                if not sidecar_filename.endswith('.json'):
+                    # the sidecar file can not be found from the media file
+                    # name later, like "clip.JSON", read it now
+                    sidecar_path = os.path.join(folder, sidecar_filename)
+                    data, error = _read_sidecar_safe(sidecar_path)
+                    if error is not None:
+                        self.discovery_errors.append((sidecar_path, error))
+                        continue
+                    stock = new_lazy(folder, media_filename, self, len(media))
+                    self._load_sidecar(stock, data, None)
+                else:
+                    stock = new_lazy(folder, media_filename, self, len(media))
+                media.append(stock)
+
+        if self.index_search:
+            with stats.phase('search_indexing'):
+                # the index needs all the fields, and the media that can not
+                # be loaded should not be indexed
+                self.load_media(workers=workers, executor=executor)
+                self.build_search_index()
+
+    def load_media(self, media=None, workers=None, executor='thread'):
+        """Loads the sidecar files of the lazy media, see
+        :meth:`.discover_media`.
+
+        The media whose sidecar files can not be read are removed from the
+        ``media`` list and the indexes, like they are skipped by the eager
+        discovery, also the ones that failed to load on their first access
+        before. The exports call this method first, so these media are never
+        exported.
+
+        :param list media: The media to load. The default is None, which loads
+          all the media.
+        :param int workers: The number of sidecar files to read at the same
+          time.
+        :param str executor: One of "thread" or "process".
+        :return int: The number of loaded media.
+        """
+        if media is None:
+            media = self.media
+            self._lazy_media_pending = False
+        loaded_count = self._load_media(media, workers, executor)
+        failed_media = self._failed_media
+        if failed_media:
+            self._failed_media = []
+            self.remove_media(*failed_media)
+            # keep the positions of the lazy media for the prefetch
+            for position, stock in enumerate(self.media):
+                if getattr(stock, '_lazy', None) is not None:
+                    object.__setattr__(stock, '_lazy', position)
+        return loaded_count
+
+    def _load_media(self, media, workers, executor):
+        """loads the given lazy media, the ones whose sidecar files can not
+        be read are kept in the ``_failed_media`` to be removed later, as they
+        can not be removed while the media list is iterated
+        """
+        lazy_media = [m for m in media if not m.is_loaded]
+        if not lazy_media:
+            return 0
+        self.stats.count('sidecars_parsed', len(lazy_media))
+        results = self._read_sidecars(
+            [m.sidecar_full_path for m in lazy_media], workers, executor
+        )
+        for stock, (data, error) in zip(lazy_media, results):
+            self._load_sidecar(stock, data, error)
+            if error is not None:
+                self._failed_media.append(stock)
+        return len(lazy_media)
+
+    def _load_pending_media(self):
+        """loads the lazy media and removes the ones that can not be loaded
+        before the media list is iterated by an export
+        """
+        if self._lazy_media_pending or self._failed_media:
+            workers, executor = getattr(
+                self, '_prefetch', (1, None, 'thread')
+            )[1:]
+            self.load_media(workers=workers, executor=executor)
+
+    def _load_lazy_stock(self, stock, position):
+        """loads the given lazy media with the next ones in the media list,
+        called by the media on their first field access
+        """
+        prefetch, workers, executor = getattr(
+            self, '_prefetch', (1, None, 'thread')
+        )
+        media = self.media
+        if prefetch > 1 and 0 <= position < len(media) \
+           and media[position] is stock:
+            batch = media[position:position + prefetch]
+        else:
+            batch = [stock]
+        self._load_media(batch, workers, executor)
+
+    def _load_sidecar(self, stock, data, error):
+        """fills the fields of a lazy media with the given sidecar data
+        """
+        if error is not None:
+            self.discovery_errors.append((stock.sidecar_full_path, error))
+        elif data:
+            fields = stock.fields
+            unknown_keys = [k for k in data if k not in fields]
+            if unknown_keys:
+                self._unknown_keys_found(stock, unknown_keys)
+        stock._load_sidecar_data(data)
+        if self.intern_keywords:
+            object.__setattr__(
+                stock, 'keywords', KeywordList(self.vocabulary, stock.keywords)
+            )
+
+    def _unknown_keys_found(self, stock, unknown_keys):
+        """records the sidecar keys of the given media that are not fields
+        """
+        self.unknown_keys.append((stock.sidecar_full_path, unknown_keys))
+        self.stats.count('unknown_keys', len(unknown_keys))
+
+    def _create_stock(self, folder, media_filename, data):
+        """creates a clean GenericStock that belongs to this StockManager from
+        the given sidecar data
+        """
+        gst = GenericStock()
+        unknown_keys = gst.from_dict(data)
+        gst.path = folder
+        gst.filename = media_filename
+        if unknown_keys:
+            self._unknown_keys_found(gst, unknown_keys)
+        if self.intern_keywords:
+            gst.keywords = KeywordList(self.vocabulary, gst.keywords)
+        gst._manager = self
+        gst.mark_clean()
+        return gst
+
+    @classmethod
+    def _read_sidecars(cls, sidecar_paths, workers=None, executor='thread',
+                       reader=None):
+        """Reads the given sidecar files, in parallel if ``workers`` is
+        bigger than 1.
+
+        :param list sidecar_paths: The sidecar file paths.
+        :param int workers: The number of parallel workers.
+        :param str executor: One of "thread" or "process".
+        :param reader: A module level function that accepts a path and returns
+          a ``(data, error)`` tuple. The default is None, which reads the
+          paths as JSON sidecar files.
+        :return: An iterable of ``(data, error)`` tuples in the same order with
+          the given paths.
+        """
+        if executor not in cls.executors:
+            raise ValueError(
+                '%s.executor should be one of %s, not %r' % (
+                    cls.__name__, ', '.join(sorted(cls.executors)), executor
+                )
+            )
+
+        if reader is None:
+            reader = _read_sidecar_safe
+
+        if not workers or workers <= 1 or len(sidecar_paths) <= 1:
+            return map(reader, sidecar_paths)
+
+        import concurrent.futures
+        pool_class = concurrent.futures.ThreadPoolExecutor
+        chunk_size = 1
+        if executor == 'process':
+            pool_class = concurrent.futures.ProcessPoolExecutor
+            # send the paths in chunks to keep the IPC overhead low
+            chunk_size = max(1, len(sidecar_paths) // (workers * 4))
+
+        with pool_class(max_workers=workers) as pool:
+            return list(
+                pool.map(reader, sidecar_paths, chunksize=chunk_size)
+            )
+
+
+Change = collections.namedtuple(
+    'Change', ['record_id', 'field', 'old_value', 'new_value', 'timestamp']
+)
+Change.__doc__ = """An entry of the StockManager change journal"""
+
+
+def _snapshot(value):
+    """Returns a copy of the given value if it is a list, so the journal is not
+    changed by the later in place changes.
+    """
+    if isinstance(value, (list, KeywordList)):
+        return list(value)
+    return value
+
+
+def _write_sidecar_safe(stock, compact=False):
+    """Writes the sidecar file of the given media, returns the OSError instead
+    of raising it.
+
+    :return: None or the OSError.
+    """
+    try:
+        stock._write_sidecar_file(compact=compact)
+    except OSError as e:
+        return e
+
+
+def _compile_patterns(patterns):
+    """Compiles the given shell style wildcards in to one matcher function.
+
+    :param list patterns: A list of shell style wildcards.
+    :return: The ``match`` method of the compiled regular expression or None
+      if no pattern is given.
+    """
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    import fnmatch
+    import re
+    return re.compile(
+        '|'.join('(?:%s)' % fnmatch.translate(p) for p in patterns)
+    ).match
+
+
+def read_sidecar(path):
+    """Reads and parses the given JSON sidecar file.
+
+    :param str path: The path of the sidecar file.
+    :return dict: The metadata in the sidecar file.
+    """
+    from stocker import json_backend
+    data = json_backend.read_file(path)
+
+    if not isinstance(data, dict):
+        raise ValueError('%s does not contain a JSON object' % path)
+
+    return data
+
+
+def _read_sidecar_safe(path):
+    """Reads the given sidecar file without raising any errors.
+
+    This is a module level function so it can be used with process pools.
+
+    :param str path: The path of the sidecar file.
+    :return: A ``(data, error)`` tuple, one of them is always None.
+    """
+    try:
+        return read_sidecar(path), None
+    except (OSError, ValueError) as e:
+        return None, e
+
+
+# marks the attributes that are not set yet
+_missing = object()
+
+# stock class -> the default values of its fields except path and filename,
+# used to fill the fields of the lazy media
+_field_defaults = {}
 
 
 class StockBase:
     """The base class for other stock classes
+
+    The stock classes use ``__slots__`` to keep the memory usage of big
+    catalogs low, so they only accept the attributes listed in their
+    ``__slots__``. The ``fields`` class attribute holds the names of all the
+    public attributes of a class, including the ones of its base classes.
+
+    Changing any of the ``fields`` marks the instance as dirty and adds the
+    field to the ``changed_fields``, reading from or writing to the sidecar
+    file marks it as clean again. If the instance belongs to a StockManager
+    the changes are also recorded in the journal of the StockManager. Changes
+    made in place, like appending to the ``keywords`` list, are not tracked,
+    call :meth:`.mark_dirty` after them.
+
+    The changes are tracked only for the classes whose ``track_changes`` is
+    True. The site specific classes are mostly created for a single CSV row,
+    so they do not track the changes and their instances are always dirty.
+
+    The media discovered with ``StockManager.discover_media(lazy=True)`` only
+    have their ``path`` and ``filename`` set, the other fields are loaded from
+    the sidecar file on the first access to any of them, see
+    :attr:`.is_loaded`.
     """
 
+    __slots__ = ('filename', 'path', 'title', 'keywords', '_manager',
+                 '_changed_fields', '_lazy')
+    fields = frozenset(('filename', 'path', 'title', 'keywords'))
+
     csv_header = ''
+    # header name -> (attribute name or callable, always quote)
+    csv_columns = {}
+    # deprecated, a str.format() template of the CSV rows which is used
+    # instead of the csv_columns if it is set, see _csv_format_values()
     csv_format = ''
+    # the upload limits of the stock site for a single CSV file, None means no
+    # limit, used by StockManager.write_csv_shards() and export_all()
+    csv_max_rows = None
+    csv_max_bytes = None
     json_attrs = ['title', 'keywords']
+    # if False the attributes are set without any change tracking
+    track_changes = True
 
     def __init__(self, filename="", path="", title="", keywords=None):
 
         if keywords is None:
             keywords = []
 
-        self.filename = filename
-        self.path = path
-        self.title = title
-        self.keywords = keywords
+        # a new instance has no manager and all of its fields are already
+        # changed, so the attributes are set without the change tracking
+        set_attr = object.__setattr__
+        # the StockManager that is notified about the changes
+        set_attr(self, '_manager', None)
+        # a new instance is not saved yet, the shared fields set is used
+        # instead of a set per instance
+        set_attr(self, '_changed_fields', self.fields)
+
+        set_attr(self, 'filename', filename)
+        set_attr(self, 'path', path)
+        set_attr(self, 'title', title)
+        set_attr(self, 'keywords', keywords)
+
+    def __setattr__(self, name, value):
+        changed_fields = self._changed_fields
+        if self._manager is None and changed_fields is not None \
+           and (changed_fields is self.fields or name in changed_fields):
+            # already changed and there is no journal to record the change to
+            object.__setattr__(self, name, value)
+            return
+
+        if name not in self.fields:
+            object.__setattr__(self, name, value)
+            return
+
+        old_value = getattr(self, name, _missing)
+        object.__setattr__(self, name, value)
+        if old_value is _missing or old_value != value:
+            self.mark_dirty(name)
+            if self._manager is not None:
+                self._manager.record_changed(self, name, old_value, value)
+
+    @property
+    def is_dirty(self):
+        """True if the data is changed after it is read from or written to the
+        sidecar file.
+        """
+        return bool(self._changed_fields)
+
+    @property
+    def changed_fields(self):
+        """The names of the fields that are changed after the data is read
+        from or written to the sidecar file.
+        """
+        return frozenset(self._changed_fields or ())
+
+    def mark_dirty(self, field=None):
+        """Marks the data as changed, use it after changing the attributes in
+        place.
+
+        :param str field: The name of the changed field. The default is None,
+          which marks all the fields as changed.
+        """
+        changed_fields = self._changed_fields
+        if field is None:
+            self._changed_fields = self.fields
+        elif changed_fields is None:
+            # the set is created on the first change only
+            self._changed_fields = set((field,))
+        elif changed_fields is not self.fields:
+            changed_fields.add(field)
+
+    def mark_clean(self):
+        """Marks the data as saved. The instances of the classes that do not
+        track the changes are always dirty.
+        """
+        if self.track_changes:
+            self._changed_fields = None
+
+    def __getattr__(self, name):
+        # only called for the attributes that are not set, which are the
+        # fields of a lazy media that is not loaded yet
+        position = getattr(self, '_lazy', None) if name in self.fields \
+            else None
+        if position is not None:
+            if self._manager is not None:
+                self._manager._load_lazy_stock(self, position)
+            else:
+                self._load_sidecar_data(
+                    *_read_sidecar_safe(self.sidecar_full_path)
+                )
+            return object.__getattribute__(self, name)
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (
+                self.__class__.__name__, name
+            )
+        )
+
+    def __getstate__(self):
+        # the copies do not belong to the StockManager, a lazy copy loads its
+        # own sidecar file
+        state = dict(getattr(self, '__dict__', ()))
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name == '_manager':
+                    continue
+                try:
+                    state[name] = object.__getattribute__(self, name)
+                except AttributeError:
+                    # an unset slot, like the fields of a lazy media
+                    pass
+        changed_fields = state.get('_changed_fields')
+        if changed_fields is not None and changed_fields is not self.fields:
+            # the copies should not share the same set
+            state['_changed_fields'] = set(changed_fields)
+        return state
+
+    def __setstate__(self, state):
+        # the attributes are set without the change tracking as the
+        # _manager and _changed_fields are not set yet
+        set_attr = object.__setattr__
+        set_attr(self, '_manager', None)
+        for name, value in state.items():
+            if name == '_changed_fields' and value == self.fields:
+                # unpickled as an equal but a different frozenset
+                value = self.fields
+            set_attr(self, name, value)
+
+    @classmethod
+    def _new_lazy(cls, path, filename, manager=None, position=-1):
+        """creates a media whose fields are loaded from its sidecar file on
+        first access, ``position`` is its index in the ``media`` of the
+        ``manager``
+        """
+        stock = cls.__new__(cls)
+        object.__setattr__(stock, '_manager', manager)
+        object.__setattr__(stock, '_changed_fields', None)
+        object.__setattr__(stock, '_lazy', position)
+        object.__setattr__(stock, 'path', path)
+        object.__setattr__(stock, 'filename', filename)
+        return stock
+
+    @property
+    def is_loaded(self):
+        """False if this is a lazy media whose sidecar file is not loaded yet.
+        """
+        return getattr(self, '_lazy', None) is None
+
+    def _load_sidecar_data(self, data, error=None):
+        """sets the fields of a lazy media from the given sidecar data without
+        marking them as changed, the fields that are not in the data, or all
+        of them if the sidecar file can not be read, get their default values
+        """
+        object.__setattr__(self, '_lazy', None)
+        if data is None:
+            data = {}
+        defaults = _field_defaults.get(self.__class__)
+        if defaults is None:
+            instance = self.__class__()
+            defaults = _field_defaults[self.__class__] = dict(
+                (name, getattr(instance, name)) for name in self.fields
+                if name != 'path' and name != 'filename'
+            )
+        for name, value in defaults.items():
+            if name in data:
+                value = data[name]
+            elif value.__class__ is list:
+                # do not share the mutable defaults
+                value = []
+            object.__setattr__(self, name, value)
+
+    @property
+    def record_id(self):
+        """The full path of the media file, used to identify the media in the
+        change journal.
+        """
+        return os.path.join(self.path, self.filename)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = set()
+        for klass in cls.__mro__:
+            fields.update(
+                name for name in klass.__dict__.get('__slots__', ())
+                if not name.startswith('_')
+            )
+        cls.fields = frozenset(fields)
+        if not cls.track_changes and '__setattr__' not in cls.__dict__:
+            # no Python level hook for every attribute assignment
+            cls.__setattr__ = object.__setattr__
 
     def to_csv(self):
         """abstract method
         """
         raise NotImplementedError()
 
-    def from_file(self, path):
-        """Extract metadata from the given JSON file
+    def _csv_format_values(self):
+        """returns the values of the deprecated csv_format template, the lists
+        are joined with commas
         """
-        import json
-        try:
-            with open(path) as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            print(path)
-            raise e
+        values = {}
+        for name in self.fields:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                value = ','.join(value)
+            values[name] = value
+        return values
+
+    def from_file(self, path, media_filename=None):
+        """Extract metadata from the given JSON file
 
-        for k in data:
-            self.__setattr__(k, data[k])
+        :param str path: The path of the JSON file.
+        :param str media_filename: The filename of the media file that resides
+          beside the JSON file. If not given the folder is searched for a file
+          with the same base name.
+        """
+        self.from_dict(read_sidecar(path))
 
         # get the filename from the json filename
         import os
         folder_path, filename = os.path.split(path)
-        basename, ext = os.path.splitext(filename)
 
-        import glob
-        files = glob.glob(os.path.join(folder_path, '%s.*' % basename))
-        if files:
-            for file in files:
-                if not file.endswith('.json'):
-                    self.path, self.filename = os.path.split(file)
-                    break
+        if media_filename is not None:
+            self.path = folder_path
+            self.filename = media_filename
+        else:
+            basename, ext = os.path.splitext(filename)
+
+            import glob
+            files = glob.glob(os.path.join(folder_path, '%s.*' % basename))
+            if files:
+                for file in files:
+                    if not file.endswith('.json'):
+                        self.path, self.filename = os.path.split(file)
+                        break
+
+        self.mark_clean()
+
+    def from_dict(self, data):
+        """Fills the attributes from the given dictionary
+
+        The keys that are not in the ``fields`` of the class are not set, they
+        are returned so the typos in the sidecar files can be reported.
+
+        :param dict data: The metadata, generally read from a sidecar file.
+        :return list: The keys that are not in the ``fields``.
+        """
+        fields = self.fields
+        unknown_keys = []
+        for k in data:
+            if k in fields:
+                self.__setattr__(k, data[k])
+            else:
+                unknown_keys.append(k)
+        return unknown_keys
 
     def from_sidecar_file(self):
         """Extracts metadata from the JSON file that resides right beside the
@@ -141,17 +1615,34 @@ class StockBase:
         # with the same file name but with json extension
         self.from_file(self.sidecar_full_path)
 
-    def to_sidecar_file(self):
+    def to_sidecar_file(self, compact=False):
         """dumps the data to sidecar file
+
+        The file is written to a temporary file first which is then renamed
+        to the sidecar file, so the sidecar file is never left half written.
+
+        :param bool compact: If True the JSON is written without indentation
+          and whitespace. The default is False.
         """
-        import json
+        self._write_sidecar_file(compact=compact)
+        if self._manager is not None:
+            self._manager.sidecar_written(self)
+
+    def _write_sidecar_file(self, compact=False):
+        """Writes the sidecar file without notifying the StockManager, so it
+        can be called from worker threads.
+        """
+        from stocker import json_backend
 
         raw_data = {}
         for k in self.json_attrs:
             raw_data[k] = self.__getattribute__(k)
 
-        with open(self.sidecar_full_path, 'w') as f:
-            json.dump(raw_data, f, indent=2)
+        # KeywordList instances are expanded to lists by the backends
+        json_backend.write_file(
+            self.sidecar_full_path, raw_data, indent=not compact, atomic=True
+        )
+        self.mark_clean()
 
     @property
     def sidecar_filename(self):
@@ -175,6 +1666,9 @@ class GenericStock(StockBase):
     author of this library has dealt with.
     """
 
+    __slots__ = ('description', 'category1', 'category2', 'country',
+                 'poster_timecode', 'releases', 'editorial')
+
     csv_header = 'filename,title,description,category,keywords,country,' \
                  'poster_timecode,releases,editorial'
     json_attrs = [
@@ -240,7 +1734,17 @@ class GenericStock(StockBase):
         'Vintage': 'Culture and Religion'
     }
 
-    from_adobe_stock_categories = {}
+    # The AdobeStock categories that no generic category maps to. The reverse
+    # of the to_adobe_stock_categories is computed by the category_index
+    # below and set as from_adobe_stock_categories.
+    unmapped_adobe_stock_categories = {
+        'Drinks': 'Food and drink',
+        'The Environment': 'Nature',
+        'States of Mind': 'People',
+        'Hobbies and Leisure': 'Sports/Recreation',
+        'Plants and Flowers': 'Nature',
+        'Social Issues': 'People',
+    }
 
     def __init__(self, filename="", path="", title="", description="",
                  category1="", category2="", keywords=None, country="",
@@ -252,54 +1756,51 @@ class GenericStock(StockBase):
         if releases is None:
             releases = []
 
-        self.description = None
-        if description:
-            self.description = description
-        elif title:
-            self.description = title
+        if not description:
+            description = title or None
 
+        # see StockBase.__init__()
+        set_attr = object.__setattr__
+        set_attr(self, 'description', description)
         if not title:
-            self.title = self.description
+            set_attr(self, 'title', description)
 
-        self.category1 = category1
-        self.category2 = category2
-        self.country = country
-        self.poster_timecode = poster_timecode
-        self.releases = releases
-        self.editorial = editorial
-
-        # initialize the from_adobe_stock_categories
-        for key, value in self.to_adobe_stock_categories.items():
-            if value not in self.from_adobe_stock_categories:
-                self.from_adobe_stock_categories[value] = key
+        set_attr(self, 'category1', category1)
+        set_attr(self, 'category2', category2)
+        set_attr(self, 'country', country)
+        set_attr(self, 'poster_timecode', poster_timecode)
+        set_attr(self, 'releases', releases)
+        set_attr(self, 'editorial', editorial)
 
     def from_(self, other_stock):
         """converts from other stock
 
-        :param other_stock: A GenericStock derivative
+        The converter registered for the class of the other stock, see
+        :func:`.get_converter`, fills this instance. Only the fields that the
+        other stock has a value for are set, the others are kept as they are.
+        If the other stock is a GenericStock, all the fields except the
+        ``path`` are copied.
+
+        :param other_stock: A StockBase derivative
+        :raises TypeError: If there is no converter for the class of the
+          other stock.
         :return:
         """
-        # TODO: Please generalize this part
-        if isinstance(other_stock, ShutterStock):
-            self.from_shutter_stock(other_stock)
-        elif isinstance(other_stock, AdobeStock):
-            self.from_adobe_stock(other_stock)
-        elif isinstance(other_stock, GettyImages):
-            self.from_getty_images(other_stock)
+        converter = get_converter(other_stock.__class__, GenericStock)
+        if converter is _no_conversion:
+            for name in self.fields:
+                if name != 'path':
+                    self.__setattr__(name, other_stock.__getattribute__(name))
+            return
+        converter(other_stock, self)
 
     def to(self, other_stock):
         """converts to other stock
 
-        :param other_stock:
+        :param other_stock: The target stock class.
         :return:
         """
-        # TODO: Please generalize this part
-        if other_stock == ShutterStock:
-            return self.to_shutter_stock()
-        elif other_stock == AdobeStock:
-            return self.to_adobe_stock()
-        elif other_stock == GettyImages:
-            return self.to_getty_images()
+        return convert(self, other_stock)
 
     def from_shutter_stock(self, shutter_stock):
         """reads data from ShutterStock
@@ -336,7 +1837,8 @@ class GenericStock(StockBase):
         self.filename = adobe_stock.filename
         self.title = adobe_stock.title
         self.keywords = adobe_stock.keywords
-        self.category1 = self.from_adobe_stock_categories[adobe_stock.category]
+        self.category1 = \
+            self.from_adobe_stock_categories[adobe_stock.category]
         self.releases = adobe_stock.releases
 
     def to_adobe_stock(self):
@@ -386,9 +1888,18 @@ class ShutterStock(StockBase):
     """Data structure for ShutterStock
     """
 
+    track_changes = False
+
+    __slots__ = ('description', 'category1', 'category2', 'editorial')
+
     csv_header = 'filename,description,keywords,categories,editorial'
-    csv_format = '{filename},"{description}","{keywords}","{category1},' \
-                 '{category2}",{editorial}'
+    csv_columns = {
+        'filename': ('filename', False),
+        'description': ('description', True),
+        'keywords': (lambda s: ','.join(s.keywords), True),
+        'categories': (lambda s: '%s,%s' % (s.category1, s.category2), True),
+        'editorial': (lambda s: 'yes' if s.editorial else 'no', False),
+    }
     json_attr_list = [
         'title', 'category1', 'category2', 'keywords', 'editorial'
     ]
@@ -415,30 +1926,46 @@ class ShutterStock(StockBase):
     def to_csv(self):
         """converts the the data to CSV
         """
-        return self.csv_format.format(
-            filename=self.filename,
-            title=self.title,
-            description=self.description,
-            keywords=','.join(self.keywords),
-            category1=self.category1,
-            category2=self.category2,
-            editorial='yes' if self.editorial else 'no'
-        )
+        return get_csv_plan(self.__class__).format_row(self)
+
+    def _csv_format_values(self):
+        """returns the values of the deprecated csv_format template
+        """
+        values = super(ShutterStock, self)._csv_format_values()
+        values['editorial'] = 'yes' if self.editorial else 'no'
+        return values
 
     def to_adobe_stock(self):
         """Returns an AdobeStock instance
         """
-        gst = GenericStock()
-        gst.from_(self)
-        return gst.to_adobe_stock()
+        return convert(self, AdobeStock)
+
+    def to_getty_images(self):
+        """Returns a GettyImages instance
+        """
+        return convert(self, GettyImages)
 
 
 class AdobeStock(StockBase):
     """Data structure for AdobeStock
     """
 
+    track_changes = False
+
+    __slots__ = ('category', 'releases')
+
     csv_header = 'Filename,Title,Keywords,Category,Releases'
-    csv_format = '{filename},{title},"{keywords}",{category},""'
+    csv_columns = {
+        'Filename': ('filename', False),
+        'Title': ('title', True),
+        'Keywords': (lambda s: ','.join(s.keywords), True),
+        'Category': (
+            lambda s: AdobeStock.category_dict[s.category] if s.category
+            else '',
+            False
+        ),
+        'Releases': (lambda s: ','.join(s.releases), True),
+    }
 
     json_attr_list = ['title', 'category', 'keywords', 'releases']
 
@@ -480,37 +2007,45 @@ class AdobeStock(StockBase):
     def to_csv(self):
         """converts the data to CSV
         """
-        return \
-            '{filename},"{title}","{keywords}",{category},"{releases}"'.format(
-                filename=self.filename, title=self.title,
-                category=self.category_dict[self.category],
-                keywords=','.join(self.keywords),
-                releases=','.join(self.releases)
-            )
+        return get_csv_plan(self.__class__).format_row(self)
+
+    def _csv_format_values(self):
+        """returns the values of the deprecated csv_format template
+        """
+        values = super(AdobeStock, self)._csv_format_values()
+        values['category'] = \
+            self.category_dict[self.category] if self.category else ''
+        return values
 
     def to_shutter_stock(self):
         """returns a ShutterStock object
         """
-        gst = GenericStock()
-        gst.from_(self)
-        return gst.to_shutter_stock()
+        return convert(self, ShutterStock)
 
     def to_getty_images(self):
         """returns a GettyImages object
         """
-        gst = GenericStock()
-        gst.from_(self)
-        return gst.to_getty_images()
+        return convert(self, GettyImages)
 
 
 class GettyImages(StockBase):
     """Data structure for GettyImages
     """
 
+    track_changes = False
+
+    __slots__ = ('description', 'country', 'poster_timecode')
+
     csv_header = 'file name,description,country,title,keywords,poster ' \
                  'timecode'
-    csv_format = '{filename},"{description}",{country},"{title}",' \
-                 '"{keywords}",{poster_timecode}'
+    csv_columns = {
+        'file name': ('filename', False),
+        'description': ('description', True),
+        'country': ('country', False),
+        'title': ('title', True),
+        'keywords': (lambda s: ','.join(s.keywords), True),
+        'poster timecode': ('poster_timecode', False),
+    }
 
     json_attr_list = ['title', 'description', 'country', 'keywords',
                       'poster_timecode']
@@ -534,27 +2069,206 @@ class GettyImages(StockBase):
     def to_csv(self):
         """returns the data in CSV format
         """
-        return self.csv_format.format(
-            filename=self.filename,
-            description=self.description,
-            country=self.country,
-            title=self.title,
-            keywords=','.join(self.keywords),
-            poster_timecode=self.poster_timecode
-        )
+        return get_csv_plan(self.__class__).format_row(self)
 
     def to_adobe_stock(self):
         """Returns a AdobeStock object
         :return:
         """
-        gst = GenericStock()
-        gst.from_(self)
-        return gst.to_adobe_stock()
+        return convert(self, AdobeStock)
 
     def to_shutter_stock(self):
         """Returns a ShutterStock object
         :return:
         """
+        return convert(self, ShutterStock)
+
+
+# the category lookup tables are validated and frozen once at import time
+category_index = CategoryIndex(
+    categories=GenericStock.categories,
+    to_adobe_stock=GenericStock.to_adobe_stock_categories,
+    adobe_stock_ids=AdobeStock.category_dict,
+    unmapped_adobe_stock=GenericStock.unmapped_adobe_stock_categories
+)
+GenericStock.categories = category_index.categories
+GenericStock.to_adobe_stock_categories = category_index.to_adobe_stock
+GenericStock.unmapped_adobe_stock_categories = \
+    category_index.unmapped_adobe_stock
+GenericStock.from_adobe_stock_categories = category_index.from_adobe_stock
+AdobeStock.category_dict = category_index.adobe_stock_ids
+
+
+# (source class, target class) -> converter function
+converters = {}
+
+
+def register_converter(source_class, target_class):
+    """A decorator that registers the decorated function as the converter from
+    ``source_class`` to ``target_class``.
+
+    The converter function accepts an instance of the source class and returns
+    a new instance of the target class. The converters to GenericStock also
+    accept an optional GenericStock instance as the second argument, which is
+    filled and returned instead of a new instance, see
+    :meth:`.GenericStock.from_`.
+
+    :param source_class: The source stock class.
+    :param target_class: The target stock class.
+    """
+    def decorator(func):
+        converters[(source_class, target_class)] = func
+        return func
+    return decorator
+
+
+def get_converter(source_class, target_class):
+    """Returns the converter function from ``source_class`` to
+    ``target_class``.
+
+    The converters of the base classes of ``source_class`` are also
+    considered. If ``source_class`` is already a ``target_class`` the
+    returned converter returns the stock instance as it is.
+
+    :param source_class: The source stock class.
+    :param target_class: The target stock class.
+    :return: The converter function.
+    """
+    for klass in source_class.__mro__:
+        converter = converters.get((klass, target_class))
+        if converter is not None:
+            return converter
+
+    if isinstance(target_class, type) \
+       and issubclass(source_class, target_class):
+        return _no_conversion
+
+    raise TypeError(
+        'There is no converter from %s to %s' % (
+            source_class.__name__,
+            getattr(target_class, '__name__', target_class)
+        )
+    )
+
+
+def convert(stock, target_class):
+    """Converts the given stock instance to the target class.
+
+    :param stock: A StockBase derivative instance.
+    :param target_class: The target stock class.
+    :return: A new instance of ``target_class``.
+    """
+    return get_converter(stock.__class__, target_class)(stock)
+
+
+def convert_many(stocks, target_class):
+    """Converts the given stock instances to the target class.
+
+    The converter is looked up only once per run of instances of the same
+    class, which makes it the fastest way of converting a big catalog. This
+    is a generator, so the converted instances are created one at a time.
+
+    :param stocks: An iterable of StockBase derivative instances.
+    :param target_class: The target stock class.
+    :return: A generator of ``target_class`` instances.
+    """
+    source_class = None
+    converter = None
+    for stock in stocks:
+        if stock.__class__ is not source_class:
+            source_class = stock.__class__
+            converter = get_converter(source_class, target_class)
+        yield converter(stock)
+
+
+def _no_conversion(stock):
+    return stock
+
+
+register_converter(GenericStock, ShutterStock)(GenericStock.to_shutter_stock)
+register_converter(GenericStock, AdobeStock)(GenericStock.to_adobe_stock)
+register_converter(GenericStock, GettyImages)(GenericStock.to_getty_images)
+
+
+@register_converter(ShutterStock, GenericStock)
+def _shutter_stock_to_generic_stock(shutter_stock, gst=None):
+    if gst is None:
+        gst = GenericStock()
+    gst.from_shutter_stock(shutter_stock)
+    return gst
+
+
+@register_converter(AdobeStock, GenericStock)
+def _adobe_stock_to_generic_stock(adobe_stock, gst=None):
+    if gst is None:
+        gst = GenericStock()
+    gst.from_adobe_stock(adobe_stock)
+    return gst
+
+
+@register_converter(GettyImages, GenericStock)
+def _getty_images_to_generic_stock(getty_images, gst=None):
+    if gst is None:
         gst = GenericStock()
-        gst.from_(self)
-        return gst.to_shutter_stock()
+    gst.from_getty_images(getty_images)
+    return gst
+
+
+@register_converter(ShutterStock, AdobeStock)
+def _shutter_stock_to_adobe_stock(shutter_stock):
+    return AdobeStock(
+        filename=shutter_stock.filename,
+        title=shutter_stock.title,
+        keywords=shutter_stock.keywords,
+        category=GenericStock.to_adobe_stock_categories[
+            shutter_stock.category1
+        ] if shutter_stock.category1 != '' else ''
+    )
+
+
+@register_converter(ShutterStock, GettyImages)
+def _shutter_stock_to_getty_images(shutter_stock):
+    return GettyImages(
+        filename=shutter_stock.filename,
+        title=shutter_stock.title,
+        keywords=shutter_stock.keywords
+    )
+
+
+@register_converter(AdobeStock, ShutterStock)
+def _adobe_stock_to_shutter_stock(adobe_stock):
+    return ShutterStock(
+        filename=adobe_stock.filename,
+        title=adobe_stock.title,
+        keywords=adobe_stock.keywords,
+        category1=GenericStock.from_adobe_stock_categories[
+            adobe_stock.category
+        ]
+    )
+
+
+@register_converter(AdobeStock, GettyImages)
+def _adobe_stock_to_getty_images(adobe_stock):
+    return GettyImages(
+        filename=adobe_stock.filename,
+        title=adobe_stock.title,
+        keywords=adobe_stock.keywords
+    )
+
+
+@register_converter(GettyImages, ShutterStock)
+def _getty_images_to_shutter_stock(getty_images):
+    return ShutterStock(
+        filename=getty_images.filename,
+        title=getty_images.title,
+        keywords=getty_images.keywords
+    )
+
+
+@register_converter(GettyImages, AdobeStock)
+def _getty_images_to_adobe_stock(getty_images):
+    return AdobeStock(
+        filename=getty_images.filename,
+        title=getty_images.title,
+        keywords=getty_images.keywords
+    )
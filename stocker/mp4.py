@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Reads the technical metadata of MP4 and MOV files.
+
+Only the box (atom) headers and the ``moov`` box are read through
+:mod:`mmap`, the media payloads (``mdat``) are skipped without being read, so
+reading a clip costs a few page reads regardless of its size. The boxes that
+are used are::
+
+  moov
+    mvhd                  movie duration
+    trak
+      tkhd                width and height
+      mdia
+        mdhd              track timescale
+        hdlr              track type, "vide" for video tracks
+        minf
+          stbl
+            stsd          codec
+            stts          sample durations, used for the frame rate
+
+Example::
+
+  from stocker.mp4 import read_video_info
+  info = read_video_info('clip.mov')
+  print(info.duration, info.width, info.height, info.frame_rate, info.codec)
+"""
+
+import collections
+import os
+import struct
+
+
+_VideoInfo = collections.namedtuple(
+    'VideoInfo', ['duration', 'width', 'height', 'frame_rate', 'codec']
+)
+
+
+class VideoInfo(_VideoInfo):
+    """The technical metadata of a clip.
+
+    ``duration`` is in seconds, ``width`` and ``height`` are in pixels,
+    ``frame_rate`` is in frames per second and ``codec`` is the four
+    character code of the first sample description of the video track, like
+    "avc1" or "apch". The values that can not be found are None.
+    """
+
+    __slots__ = ()
+
+    def timecode_to_seconds(self, timecode):
+        """Converts the given "HH:MM:SS:FF" timecode to seconds using the
+        ``frame_rate`` of the clip.
+
+        :param str timecode: The timecode, like "00:00:05:00".
+        :return float:
+        """
+        try:
+            hours, minutes, seconds, frames = \
+                [int(part) for part in timecode.split(':')]
+        except ValueError:
+            raise ValueError(
+                'The timecode should be in "HH:MM:SS:FF" format, not %r'
+                % timecode
+            )
+        seconds = hours * 3600 + minutes * 60 + seconds
+        if frames:
+            if not self.frame_rate:
+                raise ValueError(
+                    'The frame rate of the clip is unknown, can not convert '
+                    'the frames of the timecode %r' % timecode
+                )
+            seconds += frames / self.frame_rate
+        return float(seconds)
+
+    def contains_timecode(self, timecode):
+        """Returns True if the given timecode is in the clip.
+
+        :param str timecode: The timecode, like "00:00:05:00".
+        :return bool:
+        """
+        if self.duration is None:
+            return False
+        return self.timecode_to_seconds(timecode) < self.duration
+
+    def to_dict(self):
+        """Returns the info as a dictionary.
+
+        :return dict:
+        """
+        return dict(zip(self._fields, self))
+
+
+def _iter_boxes(data, start, end):
+    """Yields the ``(box type, payload start, box end)`` of the boxes in the
+    given range of data.
+    """
+    unpack_from = struct.unpack_from
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise ValueError('Truncated box header at offset %i' % offset)
+            size = unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            # the box extends to the end of the file
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise ValueError(
+                'Invalid size %i of the %r box at offset %i' % (
+                    size, box_type.decode('latin-1'), offset
+                )
+            )
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_box(data, start, end, box_type):
+    """returns the ``(payload start, box end)`` of the first box with the
+    given type or None
+    """
+    for current_type, payload_start, box_end in _iter_boxes(data, start, end):
+        if current_type == box_type:
+            return payload_start, box_end
+    return None
+
+
+def _find_path(data, start, end, path):
+    """returns the ``(payload start, box end)`` of the box at the given path
+    of box types or None
+    """
+    for box_type in path:
+        found = _find_box(data, start, end, box_type)
+        if found is None:
+            return None
+        start, end = found
+    return start, end
+
+
+def _parse_timescale_and_duration(data, start, end):
+    """parses the timescale and duration of a mvhd or mdhd box
+    """
+    version = data[start]
+    if version == 1:
+        if start + 32 > end:
+            raise ValueError('Truncated header box')
+        timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+    else:
+        if start + 20 > end:
+            raise ValueError('Truncated header box')
+        timescale, duration = struct.unpack_from('>II', data, start + 12)
+    return timescale, duration
+
+
+def _parse_track(data, start, end):
+    """parses a trak box, returns a dictionary of the found values
+    """
+    track = {
+        'handler': None, 'width': None, 'height': None, 'timescale': None,
+        'codec': None, 'sample_count': 0, 'sample_duration': 0,
+    }
+
+    tkhd = _find_box(data, start, end, b'tkhd')
+    if tkhd is not None:
+        tkhd_start, tkhd_end = tkhd
+        # the width and height are the last 8 bytes as 16.16 fixed point
+        if tkhd_end - tkhd_start >= 84:
+            width, height = struct.unpack_from('>II', data, tkhd_end - 8)
+            track['width'] = width >> 16
+            track['height'] = height >> 16
+
+    mdia = _find_box(data, start, end, b'mdia')
+    if mdia is None:
+        return track
+    mdia_start, mdia_end = mdia
+
+    hdlr = _find_box(data, mdia_start, mdia_end, b'hdlr')
+    if hdlr is not None and hdlr[0] + 12 <= hdlr[1]:
+        track['handler'] = bytes(data[hdlr[0] + 8:hdlr[0] + 12])
+
+    mdhd = _find_box(data, mdia_start, mdia_end, b'mdhd')
+    if mdhd is not None:
+        track['timescale'] = _parse_timescale_and_duration(data, *mdhd)[0]
+
+    stbl = _find_path(data, mdia_start, mdia_end, [b'minf', b'stbl'])
+    if stbl is None:
+        return track
+
+    stsd = _find_box(data, stbl[0], stbl[1], b'stsd')
+    if stsd is not None:
+        stsd_start, stsd_end = stsd
+        # version and flags, entry count, then the first entry
+        if stsd_start + 16 <= stsd_end \
+           and struct.unpack_from('>I', data, stsd_start + 4)[0]:
+            track['codec'] = bytes(
+                data[stsd_start + 12:stsd_start + 16]
+            ).decode('latin-1')
+
+    stts = _find_box(data, stbl[0], stbl[1], b'stts')
+    if stts is not None:
+        stts_start, stts_end = stts
+        entry_count = struct.unpack_from('>I', data, stts_start + 4)[0]
+        entry_count = min(entry_count, (stts_end - stts_start - 8) // 8)
+        sample_count = sample_duration = 0
+        for count, delta in struct.iter_unpack(
+                '>II', data[stts_start + 8:stts_start + 8 + entry_count * 8]):
+            sample_count += count
+            sample_duration += count * delta
+        track['sample_count'] = sample_count
+        track['sample_duration'] = sample_duration
+
+    return track
+
+
+def parse_video_info(data):
+    """Parses the technical metadata from the given MP4 or MOV data.
+
+    :param data: A bytes like object, like an :class:`mmap.mmap`, of the
+      whole file.
+    :return VideoInfo:
+    :raises ValueError: If there is no ``moov`` box or the boxes are invalid.
+    """
+    moov = _find_box(data, 0, len(data), b'moov')
+    if moov is None:
+        raise ValueError('There is no moov box')
+    moov_start, moov_end = moov
+
+    duration = None
+    mvhd = _find_box(data, moov_start, moov_end, b'mvhd')
+    if mvhd is not None:
+        timescale, movie_duration = _parse_timescale_and_duration(data, *mvhd)
+        if timescale:
+            duration = movie_duration / float(timescale)
+
+    video_track = None
+    for box_type, trak_start, trak_end in \
+            _iter_boxes(data, moov_start, moov_end):
+        if box_type != b'trak':
+            continue
+        track = _parse_track(data, trak_start, trak_end)
+        if track['handler'] == b'vide':
+            video_track = track
+            break
+        if video_track is None and track['handler'] is None \
+           and track['width']:
+            video_track = track
+
+    if video_track is None:
+        return VideoInfo(duration, None, None, None, None)
+
+    frame_rate = None
+    if video_track['sample_duration'] and video_track['timescale']:
+        frame_rate = video_track['sample_count'] \
+            * video_track['timescale'] / float(video_track['sample_duration'])
+
+    return VideoInfo(
+        duration, video_track['width'], video_track['height'], frame_rate,
+        video_track['codec']
+    )
+
+
+def read_video_info(path):
+    """Reads the technical metadata of the given MP4 or MOV file.
+
+    The file is memory mapped and only the box headers and the ``moov`` box
+    are read.
+
+    :param str path: The path of the file.
+    :return VideoInfo:
+    :raises ValueError: If the file is empty or not a valid MP4/MOV file.
+    :raises OSError: If the file can not be read.
+    """
+    import mmap
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('The video file is empty: %s' % path)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return parse_video_info(data)
+            except (ValueError, struct.error) as e:
+                raise ValueError('%s: %s' % (e, path))
+
+
+def _read_video_info_safe(path):
+    """Returns ``(info, None)`` or ``(None, exception)`` for the given file.
+    """
+    try:
+        return read_video_info(path), None
+    except (OSError, ValueError) as e:
+        return None, e
+
+
+class VideoInfoCache:
+    """Caches the video info of the files by their size and modification
+    time, optionally in a JSON file.
+
+    :param str path: The path of the JSON file to load the cache from and
+      save it to. The default is None, which keeps the cache in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        # file path -> [size, mtime_ns, info dict]
+        self.entries = {}
+        if path is not None and os.path.exists(path):
+            from stocker import json_backend
+            self.entries = json_backend.read_file(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path, stat):
+        """Returns the cached info of the given file or None if the file is
+        not in the cache or it is changed.
+
+        :param str path: The path of the file.
+        :param stat: The :func:`os.stat` result of the file.
+        :return VideoInfo:
+        """
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != stat.st_size \
+           or entry[1] != stat.st_mtime_ns:
+            return None
+        return VideoInfo(**entry[2])
+
+    def set(self, path, stat, info):
+        """Stores the info of the given file.
+
+        :param str path: The path of the file.
+        :param stat: The :func:`os.stat` result of the file.
+        :param VideoInfo info: The info of the file.
+        """
+        self.entries[path] = [stat.st_size, stat.st_mtime_ns, info.to_dict()]
+
+    def save(self):
+        """Writes the cache to its JSON file.
+        """
+        if self.path is not None:
+            from stocker import json_backend
+            json_backend.write_file(
+                self.path, self.entries, indent=False, atomic=True
+            )
+
+
+def read_video_infos(paths, workers=None, cache=None):
+    """Reads the technical metadata of the given files, in parallel if
+    ``workers`` is bigger than 1.
+
+    :param list paths: The paths of the MP4 or MOV files.
+    :param int workers: The number of files to read at the same time.
+    :param cache: A :class:`.VideoInfoCache` instance. The files that are not
+      changed since they are cached are not read.
+    :return list: A list of ``(info, error)`` tuples in the same order with
+      ``paths``.
+    """
+    results = [None] * len(paths)
+    missing = []
+    stats = {}
+    for i, path in enumerate(paths):
+        if cache is not None:
+            try:
+                stat = stats[i] = os.stat(path)
+            except OSError as e:
+                results[i] = (None, e)
+                continue
+            info = cache.get(path, stat)
+            if info is not None:
+                results[i] = (info, None)
+                continue
+        missing.append(i)
+
+    missing_paths = [paths[i] for i in missing]
+    if workers and workers > 1 and len(missing_paths) > 1:
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers) as pool:
+            missing_results = list(
+                pool.map(_read_video_info_safe, missing_paths)
+            )
+    else:
+        missing_results = [_read_video_info_safe(p) for p in missing_paths]
+
+    for i, (info, error) in zip(missing, missing_results):
+        results[i] = (info, error)
+        if cache is not None and info is not None:
+            cache.set(paths[i], stats[i], info)
+
+    return results
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import re
+
+_token_pattern = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Splits the given text into case folded word tokens.
+
+    :param str text: The text to tokenize, can be None.
+    :return list:
+    """
+    if not text:
+        return []
+    return _token_pattern.findall(text.casefold())
+
+
+class SearchIndex:
+    """An inverted index of the keywords and the title/description words of
+    stock instances.
+
+    Keywords are matched as a whole (case insensitive), title and description
+    words are matched by prefix. Every query is answered with set operations
+    on the posting sets, so the cost does not depend on the number of indexed
+    stock instances.
+
+    Example::
+
+      index = SearchIndex(sm.media)
+      index.search(all_of=['drone', 'sunset'], none_of=['night'])
+      index.search(prefix='istanb')
+
+    :param stocks: An iterable of StockBase derivative instances to index.
+    """
+
+    def __init__(self, stocks=()):
+        self.clear()
+        for stock in stocks:
+            self.add(stock)
+
+    def clear(self):
+        """removes all the stock instances from the index
+        """
+        # record id -> stock
+        self._stocks = {}
+        # id(stock) -> record id
+        self._record_ids = {}
+        # record id -> (keywords, tokens)
+        self._terms = {}
+        self._keywords = {}
+        self._tokens = {}
+        self._sorted_tokens = []
+        self._sorted_tokens_dirty = False
+        self._next_record_id = 0
+
+    def __len__(self):
+        return len(self._stocks)
+
+    def __contains__(self, stock):
+        return id(stock) in self._record_ids
+
+    @classmethod
+    def _stock_terms(cls, stock):
+        """Returns the keywords and the tokens of the given stock.
+        """
+        keywords = frozenset(k.casefold() for k in (stock.keywords or ()))
+        tokens = set(tokenize(stock.title))
+        tokens.update(tokenize(getattr(stock, 'description', None)))
+        return keywords, frozenset(tokens)
+
+    def add(self, stock):
+        """Adds the given stock to the index, updates it if it is already
+        indexed.
+
+        :param stock: A StockBase derivative instance.
+        """
+        record_id = self._record_ids.get(id(stock))
+        if record_id is not None:
+            self._remove_terms(record_id)
+        else:
+            record_id = self._next_record_id
+            self._next_record_id += 1
+            self._record_ids[id(stock)] = record_id
+            self._stocks[record_id] = stock
+
+        keywords, tokens = self._stock_terms(stock)
+        self._terms[record_id] = (keywords, tokens)
+        for keyword in keywords:
+            self._keywords.setdefault(keyword, set()).add(record_id)
+        for token in tokens:
+            postings = self._tokens.get(token)
+            if postings is None:
+                postings = self._tokens[token] = set()
+                self._sorted_tokens_dirty = True
+            postings.add(record_id)
+
+    update = add
+
+    def remove(self, stock):
+        """Removes the given stock from the index.
+
+        :param stock: A StockBase derivative instance.
+        """
+        record_id = self._record_ids.pop(id(stock), None)
+        if record_id is None:
+            return
+        self._remove_terms(record_id)
+        del self._terms[record_id]
+        del self._stocks[record_id]
+
+    def _remove_terms(self, record_id):
+        keywords, tokens = self._terms[record_id]
+        for keyword in keywords:
+            postings = self._keywords[keyword]
+            postings.discard(record_id)
+            if not postings:
+                del self._keywords[keyword]
+        for token in tokens:
+            postings = self._tokens[token]
+            postings.discard(record_id)
+            if not postings:
+                del self._tokens[token]
+                self._sorted_tokens_dirty = True
+
+    def _prefix_postings(self, prefix):
+        """Returns the record ids of the stock instances that has a title or
+        description word starting with the given prefix.
+        """
+        import bisect
+        if self._sorted_tokens_dirty:
+            self._sorted_tokens = sorted(self._tokens)
+            self._sorted_tokens_dirty = False
+
+        sorted_tokens = self._sorted_tokens
+        result = set()
+        i = bisect.bisect_left(sorted_tokens, prefix)
+        while i < len(sorted_tokens) and sorted_tokens[i].startswith(prefix):
+            result.update(self._tokens[sorted_tokens[i]])
+            i += 1
+        return result
+
+    def search(self, all_of=None, any_of=None, none_of=None, prefix=None):
+        """Returns the indexed stock instances that match all the given
+        conditions.
+
+        :param list all_of: The stock should have all of these keywords.
+        :param list any_of: The stock should have at least one of these
+          keywords.
+        :param list none_of: The stock should have none of these keywords.
+        :param str prefix: Each word in this text should be the prefix of a
+          word in the title or the description of the stock, like
+          "istan bosp" matches "Istanbul, the Bosphorus bridge".
+        :return list: The matching stock instances in the order they are
+          added to the index.
+        """
+        def postings(keyword):
+            return self._keywords.get(keyword.casefold(), ())
+
+        result = None
+        for keyword in sorted(all_of or (),
+                              key=lambda k: len(postings(k))):
+            if result is None:
+                result = set(postings(keyword))
+            else:
+                result.intersection_update(postings(keyword))
+            if not result:
+                return []
+
+        if any_of:
+            matching = set()
+            for keyword in any_of:
+                matching.update(postings(keyword))
+            if result is None:
+                result = matching
+            else:
+                result.intersection_update(matching)
+
+        for word in tokenize(prefix):
+            matching = self._prefix_postings(word)
+            if result is None:
+                result = matching
+            else:
+                result.intersection_update(matching)
+
+        if result is None:
+            result = set(self._stocks)
+
+        for keyword in none_of or ():
+            result.difference_update(postings(keyword))
+
+        return [self._stocks[record_id] for record_id in sorted(result)]
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""CSV serialization of the stock classes.
+
+Each stock class describes its CSV columns with a ``csv_columns`` dictionary
+of ``header name -> (value, always_quote)`` pairs, where ``value`` is either
+an attribute name or a callable that accepts the stock instance and returns
+the column value. The column order comes from the ``csv_header`` of the
+class. The columns are compiled once per class to a :class:`.CSVPlan`, see
+:func:`.get_csv_plan`.
+
+The ``csv_format`` template of the older versions is still used if a class
+sets it, it is deprecated and filled with the values of the
+``_csv_format_values()`` method of the stock instance without any quoting.
+
+The values are quoted as described in RFC 4180. The ``always_quote`` columns
+are always enclosed in double quotes, the others are only quoted when they
+contain a comma, a double quote or a line break. Double quotes in the values
+are escaped by doubling them.
+"""
+
+import operator
+
+
+def quote(value):
+    """Returns the given value enclosed in double quotes.
+
+    :param value: The value to quote, None is written as an empty string.
+    :return str:
+    """
+    return '"%s"' % escape(value)
+
+
+def escape(value):
+    """Returns the given value with the double quotes doubled.
+
+    :param value: The value to escape, None is written as an empty string.
+    :return str:
+    """
+    if value is None:
+        return ''
+    if value.__class__ is not str:
+        value = str(value)
+    return value.replace('"', '""')
+
+
+def quote_minimal(value):
+    """Returns the given value enclosed in double quotes only if it is
+    needed.
+
+    :param value: The value to quote, None is written as an empty string.
+    :return str:
+    """
+    if value is None:
+        return ''
+    if value.__class__ is not str:
+        value = str(value)
+    if '"' in value or ',' in value or '\n' in value or '\r' in value:
+        return '"%s"' % value.replace('"', '""')
+    return value
+
+
+class CSVPlan:
+    """The compiled CSV columns of a stock class.
+
+    The columns are compiled to a single ``format_row`` function that reads
+    the values with a list of getters, quotes them and fills a ``%`` template,
+    the template already has the double quotes of the ``always_quote``
+    columns.
+
+    :param target_class: A stock class with ``csv_header`` and ``csv_columns``
+      attributes.
+    """
+
+    def __init__(self, target_class):
+        self.target_class = target_class
+        self.header = target_class.csv_header
+        self.columns = []
+        csv_format = getattr(target_class, 'csv_format', '')
+        if csv_format:
+            import warnings
+            warnings.warn(
+                '%s.csv_format is deprecated, use csv_columns instead' %
+                target_class.__name__,
+                DeprecationWarning, stacklevel=3
+            )
+            self.format_row = lambda stock: csv_format.format(
+                **stock._csv_format_values()
+            )
+            return
+
+        for name in self.header.split(','):
+            try:
+                self.columns.append(target_class.csv_columns[name])
+            except KeyError:
+                raise ValueError(
+                    '%s.csv_columns has no column for "%s"' % (
+                        target_class.__name__, name
+                    )
+                )
+        self.format_row = self._compile()
+
+    def _compile(self):
+        """Generates the format_row function of the columns.
+        """
+        columns = []
+        template = []
+        for value, always_quote in self.columns:
+            if isinstance(value, str):
+                value = operator.attrgetter(value)
+            columns.append((value, always_quote))
+            template.append('"%s"' if always_quote else '%s')
+        template = ','.join(template)
+
+        def format_row(stock):
+            values = []
+            append = values.append
+            for get_value, always_quote in columns:
+                value = get_value(stock)
+                if value.__class__ is not str:
+                    value = '' if value is None else str(value)
+                if always_quote:
+                    append(value.replace('"', '""'))
+                elif '"' in value or ',' in value or '\n' in value \
+                        or '\r' in value:
+                    append('"%s"' % value.replace('"', '""'))
+                else:
+                    append(value)
+            return template % tuple(values)
+
+        return format_row
+
+    def write(self, fileobj, stocks, batch_size=1000, header=True):
+        """Writes the CSV rows of the given stock instances to the given file
+        object.
+
+        The rows are written in batches of ``batch_size`` rows to keep the
+        number of write calls low, the lines are separated with "\\n" and the
+        last line does not have a line terminator.
+
+        :param fileobj: A file like object opened in text mode.
+        :param stocks: An iterable of ``target_class`` instances.
+        :param int batch_size: The number of rows to write at once.
+        :param bool header: If True the header is written first.
+        :return int: The number of rows written excluding the header.
+        """
+        return self.write_rows(
+            fileobj, map(self.format_row, stocks), batch_size=batch_size,
+            header=header
+        )
+
+    def write_rows(self, fileobj, rows, batch_size=1000, header=True):
+        """Writes the given CSV rows to the given file object.
+
+        Same as :meth:`.write` but for the rows that are already formatted.
+
+        :param fileobj: A file like object opened in text mode.
+        :param rows: An iterable of CSV rows without the line terminators.
+        :param int batch_size: The number of rows to write at once.
+        :param bool header: If True the header is written first.
+        :return int: The number of rows written excluding the header.
+        """
+        write = fileobj.write
+        row_count = 0
+        batch = []
+        separator = ''
+        if header:
+            write(self.header)
+            separator = '\n'
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                write(separator)
+                write('\n'.join(batch))
+                separator = '\n'
+                row_count += len(batch)
+                batch = []
+
+        if batch:
+            write(separator)
+            write('\n'.join(batch))
+            row_count += len(batch)
+
+        return row_count
+
+
+class ShardedCSVWriter:
+    """Writes CSV rows to one or more numbered files.
+
+    Without any limits all the rows are written to ``<name>.csv``. If
+    ``max_rows`` or ``max_bytes`` is given the rows are written to
+    ``<name>_001.csv``, ``<name>_002.csv`` etc. and a new file is started when
+    the next row would exceed one of the limits. Each file starts with the
+    header. Rows are written as they come, nothing is kept in memory.
+
+    The rows are written to temporary files in ``out_dir`` which are renamed
+    to their final names by :meth:`.close`, so the files of an earlier run
+    are only replaced when all the rows are written. The names of the written
+    files are kept in a ``.<name>.files`` record in ``out_dir``, and the files
+    of the earlier run that are not written again, like ``<name>_004.csv``
+    after a run that needs only three files, are removed by :meth:`.close` so
+    they are not uploaded again. Only the files in the record are removed,
+    the other files in ``out_dir`` are never touched. :meth:`.abort` removes
+    the temporary files and keeps the earlier files. Used as a context
+    manager, the writer is aborted if an exception is raised.
+
+    :param str header: The CSV header.
+    :param str out_dir: The folder to write the files to.
+    :param str name: The base name of the files.
+    :param int max_rows: The maximum number of rows in a file, excluding the
+      header. The default is None, which means no limit.
+    :param int max_bytes: The maximum size of a file in bytes (UTF-8 encoded),
+      including the header. The default is None, which means no limit.
+    """
+
+    def __init__(self, header, out_dir, name, max_rows=None, max_bytes=None):
+        for attr_name, value in [('max_rows', max_rows),
+                                 ('max_bytes', max_bytes)]:
+            if value is not None and value < 1:
+                raise ValueError(
+                    '%s.%s should be a positive integer, not %r' % (
+                        self.__class__.__name__, attr_name, value
+                    )
+                )
+        self.header = header
+        self.out_dir = out_dir
+        self.name = name
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.row_count = 0
+        self.byte_count = 0
+
+        self._header_size = _utf8_size(header)
+        if max_bytes is not None and self._header_size > max_bytes:
+            raise ValueError(
+                'The header of %s is bigger than max_bytes (%i > %i)' % (
+                    name, self._header_size, max_bytes
+                )
+            )
+
+        self._file = None
+        self._file_row_count = 0
+        self._file_size = 0
+        self._temp_paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _new_file(self):
+        """closes the current file and starts a new one
+        """
+        import os
+        if self._file is not None:
+            self._file.close()
+        if self.max_rows is None and self.max_bytes is None:
+            filename = '%s.csv' % self.name
+        else:
+            filename = '%s_%03i.csv' % (self.name, len(self.paths) + 1)
+        path = os.path.join(self.out_dir, filename)
+        temp_path = os.path.join(
+            self.out_dir, '.%s.%s.tmp' % (filename, os.urandom(4).hex())
+        )
+        self._file = open(temp_path, 'x', encoding='utf-8', newline='')
+        self._temp_paths.append(temp_path)
+        self._file.write(self.header)
+        self._file_row_count = 0
+        self._file_size = self._header_size
+        self.byte_count += self._header_size
+        self.paths.append(path)
+
+    def write_row(self, row):
+        """Writes the given CSV row.
+
+        :param str row: The CSV row without the line terminator.
+        """
+        # the line terminator is one byte
+        size = _utf8_size(row) + 1
+        if self.max_bytes is not None \
+           and self._header_size + size > self.max_bytes:
+            raise ValueError(
+                'A row of %s does not fit in max_bytes (%i > %i): %s' % (
+                    self.name, self._header_size + size, self.max_bytes, row
+                )
+            )
+
+        if self._file is None \
+           or (self.max_rows is not None
+               and self._file_row_count >= self.max_rows) \
+           or (self.max_bytes is not None
+               and self._file_size + size > self.max_bytes):
+            self._new_file()
+        self._file.write('\n')
+        self._file.write(row)
+        self._file_row_count += 1
+        self._file_size += size
+        self.row_count += 1
+        self.byte_count += size
+
+    def close(self):
+        """Closes the current file and renames the written files to their
+        final names. A file with only the header is created if no row is
+        written. The files of the earlier run that are not written again are
+        removed, see the ``.<name>.files`` record above.
+        """
+        import os
+        if self._file is None and not self.paths:
+            self._new_file()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self._temp_paths:
+            return
+        for temp_path, path in zip(self._temp_paths, self.paths):
+            os.replace(temp_path, path)
+        self._temp_paths = []
+        self._remove_stale_files()
+
+    def _remove_stale_files(self):
+        """removes the files of the earlier run that are not written this time
+        and records the files of this run
+        """
+        import os
+        record_path = os.path.join(self.out_dir, '.%s.files' % self.name)
+        written = [os.path.basename(path) for path in self.paths]
+        try:
+            with open(record_path, encoding='utf-8') as f:
+                earlier = f.read().splitlines()
+        except FileNotFoundError:
+            earlier = []
+        for filename in earlier:
+            # never follow a record that points outside of out_dir
+            if filename in written or os.path.basename(filename) != filename:
+                continue
+            try:
+                os.remove(os.path.join(self.out_dir, filename))
+            except FileNotFoundError:
+                pass
+        with open(record_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(written))
+
+    def abort(self):
+        """Closes the current file and removes the written files, the files
+        of an earlier run are kept as they are.
+        """
+        import os
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for temp_path in self._temp_paths:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        self._temp_paths = []
+
+
+def _utf8_size(text):
+    """Returns the size of the given text in bytes when it is UTF-8 encoded.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-8'))
+
+
+# target class -> CSVPlan
+_csv_plans = {}
+
+
+def get_csv_plan(target_class):
+    """Returns the compiled CSVPlan of the given stock class.
+
+    :param target_class: A stock class.
+    :return: A :class:`.CSVPlan` instance.
+    """
+    try:
+        return _csv_plans[target_class]
+    except KeyError:
+        plan = _csv_plans[target_class] = CSVPlan(target_class)
+        return plan
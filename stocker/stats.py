@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Opt-in timing and memory instrumentation.
+
+A :class:`.Stats` instance records the wall time of the named phases, like
+sidecar parsing or CSV formatting, and counters, like the number of parsed
+sidecar files. The instrumented code uses the :data:`.null_stats` object when
+the instrumentation is off, which does nothing, so the overhead is a method
+call per phase.
+
+Example::
+
+  from stocker.models import StockManager
+  from stocker.stats import Stats
+  sm = StockManager(stats=Stats(trace_memory=True))
+  sm.discover_media('path', recursive=True)
+  sm.generate_csv()
+  print(sm.stats.to_json())
+"""
+
+import collections
+import contextlib
+import time
+
+
+class Stats:
+    """Records the phase timings and the counters.
+
+    :param bool trace_memory: If True the peak memory usage of each phase is
+      also recorded with :mod:`tracemalloc`, which makes the code noticeably
+      slower. The default is False.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        # phase name -> {'calls': int, 'seconds': float, 'peak_memory': int}
+        self.phases = collections.OrderedDict()
+        self.counters = collections.Counter()
+        # the running peaks of the open phases for tracemalloc
+        self._peaks = []
+
+    def reset(self):
+        """Clears the recorded phases and counters.
+        """
+        self.phases.clear()
+        self.counters.clear()
+
+    def _phase_stats(self, name):
+        """returns the stats dictionary of the given phase
+        """
+        phase_stats = self.phases.get(name)
+        if phase_stats is None:
+            phase_stats = self.phases[name] = {
+                'calls': 0, 'seconds': 0.0, 'peak_memory': None
+            }
+        return phase_stats
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """A context manager that records the wall time, and the peak memory
+        usage if ``trace_memory`` is True, of the code in it. The phases can
+        be nested, the outer phases include the inner ones.
+
+        :param str name: The name of the phase, the calls with the same name
+          are summed up.
+        """
+        # keep the phases in the order they are started
+        self._phase_stats(name)
+        if not self.trace_memory:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+            return
+
+        import tracemalloc
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self._peaks:
+            # the peak is reset below, keep the peak of the outer phase
+            self._peaks[-1] = max(
+                self._peaks[-1], tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            if started_tracing:
+                tracemalloc.stop()
+            self.add_time(name, duration)
+            phase_stats = self.phases[name]
+            phase_stats['peak_memory'] = max(
+                phase_stats['peak_memory'] or 0, peak - start_memory
+            )
+
+    def add_time(self, name, seconds):
+        """Adds the given duration to the given phase, for the phases that are
+        measured piece by piece.
+
+        :param str name: The name of the phase.
+        :param float seconds: The duration.
+        """
+        phase_stats = self._phase_stats(name)
+        phase_stats['calls'] += 1
+        phase_stats['seconds'] += seconds
+
+    def count(self, name, value=1):
+        """Increments the given counter.
+
+        :param str name: The name of the counter.
+        :param int value: The value to add.
+        """
+        self.counters[name] += value
+
+    def to_dict(self):
+        """Returns the recorded stats as a dictionary.
+
+        :return dict: A dictionary with "phases" and "counters" keys.
+        """
+        return {
+            'phases': dict(
+                (name, dict(phase_stats))
+                for name, phase_stats in self.phases.items()
+            ),
+            'counters': dict(self.counters),
+        }
+
+    def to_json(self, indent=True):
+        """Returns the recorded stats as JSON.
+
+        :param bool indent: If True the JSON is indented.
+        :return str:
+        """
+        from stocker import json_backend
+        return json_backend.dumps(self.to_dict(), indent=indent).decode(
+            'utf-8'
+        )
+
+    def dump(self, path, indent=True):
+        """Writes the recorded stats to the given JSON file.
+
+        :param str path: The path of the JSON file.
+        :param bool indent: If True the JSON is indented.
+        """
+        from stocker import json_backend
+        json_backend.write_file(path, self.to_dict(), indent=indent)
+
+
+class NullStats:
+    """The stats object that is used when the instrumentation is off, it
+    records nothing.
+    """
+
+    enabled = False
+    trace_memory = False
+
+    _null_phase = contextlib.nullcontext()
+
+    def reset(self):
+        pass
+
+    def phase(self, name):
+        return self._null_phase
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def to_dict(self):
+        return {'phases': {}, 'counters': {}}
+
+
+null_stats = NullStats()
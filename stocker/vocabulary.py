@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+from array import array
+from collections.abc import MutableSequence
+
+
+class KeywordVocabulary:
+    """A shared vocabulary of keywords.
+
+    Each distinct keyword is stored only once and is represented with an
+    integer id, so keyword lists can be stored as compact integer arrays, see
+    :class:`.KeywordList`.
+    """
+
+    __slots__ = ('words', 'ids')
+
+    def __init__(self):
+        self.words = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def intern(self, word):
+        """Returns the id of the given keyword, adds it to the vocabulary if it
+        is not there.
+
+        :param str word: The keyword.
+        :return int:
+        """
+        try:
+            return self.ids[word]
+        except KeyError:
+            id_ = len(self.words)
+            self.ids[word] = id_
+            self.words.append(word)
+            return id_
+
+    def get(self, word):
+        """Returns the id of the given keyword or None if it is not in the
+        vocabulary.
+        """
+        return self.ids.get(word)
+
+    def encode(self, words):
+        """Returns the ids of the given keywords as an ``array('I')``.
+
+        :param words: An iterable of keywords.
+        """
+        intern = self.intern
+        return array('I', [intern(word) for word in words])
+
+    def decode(self, ids):
+        """Returns the keywords of the given ids as a list.
+
+        :param ids: An iterable of keyword ids.
+        """
+        words = self.words
+        return [words[i] for i in ids]
+
+
+class KeywordList(MutableSequence):
+    """A list of keywords stored as ids of a :class:`.KeywordVocabulary`.
+
+    It behaves like a list of strings, the keywords are expanded to strings
+    only when they are read, for example while generating CSV or JSON output.
+
+    :param vocabulary: The KeywordVocabulary instance.
+    :param words: The initial keywords.
+    """
+
+    __slots__ = ('vocabulary', 'ids')
+
+    def __init__(self, vocabulary, words=()):
+        self.vocabulary = vocabulary
+        if isinstance(words, KeywordList) and words.vocabulary is vocabulary:
+            self.ids = array('I', words.ids)
+        else:
+            self.ids = vocabulary.encode(words)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.vocabulary.decode(self.ids[index])
+        return self.vocabulary.words[self.ids[index]]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.ids[index] = self.vocabulary.encode(value)
+        else:
+            self.ids[index] = self.vocabulary.intern(value)
+
+    def __delitem__(self, index):
+        del self.ids[index]
+
+    def __iter__(self):
+        words = self.vocabulary.words
+        for i in self.ids:
+            yield words[i]
+
+    def __contains__(self, word):
+        id_ = self.vocabulary.get(word)
+        return id_ is not None and id_ in self.ids
+
+    def insert(self, index, value):
+        self.ids.insert(index, self.vocabulary.intern(value))
+
+    def extend(self, values):
+        self.ids.extend(self.vocabulary.encode(values))
+
+    def __eq__(self, other):
+        if isinstance(other, KeywordList):
+            if other.vocabulary is self.vocabulary:
+                return self.ids == other.ids
+            return list(self) == list(other)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
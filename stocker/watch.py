@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+"""Watch mode, keeps the media of a StockManager in sync with a folder.
+
+The file system events are collected by watchdog_ if it is installed, or by
+polling the folder otherwise. The events are applied to the StockManager in
+the thread that calls :meth:`.MediaWatcher.process`, so the StockManager is
+never changed from a background thread.
+
+.. _watchdog: https://pypi.org/project/watchdog/
+"""
+
+import collections
+import os
+import threading
+import time
+
+from stocker import models
+
+
+WatchEvent = collections.namedtuple('WatchEvent', ['kind', 'stock'])
+WatchEvent.__doc__ = """A change applied by MediaWatcher.process(), ``kind`` is
+one of "added", "modified" or "removed"
+"""
+
+
+def watchdog_available():
+    """Returns True if watchdog is installed.
+
+    :return bool:
+    """
+    try:
+        import watchdog.observers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class MediaWatcher:
+    """Watches a folder and applies the media and sidecar file changes to the
+    ``media`` of a StockManager.
+
+    The events are debounced, a media is updated only after its files are not
+    changed for ``debounce`` seconds, so a burst of events, like a sidecar
+    file written in several steps, is applied only once. A media file and its
+    sidecar file are paired whichever arrives first, the media is added when
+    both of them exist and removed when one of them is deleted. The media
+    that are changed in place are reloaded from their sidecar files, the
+    changes are not recorded in the journal of the StockManager as they are
+    already saved, and the unsaved changes of the media are overwritten. The
+    fields that are deleted from a sidecar file get their default values.
+
+    Example::
+
+      sm = StockManager()
+      sm.discover_media('ingest', recursive=True)
+      with sm.watch('ingest', recursive=True) as watcher:
+          while True:
+              for event in watcher.process():
+                  print(event.kind, event.stock.filename)
+              time.sleep(1)
+
+    :param manager: The :class:`stocker.models.StockManager` to update.
+    :param str path: The folder to watch.
+    :param bool recursive: If True the sub folders are also watched.
+    :param list include: Shell style wildcards of the media files to
+      include, see :meth:`stocker.models.StockManager.scan_directory`.
+    :param list exclude: Shell style wildcards of the files and folders to
+      skip.
+    :param int max_depth: The maximum depth of the sub folders to watch in
+      recursive mode.
+    :param float debounce: The seconds to wait after the last event of a
+      media before applying it. The default is 0.5.
+    :param str backend: One of "watchdog" or "polling". The default is None,
+      which uses watchdog if it is installed.
+    :param float poll_interval: The seconds between two scans of the polling
+      backend. The default is 1.0.
+    """
+
+    backends = ['polling', 'watchdog']
+
+    def __init__(self, manager, path, recursive=False, include=None,
+                 exclude=None, max_depth=None, debounce=0.5, backend=None,
+                 poll_interval=1.0):
+        if backend is None:
+            backend = 'watchdog' if watchdog_available() else 'polling'
+        if backend not in self.backends:
+            raise ValueError(
+                '%s.backend should be one of %s, not %r' % (
+                    self.__class__.__name__, ', '.join(self.backends), backend
+                )
+            )
+        if backend == 'watchdog' and not watchdog_available():
+            raise ImportError(
+                'The "watchdog" backend of %s requires the watchdog package'
+                % self.__class__.__name__
+            )
+
+        self.manager = manager
+        self.path = os.path.abspath(path)
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.debounce = debounce
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self._include = include
+        self._exclude = exclude
+        self._include_match = models._compile_patterns(include)
+        self._exclude_match = models._compile_patterns(exclude)
+
+        self._media_extensions = set()
+        for extensions in manager.media_file_extension.values():
+            self._media_extensions.update(extensions)
+
+        self._lock = threading.Lock()
+        # (folder, basename) -> the time of the last event, the basename is
+        # None for the events of the folders
+        self._pending = {}
+        self._stop_event = threading.Event()
+        self._observer = None
+        self._poll_thread = None
+
+        # (folder, basename) -> media
+        self._stocks = {}
+        for stock in manager.media:
+            folder = os.path.abspath(stock.path)
+            if self._is_watched_folder(folder):
+                self._stocks[
+                    (folder, os.path.splitext(stock.filename)[0])
+                ] = stock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _relative_parts(self, folder):
+        """returns the path components of the given folder relative to the
+        watched folder or None if it is not in the watched folder
+        """
+        if folder == self.path:
+            return []
+        if not folder.startswith(self.path + os.sep):
+            return None
+        return folder[len(self.path) + 1:].split(os.sep)
+
+    def _is_watched_folder(self, folder):
+        """returns True if the files in the given folder are watched
+        """
+        parts = self._relative_parts(folder)
+        if parts is None:
+            return False
+        if parts and (not self.recursive or (
+                self.max_depth is not None and len(parts) > self.max_depth)):
+            return False
+        exclude_match = self._exclude_match
+        if exclude_match is not None:
+            for i, name in enumerate(parts):
+                if exclude_match(name) \
+                   or exclude_match('/'.join(parts[:i + 1])):
+                    return False
+        return True
+
+    def _is_watched_file(self, folder, filename, is_media):
+        """returns True if the given media or sidecar file is watched
+        """
+        relative_path = '/'.join(self._relative_parts(folder) + [filename])
+        exclude_match = self._exclude_match
+        if exclude_match is not None \
+           and (exclude_match(filename) or exclude_match(relative_path)):
+            return False
+        include_match = self._include_match
+        if is_media and include_match is not None \
+           and not include_match(filename) \
+           and not include_match(relative_path):
+            return False
+        return True
+
+    def notify(self, path, is_directory=False):
+        """Records a change of the given file or folder, it is applied by the
+        next :meth:`.process` call after the ``debounce`` time. This method is
+        thread safe, the event sources call it from their own threads.
+
+        :param str path: The path of the created, modified or deleted file or
+          folder.
+        :param bool is_directory: True if the path is a folder.
+        """
+        path = os.path.abspath(path)
+        if is_directory:
+            if not self.recursive or path == self.path \
+               or not self._is_watched_folder(path):
+                return
+            key = (path, None)
+        else:
+            folder, filename = os.path.split(path)
+            basename, ext = os.path.splitext(filename)
+            ext = ext.lower()
+            if ext != '.json' and ext not in self._media_extensions:
+                return
+            if not self._is_watched_folder(folder) \
+               or not self._is_watched_file(folder, filename, ext != '.json'):
+                return
+            key = (folder, basename)
+
+        with self._lock:
+            self._pending[key] = time.monotonic()
+
+    @property
+    def pending(self):
+        """The number of media and folders that have changes waiting to be
+        applied.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def process(self, now=None):
+        """Applies the changes that are older than ``debounce`` seconds to the
+        ``media`` and the indexes of the StockManager.
+
+        Call it from the thread that uses the StockManager. The sidecar files
+        that can not be read are stored in the ``discovery_errors`` list of the
+        StockManager.
+
+        :param float now: The current :func:`time.monotonic` time, for
+          testing.
+        :return list: The applied changes as :class:`.WatchEvent` instances.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            ready = [
+                key for key, event_time in self._pending.items()
+                if now - event_time >= self.debounce
+            ]
+            for key in ready:
+                del self._pending[key]
+
+        # folder -> basenames to update or None to update the whole folder
+        folders = {}
+        for folder, basename in ready:
+            basenames = folders.setdefault(folder, set())
+            if basenames is None:
+                continue
+            if basename is None:
+                folders[folder] = None
+            else:
+                basenames.add(basename)
+
+        events = []
+        # the removed media are removed from the StockManager together
+        removed = []
+        for folder in sorted(folders):
+            basenames = folders[folder]
+            found = {}
+            for pair_folder, media_filename, sidecar_filename in \
+                    self._scan(folder, recursive=basenames is None):
+                if self._is_watched_folder(pair_folder) \
+                   and self._is_watched_file(pair_folder, media_filename,
+                                             True) \
+                   and self._is_watched_file(pair_folder, sidecar_filename,
+                                             False):
+                    key = (pair_folder, os.path.splitext(media_filename)[0])
+                    found[key] = (media_filename, sidecar_filename)
+
+            if basenames is None:
+                prefix = folder + os.sep
+                keys = set(found)
+                keys.update(
+                    key for key in self._stocks
+                    if key[0] == folder or key[0].startswith(prefix)
+                )
+            else:
+                keys = set((folder, basename) for basename in basenames)
+
+            for key in sorted(keys):
+                event = self._apply(key, found.get(key))
+                if event is None:
+                    continue
+                events.append(event)
+                if event.kind == 'removed':
+                    removed.append(event.stock)
+        if removed:
+            self.manager.remove_media(*removed)
+        return events
+
+    def _scan(self, folder, recursive):
+        """lists the media and sidecar pairs in the given folder, the excluded
+        sub folders are not listed
+        """
+        parts = self._relative_parts(folder)
+        max_depth = self.max_depth
+        if max_depth is not None:
+            max_depth = max(max_depth - len(parts), 0)
+        try:
+            return self.manager.scan_directory(
+                folder, recursive=recursive, include=self._include,
+                exclude=self._exclude, max_depth=max_depth,
+                relative_folder=''.join(part + '/' for part in parts)
+            )
+        except OSError:
+            # the folder is deleted
+            return []
+
+    def _apply(self, key, pair):
+        """applies the current state of the files of a media, the removed
+        media are removed from the StockManager by the caller
+        """
+        manager = self.manager
+        stock = self._stocks.get(key)
+        if pair is None:
+            if stock is None:
+                return None
+            del self._stocks[key]
+            return WatchEvent('removed', stock)
+
+        folder, basename = key
+        media_filename, sidecar_filename = pair
+        sidecar_path = os.path.join(folder, sidecar_filename)
+        data, error = models._read_sidecar_safe(sidecar_path)
+        if error is not None:
+            manager.discovery_errors.append((sidecar_path, error))
+            return None
+
+        if stock is None:
+            stock = manager._create_stock(folder, media_filename, data)
+            self._stocks[key] = stock
+            manager.add_media(stock)
+            return WatchEvent('added', stock)
+
+        # the fields that are deleted from the sidecar file get their default
+        # values like a newly discovered media
+        loaded = manager._create_stock(folder, media_filename, data)
+        # the changes are already in the sidecar file, do not record them
+        stock._manager = None
+        try:
+            stock.mark_clean()
+            for name in stock.fields:
+                # the path of the media may be relative
+                if name != 'path' and name in loaded.fields:
+                    setattr(stock, name, getattr(loaded, name))
+            changed = stock.is_dirty
+        finally:
+            stock._manager = manager
+        stock.mark_clean()
+        if not changed:
+            return None
+        manager.sidecar_written(stock)
+        return WatchEvent('modified', stock)
+
+    def start(self):
+        """Starts collecting the file system events in the background.
+        """
+        self._stop_event.clear()
+        if self.backend == 'watchdog':
+            self._start_observer()
+        else:
+            snapshot = self._snapshot()
+            self._poll_thread = threading.Thread(
+                target=self._poll, args=(snapshot,),
+                name='stocker-watch', daemon=True
+            )
+            self._poll_thread.start()
+
+    def stop(self):
+        """Stops collecting the file system events.
+        """
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
+
+    def run(self, callback=None, interval=None):
+        """Processes the events until :meth:`.stop` is called from another
+        thread, blocks the calling thread.
+
+        :param callback: A callable that accepts a list of
+          :class:`.WatchEvent` instances, called after each batch of changes
+          is applied.
+        :param float interval: The seconds between two :meth:`.process`
+          calls. The default is the half of the ``debounce`` time.
+        """
+        if interval is None:
+            interval = max(self.debounce / 2.0, 0.01)
+        while not self._stop_event.wait(interval):
+            events = self.process()
+            if events and callback is not None:
+                callback(events)
+
+    def _start_observer(self):
+        """starts the watchdog observer
+        """
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ('opened', 'closed_no_write'):
+                    return
+                watcher.notify(event.src_path, event.is_directory)
+                dest_path = getattr(event, 'dest_path', None)
+                if dest_path:
+                    watcher.notify(dest_path, event.is_directory)
+
+        self._observer = Observer()
+        self._observer.schedule(
+            Handler(), self.path, recursive=self.recursive
+        )
+        self._observer.start()
+
+    def _snapshot(self):
+        """returns the size and modification time of the media and sidecar
+        files in the watched folders
+        """
+        snapshot = {}
+        folders = [self.path]
+        while folders:
+            folder = folders.pop()
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive \
+                           and self._is_watched_folder(entry.path):
+                            folders.append(entry.path)
+                        continue
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext != '.json' and ext not in self._media_extensions:
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _poll(self, snapshot):
+        """scans the watched folders every ``poll_interval`` seconds and
+        records the changed files
+        """
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            for path, state in current.items():
+                if snapshot.pop(path, None) != state:
+                    self.notify(path)
+            # whatever left is deleted
+            for path in snapshot:
+                self.notify(path)
+            snapshot = current
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def media_folder(tmp_path):
+    """creates a folder with 10 media with sidecar files
+    """
+    for i in range(10):
+        with open(str(tmp_path / ('clip_%02i.json' % i)), 'w') as f:
+            json.dump({'title': 'Clip %i' % i, 'keywords': ['k%i' % i]}, f)
+        (tmp_path / ('clip_%02i.mov' % i)).write_text('')
+    yield str(tmp_path)
+
+
+def test_workers_should_be_positive():
+    """testing if a ValueError will be raised if the workers is smaller than
+    1
+    """
+    from stocker.aio import AsyncStockManager
+    with pytest.raises(ValueError) as cm:
+        AsyncStockManager(workers=0)
+    assert str(cm.value) == \
+        'AsyncStockManager.workers should be a positive integer, not 0'
+
+
+def test_iter_media_yields_the_media_in_order(media_folder):
+    """testing if the iter_media method yields the media in the same order
+    with discover_media
+    """
+    from stocker.aio import AsyncStockManager
+    from stocker.models import StockManager
+
+    async def scan():
+        async with AsyncStockManager(workers=3) as sm:
+            titles = [m.title async for m in sm.iter_media(media_folder)]
+            return sm, titles
+
+    sm, titles = asyncio.run(scan())
+    expected = StockManager()
+    expected.discover_media(media_folder)
+    assert titles == [m.title for m in expected.media]
+    assert [m.title for m in sm.media] == titles
+    assert all(m._manager is sm for m in sm.media)
+    assert not any(m.is_dirty for m in sm.media)
+
+
+def test_iter_media_can_be_stopped(media_folder):
+    """testing if breaking the iter_media loop stops the discovery and keeps
+    the yielded media
+    """
+    from stocker.aio import AsyncStockManager
+
+    async def scan():
+        async with AsyncStockManager(workers=2, index_search=True) as sm:
+            media = sm.iter_media(media_folder)
+            async for stock in media:
+                if len(sm.media) == 3:
+                    break
+            await media.aclose()
+            return sm
+
+    sm = asyncio.run(scan())
+    assert [m.title for m in sm.media] == ['Clip 0', 'Clip 1', 'Clip 2']
+    assert sm.search_index is None
+
+
+def test_discover_media_async_can_be_cancelled(media_folder, monkeypatch):
+    """testing if cancelling discover_media_async does not wait for the
+    remaining sidecar files
+    """
+    from stocker import models
+    from stocker.aio import AsyncStockManager
+    read_sidecar_safe = models._read_sidecar_safe
+    release = threading.Event()
+    calls = []
+
+    def slow_read_sidecar(path):
+        calls.append(path)
+        if len(calls) > 1:
+            release.wait(5)
+        return read_sidecar_safe(path)
+
+    monkeypatch.setattr(models, '_read_sidecar_safe', slow_read_sidecar)
+
+    async def scan():
+        sm = AsyncStockManager(workers=1)
+        task = asyncio.ensure_future(sm.discover_media_async(media_folder))
+        while not sm.media:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+        sm.close()
+        return sm
+
+    sm = asyncio.run(scan())
+    assert [m.title for m in sm.media] == ['Clip 0']
+    # only the running read is finished, the queued ones are cancelled
+    assert len(calls) < 10
+
+
+def test_discover_media_async_reports_errors(media_folder):
+    """testing if the invalid sidecar files are stored in discovery_errors
+    """
+    from stocker.aio import AsyncStockManager
+    with open(os.path.join(media_folder, 'clip_03.json'), 'w') as f:
+        f.write('{invalid')
+
+    async def scan():
+        async with AsyncStockManager() as sm:
+            await sm.discover_media_async(media_folder)
+            return sm
+
+    sm = asyncio.run(scan())
+    assert len(sm.media) == 9
+    assert len(sm.discovery_errors) == 1
+    assert sm.discovery_errors[0][0] == \
+        os.path.join(media_folder, 'clip_03.json')
+
+
+def test_from_file_async(media_folder):
+    """testing if the from_file_async method reads the given sidecar file
+    """
+    from stocker.aio import AsyncStockManager
+
+    async def load():
+        async with AsyncStockManager() as sm:
+            return await sm.from_file_async(
+                os.path.join(media_folder, 'clip_05.json'),
+                media_filename='clip_05.mov'
+            )
+
+    gst = asyncio.run(load())
+    assert gst.title == 'Clip 5'
+    assert gst.filename == 'clip_05.mov'
+    assert gst.is_dirty is False
+
+
+def test_generate_csv_async(media_folder):
+    """testing if the generate_csv_async method returns the same content with
+    generate_csv
+    """
+    from stocker.aio import AsyncStockManager
+    from stocker.models import AdobeStock
+
+    async def generate():
+        async with AsyncStockManager() as sm:
+            await sm.discover_media_async(media_folder)
+            return sm, await sm.generate_csv_async(AdobeStock)
+
+    sm, csv_content = asyncio.run(generate())
+    assert csv_content == sm.generate_csv(AdobeStock)
+
+
+def test_save_all_async(media_folder):
+    """testing if the save_all_async method writes the changed media
+    """
+    from stocker.aio import AsyncStockManager
+
+    async def save():
+        async with AsyncStockManager() as sm:
+            await sm.discover_media_async(media_folder)
+            sm.media[4].title = 'Changed 4'
+            return sm, await sm.save_all_async()
+
+    sm, saved = asyncio.run(save())
+    assert saved == [sm.media[4]]
+    assert sm.save_errors == []
+    with open(sm.media[4].sidecar_full_path) as f:
+        assert json.load(f)['title'] == 'Changed 4'
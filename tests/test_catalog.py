@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def catalog():
+    """creates a catalog with some media
+    """
+    from stocker.catalog import Catalog
+    from stocker.models import GenericStock
+    yield Catalog([
+        GenericStock(
+            filename='a.mov', path='/media', title='A', description='Desc A',
+            category1='Nature', category2='Holidays', keywords=['k1', 'k2'],
+            country='Turkey', releases=['r1.pdf']
+        ),
+        GenericStock(
+            filename='b.mov', path='/media', title='B', category1='Holidays',
+            keywords=['k2'], country='Italy', editorial=True
+        ),
+        GenericStock(
+            filename='c.mov', path='/other', description='C',
+            category1='Nature', country='Turkey', editorial=True
+        ),
+        GenericStock(filename='d.mov', path='/other'),
+    ])
+
+
+def test_catalog_length(catalog):
+    """testing if the catalog has the right number of media
+    """
+    assert len(catalog) == 4
+
+
+def test_catalog_creates_generic_stock_instances(catalog):
+    """testing if the catalog creates GenericStock instances with the same
+    data
+    """
+    from stocker.models import GenericStock
+    gst = catalog[0]
+    assert isinstance(gst, GenericStock)
+    assert gst.filename == 'a.mov'
+    assert gst.path == '/media'
+    assert gst.title == 'A'
+    assert gst.description == 'Desc A'
+    assert gst.category1 == 'Nature'
+    assert gst.category2 == 'Holidays'
+    assert gst.keywords == ['k1', 'k2']
+    assert gst.country == 'Turkey'
+    assert gst.poster_timecode == '00:00:05:00'
+    assert gst.releases == ['r1.pdf']
+    assert gst.editorial is False
+
+    assert catalog[-1].filename == 'd.mov'
+    assert catalog[-1].title is None
+    assert catalog[-1].keywords == []
+    assert [m.filename for m in catalog] == \
+        ['a.mov', 'b.mov', 'c.mov', 'd.mov']
+
+    with pytest.raises(IndexError):
+        catalog[4]
+
+
+def test_catalog_interns_strings(catalog):
+    """testing if the repeating strings are stored only once
+    """
+    assert catalog.strings.strings.count('Nature') == 1
+    assert catalog.strings.strings.count('k2') == 1
+    assert len(catalog.keyword_ids) == 3
+
+
+@pytest.mark.parametrize('kwargs, filenames', [
+    ({}, ['a.mov', 'b.mov', 'c.mov', 'd.mov']),
+    ({'category': 'Nature'}, ['a.mov', 'c.mov']),
+    ({'category': 'Holidays'}, ['a.mov', 'b.mov']),
+    ({'category': 'Science'}, []),
+    ({'editorial': True}, ['b.mov', 'c.mov']),
+    ({'editorial': False}, ['a.mov', 'd.mov']),
+    ({'country': 'Turkey'}, ['a.mov', 'c.mov']),
+    ({'country': 'Spain'}, []),
+    ({'country': ''}, ['d.mov']),
+    ({'category': 'Nature', 'editorial': True}, ['c.mov']),
+    ({'category': 'Holidays', 'country': 'Italy'}, ['b.mov']),
+    ({'missing': 'keywords'}, ['c.mov', 'd.mov']),
+    ({'missing': ['title']}, ['d.mov']),
+    ({'missing': ['description']}, ['d.mov']),
+    ({'missing': ['category2', 'releases']}, ['b.mov', 'c.mov', 'd.mov']),
+    ({'missing': ['country']}, ['d.mov']),
+    ({'missing': ['poster_timecode']}, []),
+    ({'editorial': False, 'missing': ['category1']}, ['d.mov']),
+])
+def test_catalog_filter(catalog, kwargs, filenames):
+    """testing if the filter method is working properly
+    """
+    assert [m.filename for m in catalog.filter(**kwargs)] == filenames
+
+
+def test_catalog_filter_with_unknown_missing_field(catalog):
+    """testing if a ValueError will be raised for unknown fields in missing
+    """
+    with pytest.raises(ValueError):
+        catalog.filter_rows(missing=['filename'])
+
+
+def test_build_catalog():
+    """testing if the StockManager.build_catalog method creates a catalog from
+    the discovered media
+    """
+    import os
+    here = os.path.abspath(os.path.dirname(__file__))
+    from stocker.catalog import Catalog
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(os.path.join(here, 'test_data'))
+    catalog = sm.build_catalog()
+    assert isinstance(catalog, Catalog)
+    assert len(catalog) == 3
+    assert [m.filename for m in catalog.filter(category='Food and drink')] \
+        == ['some_video_2.mp4', 'some_video_3.mp4']
+    assert catalog[0].title == sm.media[0].title
+    assert catalog[0].description == sm.media[0].description
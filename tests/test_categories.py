@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+
+def test_category_index_covers_all_categories():
+    """testing if the category index has an entry for all the categories of
+    all the sites
+    """
+    from stocker.models import category_index, GenericStock, AdobeStock
+    assert set(category_index.to_adobe_stock) == set(GenericStock.categories)
+    assert set(category_index.from_adobe_stock) == \
+        set(AdobeStock.category_dict)
+    assert set(category_index.to_adobe_stock_ids) == \
+        set(GenericStock.categories)
+    assert category_index.to_adobe_stock_ids['Transportation'] == 20
+    assert category_index.adobe_stock_names[7] == 'Food'
+
+
+def test_category_index_keeps_the_first_reverse_mapping():
+    """testing if the AdobeStock categories that are mapped from more than one
+    generic category are mapped back to the first one
+    """
+    from stocker.models import GenericStock
+    assert GenericStock.from_adobe_stock_categories['Graphic Resources'] == \
+        'Abstract'
+    assert GenericStock.from_adobe_stock_categories['People'] == \
+        'Celebrities'
+    for generic, adobe in GenericStock.to_adobe_stock_categories.items():
+        first = [k for k, v in GenericStock.to_adobe_stock_categories.items()
+                 if v == adobe][0]
+        assert GenericStock.from_adobe_stock_categories[adobe] == first
+
+
+def test_category_index_derives_the_reverse_mapping():
+    """testing if the AdobeStock to generic category mapping is the reverse
+    of the generic to AdobeStock category mapping plus the unmapped
+    AdobeStock categories
+    """
+    from stocker.categories import CategoryIndex
+    index = CategoryIndex(
+        categories=['A', 'B', 'C'],
+        to_adobe_stock={'A': 'X', 'B': 'Y', 'C': 'X'},
+        adobe_stock_ids={'X': 1, 'Y': 2, 'Z': 3},
+        unmapped_adobe_stock={'Z': 'C'}
+    )
+    assert dict(index.from_adobe_stock) == {'X': 'A', 'Y': 'B', 'Z': 'C'}
+    for generic, adobe in index.to_adobe_stock.items():
+        assert index.to_adobe_stock[index.from_adobe_stock[adobe]] == adobe
+
+
+def test_category_tables_are_immutable():
+    """testing if the category tables can not be changed
+    """
+    from stocker.models import GenericStock, AdobeStock
+    with pytest.raises(TypeError):
+        GenericStock.to_adobe_stock_categories['Abstract'] = 'Animals'
+    with pytest.raises(TypeError):
+        GenericStock.from_adobe_stock_categories['Animals'] = 'Abstract'
+    with pytest.raises(TypeError):
+        AdobeStock.category_dict['Animals'] = 2
+
+
+def test_generic_stock_init_does_not_change_category_tables():
+    """testing if GenericStock.__init__ does not do any category mapping work
+    """
+    from stocker.models import GenericStock
+    before = dict(GenericStock.from_adobe_stock_categories)
+    GenericStock()
+    assert dict(GenericStock.from_adobe_stock_categories) == before
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'to_adobe_stock': {'A': 'X'}},
+     'No AdobeStock category for generic categories: B'),
+    ({'to_adobe_stock': {'A': 'X', 'B': 'Y', 'C': 'X'}},
+     'Unknown generic categories in to_adobe_stock: C'),
+    ({'to_adobe_stock': {'A': 'X', 'B': 'W'}},
+     'Unknown AdobeStock categories in to_adobe_stock: W'),
+    ({'adobe_stock_ids': {'X': 1, 'Y': 2, 'Z': 3, 'W': 4}},
+     'No generic category for AdobeStock categories: W'),
+    ({'unmapped_adobe_stock': {'Z': 'A', 'X': 'B'}},
+     'AdobeStock categories in unmapped_adobe_stock are already mapped: X'),
+    ({'unmapped_adobe_stock': {'Z': 'A', 'W': 'B'}},
+     'Unknown AdobeStock categories in unmapped_adobe_stock: W'),
+    ({'unmapped_adobe_stock': {'Z': 'C'}},
+     'Unknown generic categories in unmapped_adobe_stock: C'),
+    ({'adobe_stock_ids': {'X': 1, 'Y': 1, 'Z': 3}},
+     'AdobeStock category ids are not unique'),
+])
+def test_category_index_validation(kwargs, message):
+    """testing if the category index validates the tables
+    """
+    from stocker.categories import CategoryIndex
+    data = {
+        'categories': ['A', 'B'],
+        'to_adobe_stock': {'A': 'X', 'B': 'Y'},
+        'adobe_stock_ids': {'X': 1, 'Y': 2, 'Z': 3},
+        'unmapped_adobe_stock': {'Z': 'A'},
+    }
+    data.update(kwargs)
+    with pytest.raises(ValueError) as cm:
+        CategoryIndex(**data)
+
+    assert str(cm.value) == message
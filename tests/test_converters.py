@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+
+def create_stocks():
+    """creates one instance of each stock class
+    """
+    from stocker.models import GenericStock, ShutterStock, AdobeStock, \
+        GettyImages
+    keywords = ['keyword1', 'keyword2']
+    return [
+        GenericStock(
+            filename='generic.mov', title='Generic', description='Desc',
+            category1='Nature', category2='Holidays', keywords=keywords,
+            country='Turkey', poster_timecode='00:00:01:00',
+            releases=['release.pdf'], editorial=True
+        ),
+        ShutterStock(
+            filename='shutter.mov', title='Shutter', description='Desc',
+            category1='Industrial', category2='Science', editorial=True,
+            keywords=keywords
+        ),
+        AdobeStock(
+            filename='adobe.mov', title='Adobe', category='Transport',
+            keywords=keywords, releases=['release.pdf']
+        ),
+        GettyImages(
+            filename='getty.mov', title='Getty', description='Desc',
+            country='Turkey', keywords=keywords,
+            poster_timecode='00:00:01:00'
+        ),
+    ]
+
+
+def legacy_convert(stock, target_class):
+    """converts the given stock through a GenericStock instance
+    """
+    from stocker.models import GenericStock
+    gst = stock
+    if not isinstance(stock, GenericStock):
+        gst = GenericStock()
+        gst.from_(stock)
+        if target_class is GenericStock:
+            return gst
+    return {
+        'ShutterStock': gst.to_shutter_stock,
+        'AdobeStock': gst.to_adobe_stock,
+        'GettyImages': gst.to_getty_images,
+    }[target_class.__name__]()
+
+
+def attributes(stock):
+    """returns the attributes of the given stock instance
+    """
+    return dict(
+        (k, getattr(stock, k)) for k in dir(stock)
+        if not k.startswith('_') and not callable(getattr(stock, k))
+    )
+
+
+@pytest.mark.parametrize('target_class_name', [
+    'GenericStock', 'ShutterStock', 'AdobeStock', 'GettyImages'
+])
+def test_direct_converters_match_the_generic_stock_round_trip(
+        target_class_name):
+    """testing if the direct converters create the same data with the
+    conversion through a GenericStock instance
+    """
+    from stocker import models
+    from stocker.models import convert
+    target_class = getattr(models, target_class_name)
+    for stock in create_stocks():
+        if stock.__class__ is target_class:
+            continue
+        converted = convert(stock, target_class)
+        assert converted.__class__ is target_class
+        assert attributes(converted) == \
+            attributes(legacy_convert(stock, target_class))
+
+
+def test_convert_many():
+    """testing if the convert_many function converts all the given stocks
+    """
+    from stocker.models import convert_many, AdobeStock
+    stocks = create_stocks()
+    converted = list(convert_many(stocks + stocks, AdobeStock))
+    assert len(converted) == 8
+    for c in converted:
+        assert isinstance(c, AdobeStock)
+    assert [c.filename for c in converted[:4]] == \
+        [s.filename for s in stocks]
+
+
+def test_convert_many_is_lazy():
+    """testing if the convert_many function converts the stocks when they are
+    requested
+    """
+    from stocker.models import convert_many, ShutterStock
+    converted = convert_many(iter([1, 2]), ShutterStock)
+    with pytest.raises(TypeError):
+        next(converted)
+
+
+def test_register_converter():
+    """testing if the register_converter decorator registers the converter for
+    the derived classes too
+    """
+    from stocker.models import register_converter, convert, converters, \
+        GenericStock, ShutterStock
+
+    class MyStock(ShutterStock):
+        pass
+
+    class OtherStock(GenericStock):
+        pass
+
+    try:
+        @register_converter(ShutterStock, OtherStock)
+        def shutter_stock_to_other_stock(stock):
+            return OtherStock(title=stock.title)
+
+        converted = convert(MyStock(title='Mine'), OtherStock)
+        assert isinstance(converted, OtherStock)
+        assert converted.title == 'Mine'
+    finally:
+        converters.pop((ShutterStock, OtherStock))
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def media_folder(tmp_path):
+    """creates a folder with three media files and their sidecar files
+    """
+    for i in range(3):
+        with open(str(tmp_path / ('clip_%s.json' % i)), 'w') as f:
+            json.dump({'title': 'Clip %s' % i, 'keywords': ['k%s' % i]}, f)
+        (tmp_path / ('clip_%s.mov' % i)).write_text('')
+    yield str(tmp_path)
+
+
+@pytest.fixture(scope='function')
+def read_counter(monkeypatch):
+    """counts the sidecar files that are read from the disk
+    """
+    from stocker import models
+    read_paths = []
+    original_read_sidecar = models.read_sidecar
+
+    def read_sidecar(path):
+        read_paths.append(path)
+        return original_read_sidecar(path)
+
+    monkeypatch.setattr(models, 'read_sidecar', read_sidecar)
+    yield read_paths
+
+
+def test_discover_media_with_index_stores_the_sidecar_files(media_folder):
+    """testing if the discover_media method stores the sidecar files in the
+    index
+    """
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+
+    assert len(sm.media) == 3
+    assert len(index) == 3
+
+
+def test_discover_media_with_index_reads_only_changed_files(media_folder,
+                                                            read_counter):
+    """testing if the discover_media method only parses the sidecar files that
+    are added or changed since the last scan
+    """
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+    assert len(read_counter) == 3
+
+    # nothing changed
+    read_counter[:] = []
+    sm.discover_media(media_folder, index=index)
+    assert read_counter == []
+    assert [m.title for m in sm.media] == ['Clip 0', 'Clip 1', 'Clip 2']
+    assert [m.keywords for m in sm.media] == [['k0'], ['k1'], ['k2']]
+    assert sm.media[0].path == media_folder
+    assert sm.media[0].filename == 'clip_0.mov'
+
+    # change one and add a new one
+    changed_path = os.path.join(media_folder, 'clip_1.json')
+    with open(changed_path, 'w') as f:
+        json.dump({'title': 'Changed Clip 1'}, f)
+    stat = os.stat(changed_path)
+    os.utime(changed_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    new_path = os.path.join(media_folder, 'clip_3.json')
+    with open(new_path, 'w') as f:
+        json.dump({'title': 'Clip 3'}, f)
+    with open(os.path.join(media_folder, 'clip_3.mov'), 'w') as f:
+        f.write('')
+
+    sm.discover_media(media_folder, index=index)
+    assert sorted(read_counter) == [changed_path, new_path]
+    assert [m.title for m in sm.media] == \
+        ['Clip 0', 'Changed Clip 1', 'Clip 2', 'Clip 3']
+    assert len(index) == 4
+
+
+def test_discover_media_with_index_drops_deleted_files(media_folder):
+    """testing if the discover_media method removes the deleted sidecar files
+    from the index
+    """
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+    assert len(index) == 3
+
+    os.remove(os.path.join(media_folder, 'clip_0.json'))
+    sm.discover_media(media_folder, index=index)
+    assert [m.title for m in sm.media] == ['Clip 1', 'Clip 2']
+    assert len(index) == 2
+
+
+def test_discover_media_with_index_drops_deleted_folders(media_folder):
+    """testing if the discover_media method removes the sidecar files of the
+    deleted and emptied folders from the index
+    """
+    import shutil
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    sub_folder = os.path.join(media_folder, 'sub')
+    os.mkdir(sub_folder)
+    os.rename(os.path.join(media_folder, 'clip_0.json'),
+              os.path.join(sub_folder, 'clip_0.json'))
+    os.rename(os.path.join(media_folder, 'clip_0.mov'),
+              os.path.join(sub_folder, 'clip_0.mov'))
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index, recursive=True)
+    assert len(index) == 3
+
+    # deleted
+    shutil.rmtree(sub_folder)
+    sm.discover_media(media_folder, index=index, recursive=True)
+    assert len(sm.media) == 2
+    assert len(index) == 2
+
+    # emptied
+    for i in (1, 2):
+        os.remove(os.path.join(media_folder, 'clip_%s.json' % i))
+    sm.discover_media(media_folder, index=index, recursive=True)
+    assert sm.media == []
+    assert len(index) == 0
+
+
+def test_discover_media_with_index_drops_unreadable_files(media_folder):
+    """testing if the discover_media method removes the sidecar files that
+    are changed and can not be read anymore from the index
+    """
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+    assert len(index) == 3
+
+    sidecar_path = os.path.join(media_folder, 'clip_1.json')
+    with open(sidecar_path, 'w') as f:
+        f.write('{"title": ')
+    sm.discover_media(media_folder, index=index)
+    assert [m.title for m in sm.media] == ['Clip 0', 'Clip 2']
+    assert [p for p, e in sm.discovery_errors] == [sidecar_path]
+    assert len(index) == 2
+
+
+def test_discover_media_with_index_drops_excluded_files(media_folder):
+    """testing if the discover_media method removes the sidecar files that
+    are skipped by the exclude patterns from the index
+    """
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+    sm.discover_media(media_folder, index=index, exclude=['clip_0.*'])
+    assert len(sm.media) == 2
+    assert len(index) == 2
+
+
+def test_discover_media_with_index_path(media_folder, tmp_path_factory,
+                                        read_counter):
+    """testing if the discover_media method accepts the path of the index file
+    and keeps the index between calls
+    """
+    index_path = str(tmp_path_factory.mktemp('index') / 'index.db')
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index_path)
+    assert os.path.exists(index_path)
+
+    read_counter[:] = []
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index_path)
+    assert read_counter == []
+    assert len(sm.media) == 3
+
+
+def test_discover_media_with_index_does_not_store_invalid_files(media_folder):
+    """testing if the sidecar files that can not be parsed are not stored in
+    the index
+    """
+    with open(os.path.join(media_folder, 'clip_0.json'), 'w') as f:
+        f.write('{')
+
+    from stocker.index import DiscoveryIndex
+    from stocker.models import StockManager
+    index = DiscoveryIndex(':memory:')
+    sm = StockManager()
+    sm.discover_media(media_folder, index=index)
+    assert len(sm.media) == 2
+    assert len(sm.discovery_errors) == 1
+    assert len(index) == 2
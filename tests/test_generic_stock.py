@@ -106,49 +106,201 @@ def test_init_title_with_description_attribute():
 def test_from_method():
     """testing if the from_() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, ShutterStock, AdobeStock, \
+        GettyImages
+    sst = ShutterStock(filename='a.mov', title='Shutter', category1='Nature')
+    gst = GenericStock()
+    gst.from_(sst)
+    assert gst.filename == 'a.mov'
+    assert gst.title == 'Shutter'
+    assert gst.category1 == 'Nature'
+
+    ast = AdobeStock(filename='b.mov', title='Adobe', category='Food')
+    gst = GenericStock()
+    gst.from_(ast)
+    assert gst.filename == 'b.mov'
+    assert gst.title == 'Adobe'
+    assert gst.category1 == 'Food and drink'
+
+    gti = GettyImages(filename='c.mov', title='Getty')
+    gst = GenericStock()
+    gst.from_(gti)
+    assert gst.filename == 'c.mov'
+    assert gst.title == 'Getty'
+
+
+def test_from_method_keeps_the_unmapped_fields():
+    """testing if the from_() method keeps the fields that the other stock
+    class does not have
+    """
+    from stocker.models import GenericStock, ShutterStock, AdobeStock, \
+        GettyImages
+    for other_stock in [ShutterStock(filename='a.mov', title='Title'),
+                        AdobeStock(filename='a.mov', title='Title',
+                                   category='Food'),
+                        GettyImages(filename='a.mov', title='Title')]:
+        gst = GenericStock(
+            path='/media', description='my desc', country='Turkey',
+            poster_timecode='00:00:01:00', releases=['r.pdf']
+        )
+        gst.from_(other_stock)
+        assert gst.filename == 'a.mov'
+        assert gst.title == 'Title'
+        assert gst.path == '/media'
+        assert gst.description == 'my desc'
+        assert gst.country == 'Turkey'
+        assert gst.poster_timecode == '00:00:01:00'
+        if not isinstance(other_stock, AdobeStock):
+            # AdobeStock has releases
+            assert gst.releases == ['r.pdf']
+
+
+def test_from_method_with_unknown_stock_class():
+    """testing if a TypeError will be raised if there is no converter for
+    the class of the other stock
+    """
+    import pytest
+    from stocker.models import GenericStock
+
+    class Unknown:
+        pass
+
+    gst = GenericStock()
+    with pytest.raises(TypeError) as cm:
+        gst.from_(Unknown())
+    assert str(cm.value) == \
+        'There is no converter from Unknown to GenericStock'
 
 
 def test_to_method():
     """testing if the to() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, ShutterStock, AdobeStock, \
+        GettyImages
+    gst = GenericStock(filename='a.mov', title='Title', category1='Nature')
+    for target_class in [ShutterStock, AdobeStock, GettyImages]:
+        converted = gst.to(target_class)
+        assert isinstance(converted, target_class)
+        assert converted.filename == 'a.mov'
+        assert converted.title == 'Title'
+
+
+def test_to_method_with_unknown_target():
+    """testing if a TypeError will be raised if there is no converter for the
+    given target
+    """
+    import pytest
+    from stocker.models import GenericStock
+    gst = GenericStock()
+    with pytest.raises(TypeError) as cm:
+        gst.to(str)
+
+    assert str(cm.value) == 'There is no converter from GenericStock to str'
 
 
 def test_from_shutter_stock_method():
     """testing if the from_shutter_stock() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, ShutterStock
+    sst = ShutterStock(
+        filename='a.mov', title='Title', category1='Nature',
+        category2='Holidays', editorial=True, keywords=['k1', 'k2']
+    )
+    gst = GenericStock()
+    gst.from_shutter_stock(sst)
+    assert gst.filename == 'a.mov'
+    assert gst.title == 'Title'
+    assert gst.category1 == 'Nature'
+    assert gst.category2 == 'Holidays'
+    assert gst.editorial is True
+    assert gst.keywords == ['k1', 'k2']
 
 
 def test_to_shutter_stock_method():
     """testing if the to_shutter_stock() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, ShutterStock
+    gst = GenericStock(
+        filename='a.mov', title='Title', description='Description',
+        category1='Nature', category2='Holidays', editorial=True,
+        keywords=['k1', 'k2']
+    )
+    sst = gst.to_shutter_stock()
+    assert isinstance(sst, ShutterStock)
+    assert sst.filename == 'a.mov'
+    assert sst.title == 'Title'
+    assert sst.description == 'Description'
+    assert sst.category1 == 'Nature'
+    assert sst.category2 == 'Holidays'
+    assert sst.editorial is True
+    assert sst.keywords == ['k1', 'k2']
 
 
 def test_from_abobe_stock_method():
     """testing if the from_adobe_stock() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, AdobeStock
+    ast = AdobeStock(
+        filename='a.mov', title='Title', category='Transport',
+        keywords=['k1', 'k2'], releases=['release1.pdf']
+    )
+    gst = GenericStock()
+    gst.from_adobe_stock(ast)
+    assert gst.filename == 'a.mov'
+    assert gst.title == 'Title'
+    assert gst.category1 == 'Transportation'
+    assert gst.keywords == ['k1', 'k2']
+    assert gst.releases == ['release1.pdf']
 
 
 def test_to_abobe_stock_method():
     """testing if the to_adobe_stock() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, AdobeStock
+    gst = GenericStock(
+        filename='a.mov', title='Title', category1='Food and drink',
+        keywords=['k1', 'k2'], releases=['release1.pdf']
+    )
+    ast = gst.to_adobe_stock()
+    assert isinstance(ast, AdobeStock)
+    assert ast.filename == 'a.mov'
+    assert ast.title == 'Title'
+    assert ast.category == 'Food'
+    assert ast.keywords == ['k1', 'k2']
+    assert ast.releases == ['release1.pdf']
+
+    gst.category1 = ''
+    assert gst.to_adobe_stock().category == ''
 
 
 def test_from_getty_images_method():
     """testing if the from_getty_images() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, GettyImages
+    gti = GettyImages(filename='a.mov', title='Title', keywords=['k1', 'k2'])
+    gst = GenericStock()
+    gst.from_getty_images(gti)
+    assert gst.filename == 'a.mov'
+    assert gst.title == 'Title'
+    assert gst.keywords == ['k1', 'k2']
 
 
 def test_to_getty_images_method():
     """testing if the from_to_images() method is working properly
     """
-    raise NotImplementedError("Test is not implemented yet")
+    from stocker.models import GenericStock, GettyImages
+    gst = GenericStock(
+        filename='a.mov', title='Title', description='Description',
+        keywords=['k1', 'k2'], country='Turkey', poster_timecode='00:00:01:00'
+    )
+    gti = gst.to_getty_images()
+    assert isinstance(gti, GettyImages)
+    assert gti.filename == 'a.mov'
+    assert gti.title == 'Title'
+    assert gti.description == 'Description'
+    assert gti.keywords == ['k1', 'k2']
+    assert gti.country == 'Turkey'
+    assert gti.poster_timecode == '00:00:01:00'
 
 
 def test_from_file_method():
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+
+import json
+import os
+import struct
+
+import pytest
+
+
+XMP = b'''<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/"
+    photoshop:Country="Turkey">
+   <dc:title><rdf:Alt>
+    <rdf:li xml:lang="en">English Title</rdf:li>
+    <rdf:li xml:lang="x-default">XMP Title</rdf:li>
+   </rdf:Alt></dc:title>
+   <dc:subject><rdf:Bag>
+    <rdf:li>sunset</rdf:li>
+    <rdf:li>drone</rdf:li>
+   </rdf:Bag></dc:subject>
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>'''
+
+
+def segment(marker, payload):
+    """returns a JPEG segment with the given marker and payload
+    """
+    return struct.pack('>BBH', 0xff, marker, len(payload) + 2) + payload
+
+
+def iptc_record(record, dataset, value):
+    """returns an IPTC-IIM dataset
+    """
+    return struct.pack('>BBBH', 0x1c, record, dataset, len(value)) + value
+
+
+def photoshop_segment(records):
+    """returns an APP13 segment with the given IPTC-IIM records
+    """
+    resource = b'8BIM' + struct.pack('>H', 0x0404) + b'\0\0' \
+        + struct.pack('>I', len(records)) + records
+    if len(records) % 2:
+        resource += b'\0'
+    # a resource before the IPTC records to skip
+    other = b'8BIM' + struct.pack('>H', 0x0425) + b'\x03abc' \
+        + struct.pack('>I', 3) + b'xyz\0'
+    return segment(0xed, b'Photoshop 3.0\0' + other + resource)
+
+
+def jpeg(xmp=None, iptc=None):
+    """returns the content of a synthetic JPEG file, the compressed data
+    after the SOS marker is not valid JPEG data
+    """
+    segments = [
+        b'\xff\xd8', segment(0xe0, b'JFIF\0\x01\x01\0\0\x01\0\x01\0\0')
+    ]
+    if xmp is not None:
+        segments.append(
+            segment(0xe1, b'http://ns.adobe.com/xap/1.0/\0' + xmp)
+        )
+    if iptc is not None:
+        segments.append(photoshop_segment(iptc))
+    segments.append(segment(0xda, b'\x01\x01\x00\x00\x3f\x00'))
+    segments.append(b'\xff\xe1\xff\xff garbage that is not a segment')
+    segments.append(b'\xff\xd9')
+    return b''.join(segments)
+
+
+IPTC = b''.join([
+    iptc_record(1, 90, b'\x1b%G'),
+    iptc_record(2, 5, 'IPTC Başlık'.encode('utf-8')),
+    iptc_record(2, 120, b'IPTC Description'),
+    iptc_record(2, 25, b'sunset'),
+    iptc_record(2, 25, b'sea'),
+    iptc_record(2, 101, b'Turkey'),
+])
+
+
+def write(path, content):
+    """writes the given content to the given path
+    """
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+def test_read_embedded_metadata_with_iptc(tmp_path):
+    """testing if read_embedded_metadata reads the IPTC records
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), jpeg(iptc=IPTC))
+    assert read_embedded_metadata(path) == {
+        'title': 'IPTC Başlık',
+        'description': 'IPTC Description',
+        'keywords': ['sunset', 'sea'],
+        'country': 'Turkey',
+    }
+
+
+def test_read_embedded_metadata_with_xmp(tmp_path):
+    """testing if read_embedded_metadata reads the XMP packet
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), jpeg(xmp=XMP))
+    assert read_embedded_metadata(path) == {
+        'title': 'XMP Title',
+        'keywords': ['sunset', 'drone'],
+        'country': 'Turkey',
+    }
+
+
+def test_read_embedded_metadata_xmp_takes_precedence(tmp_path):
+    """testing if the XMP values take precedence over the IPTC values
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), jpeg(xmp=XMP, iptc=IPTC))
+    assert read_embedded_metadata(path) == {
+        'title': 'XMP Title',
+        'description': 'IPTC Description',
+        'keywords': ['sunset', 'drone'],
+        'country': 'Turkey',
+    }
+
+
+def test_read_embedded_metadata_without_metadata(tmp_path):
+    """testing if read_embedded_metadata returns an empty dict for the files
+    without metadata
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), jpeg())
+    assert read_embedded_metadata(path) == {}
+
+
+def test_iter_segments_stops_at_sos():
+    """testing if iter_segments doesn't read the data after the SOS marker
+    """
+    from stocker.jpeg import iter_segments
+    data = jpeg(xmp=XMP)
+    markers = [marker for marker, start, end in iter_segments(data)]
+    assert markers == [0xe0, 0xe1]
+
+
+@pytest.mark.parametrize('content, message', [
+    (b'not a jpeg', 'Not a JPEG file'),
+    (b'\xff\xd8\xff\xe1\x00\xff\x00', 'Invalid JPEG segment length 255 at '
+                                      'offset 4'),
+    (b'\xff\xd8\x00\x00', 'Invalid JPEG marker at offset 2'),
+])
+def test_read_embedded_metadata_with_invalid_file(tmp_path, content, message):
+    """testing if a ValueError will be raised for the invalid files
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), content)
+    with pytest.raises(ValueError) as cm:
+        read_embedded_metadata(path)
+    assert str(cm.value) == '%s: %s' % (message, path)
+
+
+def test_read_embedded_metadata_with_empty_file(tmp_path):
+    """testing if a ValueError will be raised for the empty files
+    """
+    from stocker.jpeg import read_embedded_metadata
+    path = write(str(tmp_path / 'still.jpg'), b'')
+    with pytest.raises(ValueError) as cm:
+        read_embedded_metadata(path)
+    assert str(cm.value) == 'The JPEG file is empty: %s' % path
+
+
+@pytest.fixture
+def stills(tmp_path):
+    """creates JPEG files with and without sidecar files
+    """
+    write(str(tmp_path / 'a.jpg'), jpeg(iptc=IPTC))
+    write(str(tmp_path / 'b.JPG'), jpeg(xmp=XMP))
+    write(str(tmp_path / 'c.jpg'), jpeg(xmp=XMP))
+    with open(str(tmp_path / 'c.json'), 'w') as f:
+        json.dump({'title': 'Sidecar Title', 'keywords': ['k']}, f)
+    write(str(tmp_path / 'd.jpg'), b'corrupt')
+    write(str(tmp_path / 'e.png'), b'no sidecar, no embedded metadata')
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {}, {'workers': 2}, {'lazy': True}, {'lazy': True, 'workers': 2},
+])
+def test_discover_media_with_embedded_metadata(stills, kwargs):
+    """testing if discover_media with embedded=True discovers the JPEG files
+    without sidecar files from their embedded metadata
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(stills, embedded=True, **kwargs)
+    assert [m.filename for m in sm.media] == ['a.jpg', 'b.JPG', 'c.jpg']
+    assert [m.title for m in sm.media] == \
+        ['IPTC Başlık', 'XMP Title', 'Sidecar Title']
+    assert [m.keywords for m in sm.media] == \
+        [['sunset', 'sea'], ['sunset', 'drone'], ['k']]
+    assert sm.media[0].description == 'IPTC Description'
+    assert [m.is_dirty for m in sm.media] == [False] * 3
+
+    assert len(sm.discovery_errors) == 1
+    error_path, error = sm.discovery_errors[0]
+    assert error_path == os.path.join(stills, 'd.jpg')
+    assert isinstance(error, ValueError)
+
+
+def test_discover_media_without_embedded_metadata(stills):
+    """testing if discover_media doesn't read the embedded metadata by
+    default
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(stills)
+    assert [m.filename for m in sm.media] == ['c.jpg']
+    assert sm.discovery_errors == []
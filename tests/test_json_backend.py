@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+from stocker import json_backend
+
+
+@pytest.fixture(scope='function', params=['json', 'orjson', 'ujson'])
+def backend(request):
+    """sets each available JSON backend
+    """
+    if request.param not in json_backend.available_backends():
+        pytest.skip('%s is not installed' % request.param)
+    yield json_backend.set_backend(request.param)
+    json_backend._backend = None
+
+
+data = {
+    'title': 'Title with "quotes" and / slash',
+    'description': 'Ünicode çharacters, \x7f, \x01 and 😀',
+    'Ünicode key': 'value',
+    'keywords': ['k1', 'k2'],
+    'releases': [],
+    'editorial': False,
+    'count': 3,
+    'nothing': None,
+}
+
+
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_backends_write_the_same_output(backend, ensure_ascii):
+    """testing if all the backends write the same JSON
+    """
+    stdlib = json_backend.StdlibBackend()
+    assert backend.dumps(data, ensure_ascii=ensure_ascii) == \
+        stdlib.dumps(data, ensure_ascii=ensure_ascii)
+    assert backend.dumps(data, indent=False, ensure_ascii=ensure_ascii) == \
+        stdlib.dumps(data, indent=False, ensure_ascii=ensure_ascii)
+
+
+def test_backends_write_the_same_output_as_json_dump(backend):
+    """testing if the non ASCII characters are escaped by default like the
+    json.dump() calls that wrote the sidecar files before
+    """
+    import json
+    assert backend.dumps(data) == json.dumps(data, indent=2).encode('ascii')
+    assert b'\xc3' in backend.dumps(data, ensure_ascii=False)
+
+
+def test_backends_read_the_same_data(backend):
+    """testing if all the backends read the same data
+    """
+    stdlib = json_backend.StdlibBackend()
+    encoded = stdlib.dumps(data)
+    assert backend.loads(encoded) == data
+    assert backend.loads(encoded.decode('utf-8')) == data
+
+
+def test_backends_raise_value_error_for_invalid_json(backend):
+    """testing if all the backends raise a ValueError for invalid JSON
+    """
+    with pytest.raises(ValueError):
+        backend.loads(b'{"title": ')
+
+
+def test_backends_expand_keyword_lists(backend):
+    """testing if all the backends write the KeywordList instances as lists
+    """
+    from stocker.vocabulary import KeywordVocabulary, KeywordList
+    keywords = KeywordList(KeywordVocabulary(), ['sky', 'sea'])
+    assert backend.dumps({'keywords': keywords}, indent=False) == \
+        b'{"keywords":["sky","sea"]}'
+
+
+def test_to_sidecar_file_is_the_same_for_all_backends(backend,
+                                                      media_with_sidecar):
+    """testing if the to_sidecar_file method writes the same file with all the
+    backends
+    """
+    import os
+    media_file_full_path, sidecar_file_full_path = media_with_sidecar
+    path, filename = os.path.split(media_file_full_path)
+
+    from stocker.models import GenericStock, read_sidecar
+    gst = GenericStock(
+        path=path, filename=filename, title='Çay', keywords=['k1', 'k2']
+    )
+    gst.to_sidecar_file()
+    with open(sidecar_file_full_path, 'rb') as f:
+        content = f.read()
+    assert content == json_backend.StdlibBackend().dumps(
+        dict((k, getattr(gst, k)) for k in gst.json_attrs)
+    )
+    assert read_sidecar(sidecar_file_full_path)['title'] == 'Çay'
+
+    gst.to_sidecar_file(compact=True)
+    with open(sidecar_file_full_path, 'rb') as f:
+        content = f.read()
+    assert b'\n' not in content
+    assert content.startswith(b'{"title":"\\u00c7ay","description":')
+
+
+def test_set_backend_with_unknown_backend():
+    """testing if a ValueError will be raised for unknown backends
+    """
+    with pytest.raises(ValueError) as cm:
+        json_backend.set_backend('simplejson')
+
+    assert str(cm.value) == \
+        "JSON backend should be one of orjson, ujson, json, not 'simplejson'"
+
+
+def test_backend_is_selected_from_environment(monkeypatch):
+    """testing if the backend can be selected with the STOCKER_JSON_BACKEND
+    environment variable
+    """
+    monkeypatch.setattr(json_backend, '_backend', None)
+    monkeypatch.setenv('STOCKER_JSON_BACKEND', 'json')
+    assert json_backend.get_backend().name == 'json'
+
+    monkeypatch.setattr(json_backend, '_backend', None)
+    monkeypatch.delenv('STOCKER_JSON_BACKEND')
+    assert json_backend.get_backend().name == \
+        json_backend.available_backends()[0]
+
+
+def test_write_file_atomic_permissions(tmp_path):
+    """testing if the atomic write applies the umask to the new files and
+    keeps the permissions of the existing files
+    """
+    import os
+    path = str(tmp_path / 'a.json')
+    umask = os.umask(0o027)
+    try:
+        json_backend.write_file(path, {'a': 1}, atomic=True)
+    finally:
+        os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    os.chmod(path, 0o604)
+    json_backend.write_file(path, {'a': 2}, atomic=True)
+    assert os.stat(path).st_mode & 0o777 == 0o604
+    assert os.listdir(str(tmp_path)) == ['a.json']
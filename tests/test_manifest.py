@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+
+def test_update_returns_true_for_new_and_changed_media():
+    """testing if the update method returns True only for the new and changed
+    media
+    """
+    from stocker.manifest import ExportManifest
+    manifest = ExportManifest()
+    assert manifest.update('a.mov', 'hash a') is True
+    assert manifest.update('a.mov', 'hash a') is False
+    assert manifest.update('a.mov', 'hash b') is True
+    assert manifest.update('b.mov', 'hash b') is True
+    assert len(manifest) == 2
+    assert 'a.mov' in manifest
+    assert 'c.mov' not in manifest
+
+
+def test_prune():
+    """testing if the prune method removes the hashes of the media that are
+    not in the given record ids
+    """
+    from stocker.manifest import ExportManifest
+    manifest = ExportManifest({'a.mov': 'a', 'b.mov': 'b', 'c.mov': 'c'})
+    assert manifest.prune({'a.mov', 'c.mov', 'd.mov'}) == 1
+    assert manifest.hashes == {'a.mov': 'a', 'c.mov': 'c'}
+    assert manifest.prune({'a.mov', 'c.mov'}) == 0
+
+
+def test_stock_hash():
+    """testing if the stock_hash method returns a short hex digest that changes
+    with the fields of the media
+    """
+    from stocker.manifest import ExportManifest
+    from stocker.models import GenericStock, ShutterStock
+    from stocker.vocabulary import KeywordList, KeywordVocabulary
+    gst = GenericStock(title='Title', keywords=['a', 'b'], editorial=True)
+    stock_hash = ExportManifest.stock_hash(gst)
+    assert len(stock_hash) == ExportManifest.digest_size * 2
+
+    same = GenericStock(
+        title='Title', keywords=KeywordList(KeywordVocabulary(), ['a', 'b']),
+        editorial=True
+    )
+    assert ExportManifest.stock_hash(same) == stock_hash
+
+    gst.keywords = ['a', 'b', 'c']
+    assert ExportManifest.stock_hash(gst) != stock_hash
+    gst.keywords = ['a', 'b']
+    gst.editorial = False
+    assert ExportManifest.stock_hash(gst) != stock_hash
+
+    assert ExportManifest.stock_hash(ShutterStock(title='Title')) != \
+        ExportManifest.stock_hash(GenericStock(title='Title'))
+
+
+def test_save_and_load(tmp_path):
+    """testing if the manifest is saved to and loaded from a JSON file
+    """
+    from stocker.manifest import ExportManifest
+    path = str(tmp_path / 'manifest.json')
+    manifest = ExportManifest()
+    manifest.update('a.mov', 'hash a')
+    manifest.save(path)
+
+    loaded = ExportManifest.load(path)
+    assert loaded.hashes == manifest.hashes
+    assert loaded.update('a.mov', 'hash a') is False
+
+
+def test_load_missing_file(tmp_path):
+    """testing if loading a missing manifest file returns an empty manifest
+    """
+    from stocker.manifest import ExportManifest
+    manifest = ExportManifest.load(str(tmp_path / 'missing.json'))
+    assert len(manifest) == 0
+
+
+def test_load_invalid_file(tmp_path):
+    """testing if loading a manifest file that doesn't contain a JSON object
+    raises a ValueError
+    """
+    from stocker.manifest import ExportManifest
+    path = tmp_path / 'manifest.json'
+    path.write_text('[]')
+    with pytest.raises(ValueError) as cm:
+        ExportManifest.load(str(path))
+    assert str(cm.value).startswith(
+        'The export manifest should contain a JSON object, not list'
+    )
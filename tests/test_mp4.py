@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import os
+import struct
+
+import pytest
+
+
+def box(box_type, *children):
+    """returns a box with the given type and payload
+    """
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, version, *children):
+    """returns a full box with the given version and zero flags
+    """
+    return box(box_type, struct.pack('>I', version << 24), *children)
+
+
+def mvhd(timescale, duration, version=0):
+    """returns a mvhd box
+    """
+    if version == 1:
+        times = struct.pack('>QQIQ', 0, 0, timescale, duration)
+    else:
+        times = struct.pack('>IIII', 0, 0, timescale, duration)
+    return full_box(b'mvhd', version, times, b'\0' * 80)
+
+
+def mdhd(timescale, duration):
+    """returns a mdhd box
+    """
+    return full_box(
+        b'mdhd', 0, struct.pack('>IIIIHH', 0, 0, timescale, duration, 0, 0)
+    )
+
+
+def tkhd(width, height):
+    """returns a version 0 tkhd box
+    """
+    return full_box(
+        b'tkhd', 0, struct.pack('>IIIII', 0, 0, 1, 0, 0), b'\0' * 52,
+        struct.pack('>II', width << 16, height << 16)
+    )
+
+
+def trak(handler, width, height, timescale, codec, stts_entries):
+    """returns a trak box
+    """
+    stts = full_box(
+        b'stts', 0, struct.pack('>I', len(stts_entries)),
+        b''.join(struct.pack('>II', *entry) for entry in stts_entries)
+    )
+    stsd = full_box(
+        b'stsd', 0, struct.pack('>I', 1), box(codec, b'\0' * 70)
+    )
+    return box(
+        b'trak',
+        tkhd(width, height),
+        box(
+            b'mdia',
+            mdhd(timescale, 0),
+            full_box(b'hdlr', 0, struct.pack('>I4s', 0, handler),
+                     b'\0' * 12),
+            box(b'minf', box(b'stbl', stsd, stts)),
+        )
+    )
+
+
+def movie(duration_seconds=10, mvhd_version=0, moov_first=True,
+          large_mdat=False):
+    """returns the content of a synthetic 1920x1080 25 fps MOV file with an
+    audio and a video track
+    """
+    moov = box(
+        b'moov',
+        mvhd(600, duration_seconds * 600, version=mvhd_version),
+        trak(b'soun', 0, 0, 48000, b'mp4a', [(100, 1024)]),
+        trak(b'vide', 1920, 1080, 12800, b'avc1',
+             [(duration_seconds * 25, 512)]),
+    )
+    if large_mdat:
+        # 64 bit box size
+        payload = b'\0' * 32
+        mdat = struct.pack('>I4sQ', 1, b'mdat', 16 + len(payload)) + payload
+    else:
+        mdat = box(b'mdat', b'\0' * 32)
+    ftyp = box(b'ftyp', b'qt  ', b'\0' * 4)
+    if moov_first:
+        return ftyp + moov + mdat
+    return ftyp + mdat + moov
+
+
+@pytest.mark.parametrize('kwargs', [
+    {}, {'mvhd_version': 1}, {'moov_first': False}, {'large_mdat': True},
+])
+def test_read_video_info(tmp_path, kwargs):
+    """testing if read_video_info reads the duration, resolution, frame rate
+    and codec of the video track
+    """
+    from stocker.mp4 import read_video_info
+    path = str(tmp_path / 'clip.mov')
+    with open(path, 'wb') as f:
+        f.write(movie(**kwargs))
+    info = read_video_info(path)
+    assert info.duration == 10.0
+    assert (info.width, info.height) == (1920, 1080)
+    assert info.frame_rate == 25.0
+    assert info.codec == 'avc1'
+
+
+def test_read_video_info_with_empty_file():
+    """testing if a ValueError will be raised for the empty files
+    """
+    from stocker.mp4 import read_video_info
+    path = os.path.join(
+        os.path.dirname(__file__), 'test_data', 'some_video_1.mp4'
+    )
+    with pytest.raises(ValueError) as cm:
+        read_video_info(path)
+    assert str(cm.value) == 'The video file is empty: %s' % path
+
+
+@pytest.mark.parametrize('content, message', [
+    (b'\0\0\0\x10ftypqt  \0\0\0\0', 'There is no moov box'),
+    (b'\0\0\0\x40moov\0\0\0\0', "Invalid size 64 of the 'moov' box at "
+                                "offset 0"),
+])
+def test_read_video_info_with_invalid_file(tmp_path, content, message):
+    """testing if a ValueError will be raised for the invalid files
+    """
+    from stocker.mp4 import read_video_info
+    path = str(tmp_path / 'clip.mp4')
+    with open(path, 'wb') as f:
+        f.write(content)
+    with pytest.raises(ValueError) as cm:
+        read_video_info(path)
+    assert str(cm.value) == '%s: %s' % (message, path)
+
+
+def test_timecode_to_seconds():
+    """testing if the timecodes are converted with the frame rate of the clip
+    """
+    from stocker.mp4 import VideoInfo
+    info = VideoInfo(4.0, 1920, 1080, 25.0, 'avc1')
+    assert info.timecode_to_seconds('00:01:02:05') == 62.2
+    assert info.contains_timecode('00:00:03:24') is True
+    assert info.contains_timecode('00:00:05:00') is False
+    with pytest.raises(ValueError) as cm:
+        info.timecode_to_seconds('5s')
+    assert str(cm.value) == \
+        'The timecode should be in "HH:MM:SS:FF" format, not \'5s\''
+
+
+@pytest.mark.parametrize('workers', [None, 4])
+def test_read_video_infos_uses_the_cache(tmp_path, workers, monkeypatch):
+    """testing if read_video_infos keeps the order and does not read the
+    cached files that are not changed
+    """
+    from stocker import mp4
+    paths = []
+    for i in range(4):
+        path = str(tmp_path / ('clip_%i.mov' % i))
+        with open(path, 'wb') as f:
+            f.write(movie(duration_seconds=i + 1) if i != 2 else b'')
+        paths.append(path)
+
+    cache_path = str(tmp_path / 'cache.json')
+    cache = mp4.VideoInfoCache(cache_path)
+    results = mp4.read_video_infos(paths, workers=workers, cache=cache)
+    assert [info.duration if info else None for info, error in results] == \
+        [1.0, 2.0, None, 4.0]
+    assert isinstance(results[2][1], ValueError)
+    cache.save()
+
+    read_paths = []
+    read_video_info_safe = mp4._read_video_info_safe
+
+    def counting_read(path):
+        read_paths.append(path)
+        return read_video_info_safe(path)
+
+    monkeypatch.setattr(mp4, '_read_video_info_safe', counting_read)
+    with open(paths[1], 'wb') as f:
+        f.write(movie(duration_seconds=20))
+    results = mp4.read_video_infos(
+        paths, workers=workers, cache=mp4.VideoInfoCache(cache_path)
+    )
+    assert [info.duration if info else None for info, error in results] == \
+        [1.0, 20.0, None, 4.0]
+    assert sorted(read_paths) == [paths[1], paths[2]]
+
+
+def test_stock_manager_read_video_info(tmp_path):
+    """testing if the StockManager reads the video info of the video media
+    and finds the poster timecodes that are not in the clips
+    """
+    import json
+    from stocker.models import StockManager
+    for name, content in [('short', movie(duration_seconds=3)),
+                          ('long', movie(duration_seconds=30)),
+                          ('empty', b'')]:
+        with open(str(tmp_path / ('%s.mov' % name)), 'wb') as f:
+            f.write(content)
+        with open(str(tmp_path / ('%s.json' % name)), 'w') as f:
+            json.dump({'title': name}, f)
+    (tmp_path / 'still.jpg').write_text('')
+    with open(str(tmp_path / 'still.json'), 'w') as f:
+        json.dump({'title': 'still'}, f)
+
+    sm = StockManager()
+    sm.discover_media(str(tmp_path))
+    cache_path = str(tmp_path / 'video_info.json')
+    video_info = sm.read_video_info(workers=2, cache=cache_path)
+    assert sorted(
+        (os.path.basename(path), info.duration)
+        for path, info in video_info.items()
+    ) == [('long.mov', 30.0), ('short.mov', 3.0)]
+    assert [os.path.basename(path) for path, e in sm.video_info_errors] == \
+        ['empty.mov']
+    assert os.path.exists(cache_path)
+
+    assert [m.title for m in sm.find_invalid_poster_timecodes()] == ['short']
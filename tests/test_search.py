@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def stocks():
+    """creates some stocks to search
+    """
+    from stocker.models import GenericStock
+    yield [
+        GenericStock(filename='a.mov', title='Istanbul at sunset',
+                     keywords=['Drone', 'sunset', 'city']),
+        GenericStock(filename='b.mov', title='Bosphorus bridge',
+                     description='The bridge over the Bosphorus, Istanbul',
+                     keywords=['drone', 'bridge']),
+        GenericStock(filename='c.mov', title='Sunset at the beach',
+                     keywords=['sunset', 'beach', 'sea']),
+        GenericStock(filename='d.mov', title='Night city',
+                     keywords=['city', 'night']),
+    ]
+
+
+@pytest.mark.parametrize('kwargs, filenames', [
+    ({}, ['a.mov', 'b.mov', 'c.mov', 'd.mov']),
+    ({'all_of': ['drone']}, ['a.mov', 'b.mov']),
+    ({'all_of': ['drone', 'SUNSET']}, ['a.mov']),
+    ({'all_of': ['drone', 'sea']}, []),
+    ({'all_of': ['unknown']}, []),
+    ({'any_of': ['bridge', 'beach']}, ['b.mov', 'c.mov']),
+    ({'none_of': ['city']}, ['b.mov', 'c.mov']),
+    ({'all_of': ['sunset'], 'none_of': ['drone']}, ['c.mov']),
+    ({'any_of': ['city', 'sea'], 'none_of': ['night']}, ['a.mov', 'c.mov']),
+    ({'prefix': 'istan'}, ['a.mov', 'b.mov']),
+    ({'prefix': 'Istanbul bosp'}, ['b.mov']),
+    ({'prefix': 'sun'}, ['a.mov', 'c.mov']),
+    ({'prefix': 'the'}, ['b.mov', 'c.mov']),
+    ({'prefix': 'zzz'}, []),
+    ({'prefix': 'sun', 'all_of': ['beach']}, ['c.mov']),
+])
+def test_search(stocks, kwargs, filenames):
+    """testing if the search method is working properly
+    """
+    from stocker.search import SearchIndex
+    index = SearchIndex(stocks)
+    assert [s.filename for s in index.search(**kwargs)] == filenames
+
+
+def test_search_index_update_and_remove(stocks):
+    """testing if the search index is updated properly
+    """
+    from stocker.search import SearchIndex
+    index = SearchIndex(stocks)
+    assert len(index) == 4
+
+    stocks[0].keywords = ['sea']
+    stocks[0].title = 'Bosphorus'
+    stocks[0].description = 'Bosphorus'
+    index.update(stocks[0])
+    assert len(index) == 4
+    assert [s.filename for s in index.search(all_of=['drone'])] == ['b.mov']
+    assert [s.filename for s in index.search(all_of=['sea'])] == \
+        ['a.mov', 'c.mov']
+    assert [s.filename for s in index.search(prefix='istanbul')] == ['b.mov']
+    assert [s.filename for s in index.search(prefix='bosph')] == \
+        ['a.mov', 'b.mov']
+
+    index.remove(stocks[1])
+    assert stocks[1] not in index
+    assert [s.filename for s in index.search(prefix='bosph')] == ['a.mov']
+    assert index.search(prefix='istanbul') == []
+    index.remove(stocks[1])
+    assert len(index) == 3
+
+
+def test_stock_manager_search(tmp_path):
+    """testing if the StockManager search index is built while discovering
+    the media and updated by the sidecar file writes
+    """
+    import json
+    for name, keywords in [('a', ['sky', 'sea']), ('b', ['sky'])]:
+        with open(str(tmp_path / ('%s.json' % name)), 'w') as f:
+            json.dump({'title': 'Clip %s' % name, 'keywords': keywords}, f)
+        (tmp_path / ('%s.mov' % name)).write_text('')
+
+    from stocker.models import StockManager
+    sm = StockManager(index_search=True)
+    sm.discover_media(str(tmp_path))
+    assert len(sm.search_index) == 2
+    assert [m.filename for m in sm.search(all_of=['sea'])] == ['a.mov']
+
+    sm.media[1].keywords.append('sea')
+    assert [m.filename for m in sm.search(all_of=['sea'])] == ['a.mov']
+    sm.media[1].to_sidecar_file()
+    assert [m.filename for m in sm.search(all_of=['sea'])] == \
+        ['a.mov', 'b.mov']
+
+
+def test_stock_manager_search_builds_the_index_lazily():
+    """testing if the StockManager.search method builds the index if it is not
+    built yet
+    """
+    from stocker.models import StockManager, GenericStock
+    sm = StockManager()
+    sm.media = [GenericStock(title='Title', keywords=['k'])]
+    assert sm.search_index is None
+    assert sm.search(prefix='tit') == sm.media
+    assert sm.search_index is not None
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import os
+
+import pytest
+
+
+@pytest.mark.parametrize('value, quoted, minimal', [
+    ('plain', '"plain"', 'plain'),
+    ('', '""', ''),
+    (None, '""', ''),
+    (12, '"12"', '12'),
+    ('a,b', '"a,b"', '"a,b"'),
+    ('say "hi"', '"say ""hi"""', '"say ""hi"""'),
+    ('two\nlines', '"two\nlines"', '"two\nlines"'),
+    ('cr\rlf', '"cr\rlf"', '"cr\rlf"'),
+])
+def test_quote_functions(value, quoted, minimal):
+    """testing if the quote functions follow RFC 4180
+    """
+    from stocker.serialization import quote, quote_minimal
+    assert quote(value) == quoted
+    assert quote_minimal(value) == minimal
+
+
+def test_to_csv_escapes_special_characters():
+    """testing if the to_csv methods quote the values with special characters
+    """
+    from stocker.models import ShutterStock, AdobeStock, GettyImages
+    sst = ShutterStock(
+        filename='a,b.mov', description='The "best" clip',
+        keywords=['k1', 'k "2"'], category1='Nature'
+    )
+    assert sst.to_csv() == \
+        '"a,b.mov","The ""best"" clip","k1,k ""2""","Nature,",no'
+
+    ast = AdobeStock(filename='a.mov', title='Line 1\nLine 2', category='')
+    assert ast.to_csv() == 'a.mov,"Line 1\nLine 2","",,""'
+
+    gti = GettyImages(
+        filename='a.mov', title='Title', country='Bosnia, Herzegovina'
+    )
+    assert gti.to_csv() == \
+        'a.mov,"Title","Bosnia, Herzegovina","Title","",00:00:05:00'
+
+
+def test_to_csv_round_trips_with_csv_module():
+    """testing if the CSV rows can be read back with the csv module
+    """
+    import csv
+    import io
+    from stocker.models import GettyImages
+    gti = GettyImages(
+        filename='a "quoted", name.mov', title='Title, with "quotes"',
+        description='Multi\nline', country='Turkey',
+        keywords=['k1', 'k,2']
+    )
+    rows = list(csv.reader(io.StringIO(
+        '%s\n%s' % (GettyImages.csv_header, gti.to_csv())
+    )))
+    assert rows[1] == [
+        'a "quoted", name.mov', 'Multi\nline', 'Turkey',
+        'Title, with "quotes"', 'k1,k,2', '00:00:05:00'
+    ]
+
+
+def test_csv_plan_with_missing_column():
+    """testing if a ValueError will be raised if a header column has no
+    definition in csv_columns
+    """
+    from stocker.models import ShutterStock
+    from stocker.serialization import CSVPlan
+
+    class MyStock(ShutterStock):
+        csv_header = 'filename,rating'
+
+    with pytest.raises(ValueError) as cm:
+        CSVPlan(MyStock)
+
+    assert str(cm.value) == 'MyStock.csv_columns has no column for "rating"'
+
+
+def test_csv_plan_with_callable_and_dotted_columns():
+    """testing if the columns can be callables and dotted attribute names
+    """
+    from stocker.models import ShutterStock
+    from stocker.serialization import CSVPlan
+
+    class MyStock(ShutterStock):
+        csv_header = 'name,length'
+        csv_columns = {
+            'name': ('filename.upper.__name__', False),
+            'length': (lambda s: len(s.filename), True),
+        }
+
+    assert CSVPlan(MyStock).format_row(MyStock(filename='abc')) == \
+        'upper,"3"'
+
+
+def test_csv_plan_with_deprecated_csv_format():
+    """testing if the csv_format template of a class is still used with a
+    DeprecationWarning
+    """
+    from stocker.models import ShutterStock
+    from stocker.serialization import CSVPlan
+
+    class MyStock(ShutterStock):
+        csv_header = 'filename,keywords,editorial'
+        csv_format = '{filename},"{keywords}",{editorial}'
+
+    with pytest.warns(DeprecationWarning) as cm:
+        plan = CSVPlan(MyStock)
+
+    assert str(cm[0].message) == \
+        'MyStock.csv_format is deprecated, use csv_columns instead'
+    stock = MyStock(filename='a.mov', keywords=['k1', 'k2'], editorial=True)
+    assert plan.header == 'filename,keywords,editorial'
+    assert plan.format_row(stock) == 'a.mov,"k1,k2",yes'
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 3, 1000])
+def test_csv_plan_write_in_batches(batch_size):
+    """testing if the CSVPlan.write method writes the same content regardless
+    of the batch size
+    """
+    import io
+    from stocker.models import ShutterStock
+    from stocker.serialization import get_csv_plan
+    stocks = [ShutterStock(filename='%i.mov' % i) for i in range(5)]
+    plan = get_csv_plan(ShutterStock)
+
+    f = io.StringIO()
+    assert plan.write(f, stocks, batch_size=batch_size) == 5
+    assert f.getvalue() == '\n'.join(
+        [ShutterStock.csv_header] + [s.to_csv() for s in stocks]
+    )
+
+    f = io.StringIO()
+    assert plan.write(f, stocks, batch_size=batch_size, header=False) == 5
+    assert f.getvalue() == '\n'.join([s.to_csv() for s in stocks])
+
+
+def read_files(paths):
+    """returns the content of the given files
+    """
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read().decode('utf-8'))
+    return contents
+
+
+def test_sharded_csv_writer_without_limits(tmp_path):
+    """testing if the ShardedCSVWriter writes a single file without limits
+    """
+    from stocker.serialization import ShardedCSVWriter
+    with ShardedCSVWriter('a,b', str(tmp_path), 'Test') as writer:
+        writer.write_row('1,2')
+        writer.write_row('3,4')
+
+    assert writer.paths == [str(tmp_path / 'Test.csv')]
+    assert read_files(writer.paths) == ['a,b\n1,2\n3,4']
+    assert writer.row_count == 2
+    assert writer.byte_count == 11
+
+
+def test_sharded_csv_writer_with_max_bytes(tmp_path):
+    """testing if the ShardedCSVWriter starts a new file when the next row
+    would exceed max_bytes
+    """
+    from stocker.serialization import ShardedCSVWriter
+    writer = ShardedCSVWriter('a,b', str(tmp_path), 'Test', max_bytes=12)
+    for row in ['1,2', '3,4', 'ü,6', '7,8', '9,10']:
+        writer.write_row(row)
+    writer.close()
+
+    contents = read_files(writer.paths)
+    assert [os.path.basename(p) for p in writer.paths] == \
+        ['Test_001.csv', 'Test_002.csv', 'Test_003.csv']
+    assert contents == ['a,b\n1,2\n3,4', 'a,b\nü,6\n7,8', 'a,b\n9,10']
+    for path in writer.paths:
+        assert os.path.getsize(path) <= 12
+
+
+def test_sharded_csv_writer_with_max_rows_and_max_bytes(tmp_path):
+    """testing if the ShardedCSVWriter respects both of the limits
+    """
+    from stocker.serialization import ShardedCSVWriter
+    writer = ShardedCSVWriter(
+        'h', str(tmp_path), 'Test', max_rows=2, max_bytes=8
+    )
+    for row in ['1', '2', '3', '444', '5']:
+        writer.write_row(row)
+    writer.close()
+    assert read_files(writer.paths) == ['h\n1\n2', 'h\n3\n444', 'h\n5']
+
+
+def test_sharded_csv_writer_with_too_big_row(tmp_path):
+    """testing if a ValueError will be raised if a single row does not fit in
+    max_bytes
+    """
+    from stocker.serialization import ShardedCSVWriter
+    writer = ShardedCSVWriter('a,b', str(tmp_path), 'Test', max_bytes=8)
+    with pytest.raises(ValueError) as cm:
+        writer.write_row('1234,5678')
+    writer.close()
+    assert str(cm.value) == \
+        'A row of Test does not fit in max_bytes (13 > 8): 1234,5678'
+
+    with pytest.raises(ValueError):
+        ShardedCSVWriter('a,b', str(tmp_path), 'Test', max_bytes=2)
+    with pytest.raises(ValueError):
+        ShardedCSVWriter('a,b', str(tmp_path), 'Test', max_rows=0)
+
+
+def test_sharded_csv_writer_replaces_the_files_on_close(tmp_path):
+    """testing if the ShardedCSVWriter writes to temporary files and replaces
+    the earlier files only on close
+    """
+    from stocker.serialization import ShardedCSVWriter
+    (tmp_path / 'Test.csv').write_text('old')
+    writer = ShardedCSVWriter('a,b', str(tmp_path), 'Test')
+    writer.write_row('1,2')
+    assert (tmp_path / 'Test.csv').read_text() == 'old'
+    writer.close()
+    assert sorted(os.listdir(str(tmp_path))) == ['.Test.files', 'Test.csv']
+    assert read_files(writer.paths) == ['a,b\n1,2']
+
+
+def test_sharded_csv_writer_removes_stale_files(tmp_path):
+    """testing if the ShardedCSVWriter removes the files of an earlier run
+    that are not written again
+    """
+    from stocker.serialization import ShardedCSVWriter
+    with ShardedCSVWriter('h', str(tmp_path), 'Test', max_rows=1) as writer:
+        for row in ['1', '2', '3']:
+            writer.write_row(row)
+    with ShardedCSVWriter('h', str(tmp_path), 'Test', max_rows=1) as writer:
+        writer.write_row('1')
+        writer.write_row('2')
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['.Test.files', 'Test_001.csv', 'Test_002.csv']
+    assert read_files(writer.paths) == ['h\n1', 'h\n2']
+
+    with ShardedCSVWriter('h', str(tmp_path), 'Test') as writer:
+        writer.write_row('1')
+    assert sorted(os.listdir(str(tmp_path))) == ['.Test.files', 'Test.csv']
+
+
+def test_sharded_csv_writer_keeps_the_files_it_did_not_write(tmp_path):
+    """testing if the ShardedCSVWriter does not remove the files that are not
+    written by an earlier run, even if they look like its own files
+    """
+    from stocker.serialization import ShardedCSVWriter
+    for filename in ['Test.csv', 'Test_003.csv', 'Test_1000.csv',
+                     'Test_backup.csv', 'Other_001.csv']:
+        (tmp_path / filename).write_text('old')
+    with ShardedCSVWriter('h', str(tmp_path), 'Test', max_rows=1) as writer:
+        writer.write_row('1')
+    assert sorted(os.listdir(str(tmp_path))) == [
+        '.Test.files', 'Other_001.csv', 'Test.csv', 'Test_001.csv',
+        'Test_003.csv', 'Test_1000.csv', 'Test_backup.csv'
+    ]
+
+
+def test_sharded_csv_writer_abort(tmp_path):
+    """testing if the ShardedCSVWriter keeps the earlier files if it is
+    aborted
+    """
+    from stocker.serialization import ShardedCSVWriter
+    (tmp_path / 'Test.csv').write_text('old')
+    with pytest.raises(RuntimeError):
+        with ShardedCSVWriter('a,b', str(tmp_path), 'Test') as writer:
+            writer.write_row('1,2')
+            raise RuntimeError()
+    assert os.listdir(str(tmp_path)) == ['Test.csv']
+    assert (tmp_path / 'Test.csv').read_text() == 'old'
+
+
+def test_write_csv_shards(tmp_path):
+    """testing if the StockManager.write_csv_shards method splits the content
+    by the size limit and uses the limits of the target class by default
+    """
+    from stocker.models import StockManager, GenericStock, AdobeStock
+    sm = StockManager()
+    sm.media = [
+        GenericStock(filename='%i.mov' % i, title='Clip %i' % i)
+        for i in range(10)
+    ]
+    rows = sm.generate_csv(AdobeStock).split('\n')
+
+    paths = sm.write_csv_shards(AdobeStock, str(tmp_path), max_bytes=100)
+    contents = read_files(paths)
+    assert len(contents) > 1
+    assert [c.split('\n')[0] for c in contents] == [rows[0]] * len(contents)
+    assert sum([c.split('\n')[1:] for c in contents], []) == rows[1:]
+    for path in paths:
+        assert os.path.getsize(path) <= 100
+
+    class LimitedAdobeStock(AdobeStock):
+        csv_max_rows = 3
+
+    from stocker.models import converters, GenericStock
+    converters[(GenericStock, LimitedAdobeStock)] = \
+        lambda gst: LimitedAdobeStock(filename=gst.filename, title=gst.title)
+    try:
+        paths = sm.write_csv_shards(LimitedAdobeStock, str(tmp_path))
+    finally:
+        converters.pop((GenericStock, LimitedAdobeStock))
+    assert [os.path.basename(p) for p in paths] == [
+        'LimitedAdobeStock_%03i.csv' % i for i in range(1, 5)
+    ]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import json
+
+import pytest
+
+
+def test_phase_records_calls_and_time():
+    """testing if the phase context manager sums up the calls and durations
+    """
+    from stocker.stats import Stats
+    stats = Stats()
+    for i in range(3):
+        with stats.phase('parsing'):
+            pass
+    stats.add_time('parsing', 1.5)
+    assert stats.phases['parsing']['calls'] == 4
+    assert stats.phases['parsing']['seconds'] >= 1.5
+    assert stats.phases['parsing']['peak_memory'] is None
+
+
+def test_phase_records_the_time_on_errors():
+    """testing if the phase is recorded even if the code in it raises
+    """
+    from stocker.stats import Stats
+    stats = Stats()
+    with pytest.raises(KeyError):
+        with stats.phase('failing'):
+            raise KeyError('key')
+    assert stats.phases['failing']['calls'] == 1
+
+
+def test_phase_with_trace_memory():
+    """testing if the peak memory of the nested phases is recorded
+    """
+    import tracemalloc
+    from stocker.stats import Stats
+    stats = Stats(trace_memory=True)
+    with stats.phase('outer'):
+        data = [0] * 100000
+        with stats.phase('inner'):
+            more_data = [1] * 200000
+            del more_data
+        del data
+    assert list(stats.phases) == ['outer', 'inner']
+    assert stats.phases['inner']['peak_memory'] > 190000 * 8
+    assert stats.phases['outer']['peak_memory'] > 290000 * 8
+    assert tracemalloc.is_tracing() is False
+
+
+def test_count_and_json_dump(tmp_path):
+    """testing if the counters are included in the JSON dump
+    """
+    from stocker.stats import Stats
+    stats = Stats()
+    stats.count('rows_written')
+    stats.count('rows_written', 9)
+    with stats.phase('export'):
+        pass
+    data = json.loads(stats.to_json())
+    assert data['counters'] == {'rows_written': 10}
+    assert data['phases']['export']['calls'] == 1
+
+    path = str(tmp_path / 'stats.json')
+    stats.dump(path)
+    with open(path) as f:
+        assert json.load(f) == data
+
+    stats.reset()
+    assert stats.to_dict() == {'phases': {}, 'counters': {}}
+
+
+def test_null_stats_records_nothing():
+    """testing if the null_stats object records nothing
+    """
+    from stocker.stats import null_stats
+    with null_stats.phase('parsing'):
+        null_stats.count('sidecars_parsed')
+        null_stats.add_time('conversion', 1.0)
+    assert null_stats.enabled is False
+    assert null_stats.to_dict() == {'phases': {}, 'counters': {}}
@@ -16,6 +16,8 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with Stocker.  If not, see <http://www.gnu.org/licenses/>
 
+import pytest
+
 
 def test_to_csv():
     """testing if StockBase.to_csv() raises a NotImplementedError
@@ -226,4 +228,146 @@ def test_to_sidecar_file_content(media_with_sidecar):
     "keyword2",
     "keyword3"
   ]
-}"""
\ No newline at end of file
+}"""
+
+
+def test_stock_classes_do_not_have_instance_dict():
+    """testing if the stock classes are slotted and do not have a per instance
+    __dict__
+    """
+    import pytest
+    from stocker.models import StockBase, GenericStock, ShutterStock, \
+        AdobeStock, GettyImages
+    for klass in [StockBase, GenericStock, ShutterStock, AdobeStock,
+                  GettyImages]:
+        stock = klass()
+        assert not hasattr(stock, '__dict__')
+        with pytest.raises(AttributeError):
+            stock.some_unknown_attribute = 'value'
+
+
+def test_fields_attribute():
+    """testing if the fields attribute contains the attributes of the class and
+    its base classes
+    """
+    from stocker.models import StockBase, AdobeStock
+    assert StockBase.fields == {'filename', 'path', 'title', 'keywords'}
+    assert AdobeStock.fields == {
+        'filename', 'path', 'title', 'keywords', 'category', 'releases'
+    }
+
+
+def test_from_dict_ignores_unknown_keys():
+    """testing if the from_dict method skips and returns the keys that are not
+    in the fields of the class
+    """
+    from stocker.models import StockBase
+    sb = StockBase()
+    assert sb.from_dict({'title': 'Title', 'description': 'Description'}) \
+        == ['description']
+    assert sb.title == 'Title'
+    assert not hasattr(sb, 'description')
+
+
+def test_lazy_stock_without_manager_loads_its_sidecar_file(
+        media_with_sidecar):
+    """testing if a lazy media that does not belong to a StockManager loads
+    its own sidecar file on first access
+    """
+    import json
+    import os
+    import pytest
+    from stocker.models import GenericStock
+    media_path, sidecar_path = media_with_sidecar
+    with open(sidecar_path, 'w') as f:
+        json.dump({'title': 'Title', 'category1': 'Nature'}, f)
+    folder, filename = os.path.split(media_path)
+    gst = GenericStock._new_lazy(folder, filename)
+    assert gst.is_loaded is False
+    assert gst.category1 == 'Nature'
+    assert gst.is_loaded is True
+    assert gst.title == 'Title'
+    assert gst.keywords == []
+    assert gst.poster_timecode == GenericStock().poster_timecode
+    with pytest.raises(AttributeError):
+        gst.not_a_field
+
+
+def test_site_stock_classes_do_not_track_changes():
+    """testing if the site specific stock classes, which are created for the
+    CSV rows, set their attributes without change tracking
+    """
+    from stocker.models import StockBase, GenericStock, ShutterStock, \
+        AdobeStock, GettyImages
+    for klass in [ShutterStock, AdobeStock, GettyImages]:
+        assert klass.track_changes is False
+        assert klass.__setattr__ is object.__setattr__
+        stock = klass(title='Title')
+        stock.mark_clean()
+        assert stock.is_dirty is True
+
+    assert GenericStock.__setattr__ is StockBase.__setattr__
+    gst = GenericStock(title='Title')
+    gst.mark_clean()
+    gst.title = 'Changed'
+    assert gst.changed_fields == {'title'}
+
+
+def test_new_stock_does_not_allocate_a_changed_fields_set():
+    """testing if a new stock instance uses the shared fields set as its
+    changed fields and a set is created only on the first change after it is
+    saved
+    """
+    from stocker.models import GenericStock
+    gst = GenericStock(title='Title')
+    assert gst._changed_fields is GenericStock.fields
+    assert gst.changed_fields == GenericStock.fields
+    gst.title = 'Changed'
+    gst.mark_dirty('keywords')
+    assert gst._changed_fields is GenericStock.fields
+
+    gst.mark_clean()
+    assert gst._changed_fields is None
+    gst.title = 'Changed'
+    assert gst._changed_fields is None
+    gst.title = 'Changed again'
+    assert gst.changed_fields == {'title'}
+    gst.mark_dirty()
+    assert gst.changed_fields == GenericStock.fields
+
+
+@pytest.mark.parametrize('copy_function', ['copy', 'deepcopy', 'pickle'])
+def test_stock_copy_and_pickle_round_trip(copy_function):
+    """testing if the stock instances can be copied and pickled, the copies
+    keep the fields and the changes but do not belong to the StockManager
+    """
+    import copy
+    import pickle
+    from stocker.models import StockManager, GenericStock, ShutterStock
+
+    def copy_stock(stock):
+        if copy_function == 'pickle':
+            return pickle.loads(pickle.dumps(stock))
+        return getattr(copy, copy_function)(stock)
+
+    new_stock = copy_stock(GenericStock(title='Title', keywords=['k1']))
+    assert new_stock.title == 'Title'
+    assert new_stock.keywords == ['k1']
+    assert new_stock._changed_fields is GenericStock.fields
+
+    sm = StockManager()
+    gst = sm._create_stock('/tmp', 'a.mov', {'title': 'Title'})
+    gst.description = 'Changed'
+    copied = copy_stock(gst)
+    assert copied.filename == 'a.mov'
+    assert copied.description == 'Changed'
+    assert copied.changed_fields == {'description'}
+    assert copied._manager is None
+
+    copied.title = 'Changed'
+    assert copied.changed_fields == {'title', 'description'}
+    assert gst.changed_fields == {'description'}
+    assert len(sm.journal) == 1
+
+    shutter_stock = copy_stock(ShutterStock(filename='b.mov', title='T'))
+    assert shutter_stock.to_csv() == 'b.mov,"T","",",",no'
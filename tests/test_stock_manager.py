@@ -16,6 +16,10 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with Stocker.  If not, see <http://www.gnu.org/licenses/>
 
+import os
+
+import pytest
+
 
 def test_discover_media_method():
     """testing if the discover_media method is working properly
@@ -117,3 +121,892 @@ def test_generate_csv_method_with_target_is_getty_images():
 some_video_1.mp4,"This is a test video, created just for test!",Turkey,"Test video 1","keyword 1,keyword 2,keyword 3",00:00:05:00
 some_video_2.mp4,"This is a test video, created just for test!",Turkey,"Test video 2","keyword 4,keyword 5,keyword 6",00:00:05:00
 some_video_3.mp4,"This is a test video, created just for test!",Turkey,"Test video 3","keyword 5,keyword 6,keyword 7",00:00:05:00'''
+
+
+def test_scan_directory_pairs_media_with_sidecar_files(tmp_path):
+    """testing if the scan_directory method pairs the media files with their
+    sidecar files and skips the others
+    """
+    for filename in ['clip_b.mov', 'clip_b.json', 'clip_a.mp4', 'clip_a.json',
+                     'clip_a.txt', 'orphan.json', 'no_sidecar.mov',
+                     'notes.txt']:
+        (tmp_path / filename).write_text('{}')
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    pairs = sm.scan_directory(str(tmp_path))
+
+    assert pairs == [
+        (str(tmp_path), 'clip_a.mp4', 'clip_a.json'),
+        (str(tmp_path), 'clip_b.mov', 'clip_b.json'),
+    ]
+
+
+def test_scan_directory_uses_media_file_extension(tmp_path):
+    """testing if the scan_directory method uses the media_file_extension
+    attribute to pick the media file
+    """
+    for filename in ['clip.json', 'clip.psd', 'clip.JPG']:
+        (tmp_path / filename).write_text('{}')
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    assert sm.scan_directory(str(tmp_path)) == [
+        (str(tmp_path), 'clip.JPG', 'clip.json')
+    ]
+
+
+def test_discover_media_skips_non_media_files(tmp_path):
+    """testing if the discover_media method picks the media file and not any
+    other file with the same base name
+    """
+    import json
+    with open(str(tmp_path / 'clip.json'), 'w') as f:
+        json.dump({'title': 'Clip'}, f)
+    (tmp_path / 'clip.aaa').write_text('')
+    (tmp_path / 'clip.mov').write_text('')
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(str(tmp_path))
+
+    assert len(sm.media) == 1
+    assert sm.media[0].filename == 'clip.mov'
+    assert sm.media[0].path == str(tmp_path)
+    assert sm.media[0].title == 'Clip'
+
+
+def test_iter_csv_rows_method_yields_header_first():
+    """testing if the iter_csv_rows method yields the header first and then
+    one row per media
+    """
+    import os
+    HERE = os.path.abspath(os.path.dirname(__file__))
+    test_data_path = os.path.join(HERE, 'test_data')
+
+    from stocker.models import StockManager, GettyImages
+    sm = StockManager()
+    sm.discover_media(test_data_path)
+
+    rows = sm.iter_csv_rows(GettyImages)
+    assert next(rows) == GettyImages.csv_header
+    assert len(list(rows)) == 3
+
+
+def test_write_csv_method_writes_the_generate_csv_content():
+    """testing if the write_csv method writes the same content with the
+    generate_csv method
+    """
+    import io
+    import os
+    HERE = os.path.abspath(os.path.dirname(__file__))
+    test_data_path = os.path.join(HERE, 'test_data')
+
+    from stocker.models import StockManager, AdobeStock
+    sm = StockManager()
+    sm.discover_media(test_data_path)
+
+    f = io.StringIO()
+    row_count = sm.write_csv(AdobeStock, f)
+
+    assert row_count == 3
+    assert f.getvalue() == sm.generate_csv(AdobeStock)
+
+
+def test_write_csv_method_with_no_media():
+    """testing if the write_csv method writes only the header if there is no
+    media
+    """
+    import io
+    from stocker.models import StockManager, ShutterStock
+    sm = StockManager()
+    f = io.StringIO()
+    assert sm.write_csv(ShutterStock, f) == 0
+    assert f.getvalue() == ShutterStock.csv_header
+
+
+def test_discover_media_with_workers_keeps_the_order(tmp_path):
+    """testing if the discover_media method with workers returns the media in
+    the same order with the serial discovery
+    """
+    import json
+    for i in range(20):
+        with open(str(tmp_path / ('clip_%02i.json' % i)), 'w') as f:
+            json.dump({'title': 'Clip %s' % i}, f)
+        (tmp_path / ('clip_%02i.mov' % i)).write_text('')
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(str(tmp_path))
+    expected = [(m.filename, m.title) for m in sm.media]
+    assert len(expected) == 20
+
+    for executor in ['thread', 'process']:
+        sm.discover_media(str(tmp_path), workers=4, executor=executor)
+        assert [(m.filename, m.title) for m in sm.media] == expected
+
+
+def test_discover_media_reports_invalid_sidecar_files(tmp_path):
+    """testing if the discover_media method skips and reports the sidecar
+    files that can not be parsed
+    """
+    import json
+    with open(str(tmp_path / 'good.json'), 'w') as f:
+        json.dump({'title': 'Good'}, f)
+    (tmp_path / 'good.mov').write_text('')
+    (tmp_path / 'bad.json').write_text('{"title": ')
+    (tmp_path / 'bad.mov').write_text('')
+    (tmp_path / 'list.json').write_text('[]')
+    (tmp_path / 'list.mov').write_text('')
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    for workers in [None, 2]:
+        sm.discover_media(str(tmp_path), workers=workers)
+
+        assert [m.filename for m in sm.media] == ['good.mov']
+        assert [p for p, e in sm.discovery_errors] == [
+            str(tmp_path / 'bad.json'), str(tmp_path / 'list.json')
+        ]
+        for p, e in sm.discovery_errors:
+            assert isinstance(e, ValueError)
+
+
+def test_discover_media_reports_unknown_sidecar_keys(tmp_path):
+    """testing if the discover_media method stores and counts the keys of the
+    sidecar files that are not fields of the media
+    """
+    import json
+    with open(str(tmp_path / 'a.json'), 'w') as f:
+        json.dump({'title': 'A', 'titel': 'typo', 'kewords': []}, f)
+    (tmp_path / 'a.mov').write_text('')
+    with open(str(tmp_path / 'b.json'), 'w') as f:
+        json.dump({'title': 'B'}, f)
+    (tmp_path / 'b.mov').write_text('')
+
+    from stocker.models import StockManager
+    from stocker.stats import Stats
+    for lazy in [False, True]:
+        stats = Stats()
+        sm = StockManager(stats=stats)
+        sm.discover_media(str(tmp_path), lazy=lazy)
+        sm.load_media()
+        assert sm.media[0].title == 'A'
+        assert sm.unknown_keys == [
+            (str(tmp_path / 'a.json'), ['titel', 'kewords'])
+        ]
+        assert stats.counters['unknown_keys'] == 2
+
+
+def test_discover_media_with_invalid_executor():
+    """testing if a ValueError will be raised if the executor argument is not
+    one of "thread" or "process"
+    """
+    import pytest
+    from stocker.models import StockManager
+    sm = StockManager()
+    with pytest.raises(ValueError) as cm:
+        sm.discover_media('.', workers=2, executor='fiber')
+
+    assert str(cm.value) == \
+        "StockManager.executor should be one of process, thread, not 'fiber'"
+
+
+@pytest.fixture(scope='function')
+def media_tree(tmp_path):
+    """creates a folder tree with media and sidecar files
+    """
+    for folder in ['', 'shoot1', 'shoot1/day1', 'shoot1/day1/proxies',
+                   'shoot1/day2', 'shoot2/.cache']:
+        folder_path = tmp_path / folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+        name = folder.replace('/', '_') or 'root'
+        (folder_path / ('%s.json' % name)).write_text('{"title": "%s"}' % name)
+        (folder_path / ('%s.mov' % name)).write_text('')
+        (folder_path / ('%s_still.jpg' % name)).write_text('')
+        (folder_path / ('%s_still.json' % name)).write_text('{}')
+    yield tmp_path
+
+
+def test_scan_directory_is_not_recursive_by_default(media_tree):
+    """testing if the scan_directory method only scans the given folder by
+    default
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    assert [p[1] for p in sm.scan_directory(str(media_tree))] == \
+        ['root.mov', 'root_still.jpg']
+
+
+def test_scan_directory_recursive(media_tree):
+    """testing if the scan_directory method in recursive mode scans the sub
+    folders
+    """
+    import os
+    from stocker.models import StockManager
+    sm = StockManager()
+    pairs = sm.scan_directory(str(media_tree), recursive=True)
+    assert [(os.path.relpath(p[0], str(media_tree)), p[1]) for p in pairs] \
+        == [
+            ('.', 'root.mov'),
+            ('.', 'root_still.jpg'),
+            ('shoot1', 'shoot1.mov'),
+            ('shoot1', 'shoot1_still.jpg'),
+            ('shoot1/day1', 'shoot1_day1.mov'),
+            ('shoot1/day1', 'shoot1_day1_still.jpg'),
+            ('shoot1/day1/proxies', 'shoot1_day1_proxies.mov'),
+            ('shoot1/day1/proxies', 'shoot1_day1_proxies_still.jpg'),
+            ('shoot1/day2', 'shoot1_day2.mov'),
+            ('shoot1/day2', 'shoot1_day2_still.jpg'),
+            ('shoot2/.cache', 'shoot2_.cache.mov'),
+            ('shoot2/.cache', 'shoot2_.cache_still.jpg'),
+        ]
+
+
+def test_scan_directory_recursive_does_not_list_excluded_folders(
+        media_tree, monkeypatch):
+    """testing if the scan_directory method does not list the excluded folders
+    """
+    import os
+    listed_folders = []
+    original_scandir = os.scandir
+
+    def scandir(path):
+        listed_folders.append(os.path.relpath(path, str(media_tree)))
+        return original_scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+
+    from stocker.models import StockManager
+    sm = StockManager()
+    pairs = sm.scan_directory(
+        str(media_tree), recursive=True, exclude=['proxies', '.*']
+    )
+    assert sorted(listed_folders) == \
+        ['.', 'shoot1', 'shoot1/day1', 'shoot1/day2', 'shoot2']
+    assert [p[1] for p in pairs if p[1].endswith('.mov')] == \
+        ['root.mov', 'shoot1.mov', 'shoot1_day1.mov', 'shoot1_day2.mov']
+
+
+def test_scan_directory_with_relative_path_patterns(media_tree):
+    """testing if the include and exclude patterns are also matched against
+    the relative paths
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    pairs = sm.scan_directory(
+        str(media_tree), recursive=True, include=['shoot1/*.mov'],
+        exclude=['shoot1/day1']
+    )
+    assert [p[1] for p in pairs] == ['shoot1.mov', 'shoot1_day2.mov']
+
+
+def test_scan_directory_with_max_depth(media_tree):
+    """testing if the scan_directory method does not go deeper than max_depth
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    pairs = sm.scan_directory(
+        str(media_tree), recursive=True, max_depth=1, include='*.mov'
+    )
+    assert [p[1] for p in pairs] == ['root.mov', 'shoot1.mov']
+
+
+def test_discover_media_recursive(media_tree):
+    """testing if the discover_media method in recursive mode discovers the
+    media in sub folders
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(
+        str(media_tree), recursive=True, include=['*.mov'],
+        exclude=['proxies']
+    )
+    assert [m.title for m in sm.media] == \
+        ['root', 'shoot1', 'shoot1_day1', 'shoot1_day2', 'shoot2_.cache']
+    assert sm.media[2].path == str(media_tree / 'shoot1' / 'day1')
+
+
+def test_export_all_writes_all_targets(tmp_path):
+    """testing if the export_all method writes the same content with the
+    generate_csv method for all the targets
+    """
+    import os
+    HERE = os.path.abspath(os.path.dirname(__file__))
+    test_data_path = os.path.join(HERE, 'test_data')
+
+    from stocker.models import StockManager, ShutterStock, AdobeStock, \
+        GettyImages
+    sm = StockManager()
+    sm.discover_media(test_data_path)
+
+    result = sm.export_all(out_dir=str(tmp_path))
+    assert sorted(result, key=lambda x: x.__name__) == \
+        [AdobeStock, GettyImages, ShutterStock]
+    for target_class in [ShutterStock, AdobeStock, GettyImages]:
+        assert result[target_class] == \
+            [str(tmp_path / ('%s.csv' % target_class.__name__))]
+        with open(result[target_class][0], encoding='utf-8') as f:
+            assert f.read() == sm.generate_csv(target_class)
+
+
+def test_export_all_converts_each_media_once_per_target(tmp_path,
+                                                        monkeypatch):
+    """testing if the export_all method walks the media only once
+    """
+    from stocker.models import StockManager, GenericStock, AdobeStock, \
+        GettyImages
+
+    class MediaList(list):
+        iteration_count = 0
+
+        def __iter__(self):
+            MediaList.iteration_count += 1
+            return super(MediaList, self).__iter__()
+
+    sm = StockManager()
+    sm.media = MediaList([GenericStock(filename='a.mov', title='A')])
+    sm.export_all(targets=[AdobeStock, GettyImages], out_dir=str(tmp_path))
+    assert MediaList.iteration_count == 1
+    assert sorted(p.name for p in tmp_path.glob('*.csv')) == \
+        ['AdobeStock.csv', 'GettyImages.csv']
+
+
+def test_export_all_with_max_rows(tmp_path):
+    """testing if the export_all method splits the rows into files with
+    max_rows rows
+    """
+    from stocker.models import StockManager, GenericStock, ShutterStock
+    sm = StockManager()
+    sm.media = [
+        GenericStock(filename='%i.mov' % i, title='Clip %i' % i)
+        for i in range(5)
+    ]
+    result = sm.export_all(
+        targets=[ShutterStock], out_dir=str(tmp_path), max_rows=2
+    )
+    paths = result[ShutterStock]
+    assert [os.path.basename(p) for p in paths] == [
+        'ShutterStock_001.csv', 'ShutterStock_002.csv', 'ShutterStock_003.csv'
+    ]
+    rows = sm.generate_csv(ShutterStock).split('\n')
+    for i, path in enumerate(paths):
+        with open(path, encoding='utf-8') as f:
+            assert f.read().split('\n') == \
+                [rows[0]] + rows[1 + i * 2:3 + i * 2]
+
+
+def test_export_all_with_no_media(tmp_path):
+    """testing if the export_all method writes the header only files if there
+    is no media
+    """
+    from stocker.models import StockManager, AdobeStock
+    sm = StockManager()
+    result = sm.export_all(targets=[AdobeStock], out_dir=str(tmp_path))
+    with open(result[AdobeStock][0], encoding='utf-8') as f:
+        assert f.read() == AdobeStock.csv_header
+
+
+def test_export_all_keeps_the_earlier_files_on_error(tmp_path):
+    """testing if the export_all method keeps the files of the earlier export
+    if a media can not be converted
+    """
+    from stocker.models import StockManager, GenericStock, ShutterStock, \
+        AdobeStock
+    sm = StockManager()
+    sm.media = [
+        GenericStock(filename='%i.mov' % i, title='Clip %i' % i)
+        for i in range(3)
+    ]
+    sm.export_all(targets=[ShutterStock, AdobeStock], out_dir=str(tmp_path))
+    before = dict(
+        (p.name, p.read_text(encoding='utf-8')) for p in tmp_path.iterdir()
+    )
+
+    sm.media.append(GenericStock(filename='3.mov', category1='Unknown'))
+    sm.media.append(GenericStock(filename='4.mov', title='Clip 4'))
+    with pytest.raises(KeyError):
+        sm.export_all(
+            targets=[ShutterStock, AdobeStock], out_dir=str(tmp_path)
+        )
+    after = dict(
+        (p.name, p.read_text(encoding='utf-8')) for p in tmp_path.iterdir()
+    )
+    assert after == before
+
+
+@pytest.fixture(scope='function')
+def discovered_media(tmp_path):
+    """creates some media with sidecar files and discovers them
+    """
+    import json
+    from stocker.models import StockManager
+    for i in range(5):
+        with open(str(tmp_path / ('clip_%i.json' % i)), 'w') as f:
+            json.dump({'title': 'Clip %i' % i, 'keywords': ['k%i' % i]}, f)
+        (tmp_path / ('clip_%i.mov' % i)).write_text('')
+    sm = StockManager()
+    sm.discover_media(str(tmp_path))
+    yield sm
+
+
+def test_discovered_media_are_clean(discovered_media):
+    """testing if the discovered media are not marked as dirty
+    """
+    assert [m.is_dirty for m in discovered_media.media] == [False] * 5
+
+
+def test_changing_attributes_marks_the_media_dirty():
+    """testing if changing the fields marks the media as dirty
+    """
+    from stocker.models import GenericStock
+    gst = GenericStock()
+    assert gst.is_dirty is True
+    gst.mark_clean()
+    assert gst.is_dirty is False
+    gst.category1 = 'Nature'
+    assert gst.is_dirty is True
+
+    gst.mark_clean()
+    gst.keywords.append('sky')
+    assert gst.is_dirty is False
+    gst.mark_dirty()
+    assert gst.is_dirty is True
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_save_all_writes_only_dirty_media(discovered_media, workers):
+    """testing if the save_all method writes only the changed media
+    """
+    import json
+    sm = discovered_media
+    sm.media[1].title = 'Changed 1'
+    sm.media[3].keywords = ['changed']
+    for m in sm.media:
+        os.utime(m.sidecar_full_path, ns=(0, 0))
+
+    saved = sm.save_all(workers=workers)
+    assert saved == [sm.media[1], sm.media[3]]
+    assert sm.save_errors == []
+    assert [os.stat(m.sidecar_full_path).st_mtime_ns != 0
+            for m in sm.media] == [False, True, False, True, False]
+    assert [m.is_dirty for m in sm.media] == [False] * 5
+
+    with open(sm.media[1].sidecar_full_path) as f:
+        assert json.load(f)['title'] == 'Changed 1'
+    with open(sm.media[3].sidecar_full_path) as f:
+        assert json.load(f)['keywords'] == ['changed']
+
+    # no temporary files are left behind
+    assert sorted(os.listdir(sm.media[0].path)) == sorted(
+        ['clip_%i.json' % i for i in range(5)] +
+        ['clip_%i.mov' % i for i in range(5)]
+    )
+
+    assert sm.save_all() == []
+
+
+def test_save_all_keeps_file_permissions(discovered_media):
+    """testing if the save_all method keeps the permissions of the sidecar
+    files
+    """
+    sm = discovered_media
+    os.chmod(sm.media[0].sidecar_full_path, 0o640)
+    sm.media[0].title = 'Changed'
+    sm.save_all()
+    assert os.stat(sm.media[0].sidecar_full_path).st_mode & 0o777 == 0o640
+
+
+def test_save_all_reports_errors(discovered_media, monkeypatch):
+    """testing if the save_all method skips and reports the media that can not
+    be written and leaves their sidecar files untouched
+    """
+    import json
+    sm = discovered_media
+    sm.media[0].title = 'Changed 0'
+    sm.media[2].title = 'Changed 2'
+
+    original_open = os.open
+
+    def open_(path, *args, **kwargs):
+        if os.path.basename(path).startswith('.clip_2'):
+            # an fd that can not be written to
+            return original_open(os.devnull, os.O_RDONLY)
+        return original_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'open', open_)
+    saved = sm.save_all(workers=2)
+    assert saved == [sm.media[0]]
+    assert [p for p, e in sm.save_errors] == [sm.media[2].sidecar_full_path]
+    assert sm.media[2].is_dirty is True
+    with open(sm.media[2].sidecar_full_path) as f:
+        assert json.load(f)['title'] == 'Clip 2'
+
+
+def test_changed_fields_of_the_media():
+    """testing if the changed_fields attribute lists only the fields that are
+    set to a different value
+    """
+    from stocker.models import GenericStock
+    gst = GenericStock(title='Sky', keywords=['sky'])
+    gst.mark_clean()
+    assert gst.changed_fields == frozenset()
+
+    gst.title = 'Sky'
+    gst.keywords = ['sky']
+    assert gst.is_dirty is False
+
+    gst.title = 'Blue Sky'
+    gst.category1 = 'Nature'
+    assert gst.changed_fields == {'title', 'category1'}
+
+    gst.mark_clean()
+    gst.mark_dirty('keywords')
+    assert gst.changed_fields == {'keywords'}
+
+
+def test_changes_are_recorded_in_the_journal(discovered_media):
+    """testing if the changes of the discovered media are recorded in the
+    journal of the StockManager
+    """
+    sm = discovered_media
+    assert sm.journal == []
+
+    gst = sm.media[2]
+    gst.title = 'Clip 2'
+    assert sm.journal == []
+
+    gst.title = 'Changed 2'
+    gst.keywords = ['changed']
+    gst.keywords.append('not recorded')
+    assert len(sm.journal) == 2
+
+    change = sm.journal[0]
+    assert change.record_id == os.path.join(gst.path, 'clip_2.mov')
+    assert change.field == 'title'
+    assert change.old_value == 'Clip 2'
+    assert change.new_value == 'Changed 2'
+    assert change.timestamp > 0
+
+    change = sm.journal[1]
+    assert change.field == 'keywords'
+    assert change.old_value == ['k2']
+    assert change.new_value == ['changed']
+
+    assert sm.changed_media() == [gst]
+    sm.clear_journal()
+    assert sm.journal == []
+    assert sm.changed_media() == []
+
+
+def test_journal_uses_the_old_path_of_renamed_media(discovered_media):
+    """testing if the journal identifies a renamed media by its old filename
+    """
+    sm = discovered_media
+    gst = sm.media[0]
+    gst.filename = 'renamed.mov'
+    assert sm.journal[0].record_id == os.path.join(gst.path, 'clip_0.mov')
+    assert gst.record_id == os.path.join(gst.path, 'renamed.mov')
+
+
+def test_generate_csv_with_no_media():
+    """testing if the generate_csv method returns the header followed by a
+    line break if there are no media
+    """
+    from stocker.models import StockManager, AdobeStock
+    sm = StockManager()
+    assert sm.generate_csv(AdobeStock) == '%s\n' % AdobeStock.csv_header
+
+
+def test_generate_csv_with_changed_only(discovered_media):
+    """testing if the generate_csv method with changed_only=True generates the
+    CSV rows of the changed media only
+    """
+    import io
+    from stocker.models import ShutterStock
+    sm = discovered_media
+    sm.media[3].title = 'Changed 3'
+    sm.media[1].title = 'Changed 1'
+
+    rows = sm.generate_csv(ShutterStock, changed_only=True).split('\n')
+    assert len(rows) == 3
+    assert rows[0] == ShutterStock.csv_header
+    assert 'Changed 1' in rows[1]
+    assert 'Changed 3' in rows[2]
+
+    f = io.StringIO()
+    assert sm.write_csv(ShutterStock, f, changed_only=True) == 2
+
+    sm.clear_journal()
+    assert sm.generate_csv(ShutterStock, changed_only=True) == \
+        ShutterStock.csv_header + '\n'
+
+
+def test_journal_updates_the_search_index(discovered_media):
+    """testing if the changes recorded in the journal update the search index
+    """
+    sm = discovered_media
+    assert sm.search(all_of=['k1']) == [sm.media[1]]
+    sm.media[1].keywords = ['tree']
+    assert sm.search(all_of=['k1']) == []
+    assert sm.search(all_of=['tree']) == [sm.media[1]]
+
+
+def test_generate_csv_with_manifest(discovered_media):
+    """testing if the generate_csv method with a manifest generates the rows
+    of the new and changed media only
+    """
+    from stocker.manifest import ExportManifest
+    from stocker.models import ShutterStock
+    sm = discovered_media
+    manifest = ExportManifest()
+    rows = sm.generate_csv(ShutterStock, manifest=manifest).split('\n')
+    assert len(rows) == 6
+    assert len(manifest) == 5
+
+    assert sm.generate_csv(ShutterStock, manifest=manifest) == \
+        ShutterStock.csv_header + '\n'
+
+    sm.media[2].title = 'Changed 2'
+    rows = sm.generate_csv(ShutterStock, manifest=manifest).split('\n')
+    assert len(rows) == 2
+    assert 'Changed 2' in rows[1]
+
+
+def test_export_all_with_delta(discovered_media, tmp_path):
+    """testing if the export_all method with delta=True writes only the new
+    and changed media and keeps the manifest files
+    """
+    from stocker.models import AdobeStock, GettyImages, ShutterStock
+    sm = discovered_media
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+
+    def row_counts():
+        paths = sm.export_all(out_dir=str(out_dir), delta=True)
+        counts = {}
+        for target_class, target_paths in paths.items():
+            with open(target_paths[0]) as f:
+                counts[target_class] = len(f.read().split('\n')) - 1
+        return counts
+
+    assert row_counts() == {ShutterStock: 5, AdobeStock: 5, GettyImages: 5}
+    assert sorted(os.listdir(str(out_dir))) == [
+        '.AdobeStock.files', '.GettyImages.files', '.ShutterStock.files',
+        'AdobeStock.csv', 'AdobeStock.manifest.json',
+        'GettyImages.csv', 'GettyImages.manifest.json',
+        'ShutterStock.csv', 'ShutterStock.manifest.json',
+    ]
+    assert row_counts() == {ShutterStock: 0, AdobeStock: 0, GettyImages: 0}
+
+    sm.media[0].category1 = 'Nature'
+    sm.media[4].title = 'Changed 4'
+    assert row_counts() == {ShutterStock: 2, AdobeStock: 2, GettyImages: 2}
+    assert row_counts() == {ShutterStock: 0, AdobeStock: 0, GettyImages: 0}
+
+
+def test_export_all_with_delta_prunes_the_removed_media(discovered_media,
+                                                        tmp_path):
+    """testing if the export_all method with delta=True removes the media
+    that are removed since the last export from the manifest files
+    """
+    from stocker.manifest import ExportManifest
+    from stocker.models import ShutterStock
+    sm = discovered_media
+    sm.export_all(targets=[ShutterStock], out_dir=str(tmp_path), delta=True)
+    manifest_path = str(tmp_path / 'ShutterStock.manifest.json')
+    assert len(ExportManifest.load(manifest_path)) == 5
+
+    removed = sm.media.pop(1)
+    sm.export_all(targets=[ShutterStock], out_dir=str(tmp_path), delta=True)
+    manifest = ExportManifest.load(manifest_path)
+    assert len(manifest) == 4
+    assert removed.record_id not in manifest
+    assert sm.media[0].record_id in manifest
+
+
+def test_stats_are_off_by_default():
+    """testing if the StockManager uses the null stats object by default
+    """
+    from stocker.models import StockManager
+    from stocker.stats import null_stats
+    assert StockManager().stats is null_stats
+
+
+def test_stats_of_discover_media_and_generate_csv(discovered_media):
+    """testing if discover_media and generate_csv record their phases and
+    counters to the stats
+    """
+    import io
+    from stocker.models import StockManager, AdobeStock
+    from stocker.stats import Stats
+    path = discovered_media.media[0].path
+    with open(os.path.join(path, 'clip_2.json'), 'w') as f:
+        f.write('{invalid')
+
+    sm = StockManager(stats=Stats(), index_search=True)
+    sm.discover_media(path)
+    assert list(sm.stats.phases) == [
+        'discover_media', 'listing', 'parsing', 'media_creation',
+        'search_indexing'
+    ]
+    assert sm.stats.counters == {
+        'folders_listed': 1, 'files_listed': 10, 'sidecars_parsed': 5,
+        'media_discovered': 4, 'errors': 1,
+    }
+
+    sm.stats.reset()
+    csv_content = sm.generate_csv(AdobeStock)
+    assert list(sm.stats.phases) == [
+        'generate_csv', 'conversion', 'formatting'
+    ]
+    assert sm.stats.counters['rows_written'] == 4
+    assert sm.stats.counters['bytes_written'] == \
+        len(csv_content.encode('utf-8')) - len(AdobeStock.csv_header)
+
+    sm.stats.reset()
+    sm.write_csv(AdobeStock, io.StringIO())
+    assert sm.stats.counters['rows_written'] == 4
+
+    sm.stats.reset()
+    sm.export_all(out_dir=path, targets=[AdobeStock])
+    assert list(sm.stats.phases) == ['export_all']
+    assert sm.stats.counters['rows_written'] == 4
+    assert sm.stats.counters['files_written'] == 1
+    assert sm.stats.counters['bytes_written'] == \
+        os.path.getsize(os.path.join(path, 'AdobeStock.csv'))
+
+
+def test_discover_media_lazy_does_not_read_the_sidecar_files(
+        discovered_media, monkeypatch):
+    """testing if discover_media with lazy=True creates the media without
+    reading the sidecar files
+    """
+    from stocker import models
+    from stocker.models import StockManager
+    path = discovered_media.media[0].path
+
+    def read_sidecar_safe(sidecar_path):
+        raise AssertionError('read %s' % sidecar_path)
+
+    monkeypatch.setattr(models, '_read_sidecar_safe', read_sidecar_safe)
+    sm = StockManager()
+    sm.discover_media(path, lazy=True)
+    assert [m.filename for m in sm.media] == \
+        ['clip_%i.mov' % i for i in range(5)]
+    assert [m.path for m in sm.media] == [path] * 5
+    assert [m.is_loaded for m in sm.media] == [False] * 5
+    assert [m.is_dirty for m in sm.media] == [False] * 5
+
+
+def test_lazy_media_are_loaded_on_first_access(discovered_media):
+    """testing if the fields of the lazy media are loaded on first access
+    together with the next media up to prefetch
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(discovered_media.media[0].path, lazy=True, prefetch=2)
+    assert sm.media[1].title == 'Clip 1'
+    assert [m.is_loaded for m in sm.media] == \
+        [False, True, True, False, False]
+    assert sm.media[2].keywords == ['k2']
+    assert sm.media[2].description == discovered_media.media[2].description
+    assert sm.media[1].is_dirty is False
+    assert sm.journal == []
+
+    assert sm.load_media() == 3
+    assert [m.title for m in sm.media] == ['Clip %i' % i for i in range(5)]
+    assert sm.load_media() == 0
+
+
+def test_changing_a_lazy_media_loads_it_first(discovered_media):
+    """testing if setting a field of a lazy media loads it and records the
+    change with the old value
+    """
+    from stocker.models import StockManager
+    sm = StockManager()
+    sm.discover_media(discovered_media.media[0].path, lazy=True, prefetch=1)
+    sm.media[3].title = 'Changed 3'
+    assert sm.media[3].is_loaded is True
+    assert sm.media[3].keywords == ['k3']
+    assert sm.media[3].changed_fields == {'title'}
+    assert [(c.field, c.old_value, c.new_value) for c in sm.journal] == \
+        [('title', 'Clip 3', 'Changed 3')]
+    assert sm.save_all() == [sm.media[3]]
+    assert [m.is_loaded for m in sm.media] == \
+        [False, False, False, True, False]
+
+
+def test_lazy_media_with_invalid_sidecar_file(discovered_media):
+    """testing if a lazy media with an invalid sidecar file gets the default
+    values and the error is stored in discovery_errors
+    """
+    from stocker.models import StockManager
+    path = discovered_media.media[0].path
+    with open(os.path.join(path, 'clip_1.json'), 'w') as f:
+        f.write('{invalid')
+    sm = StockManager(intern_keywords=True)
+    sm.discover_media(path, lazy=True, workers=2)
+    assert sm.discovery_errors == []
+    assert sm.media[1].title is None
+    assert list(sm.media[1].keywords) == []
+    assert list(sm.media[2].keywords) == ['k2']
+    assert sm.media[2].keywords.vocabulary is sm.vocabulary
+    assert [p for p, e in sm.discovery_errors] == \
+        [os.path.join(path, 'clip_1.json')]
+
+    # the media that can not be loaded are removed like the eager discovery
+    failed = sm.media[1]
+    sm.load_media()
+    assert failed not in sm.media
+    assert [m.filename for m in sm.media] == \
+        ['clip_0.mov', 'clip_2.mov', 'clip_3.mov', 'clip_4.mov']
+    assert len(sm.discovery_errors) == 1
+
+
+def test_lazy_discovery_does_not_export_the_invalid_media(discovered_media):
+    """testing if the lazy media whose sidecar files can not be read are not
+    exported and are removed from the media list and the search index, like
+    the eager discovery skips them
+    """
+    from stocker.models import StockManager, AdobeStock
+    path = discovered_media.media[0].path
+    with open(os.path.join(path, 'clip_1.json'), 'w') as f:
+        f.write('{invalid')
+    eager = StockManager()
+    eager.discover_media(path)
+
+    sm = StockManager()
+    sm.discover_media(path, lazy=True, prefetch=2)
+    # loads clip_0 and the failing clip_1 while the media list is iterated
+    assert sm.media[0].title == 'Clip 0'
+    assert len(sm.media) == 5
+    assert sm.generate_csv(AdobeStock) == eager.generate_csv(AdobeStock)
+    assert [m.filename for m in sm.media] == \
+        [m.filename for m in eager.media]
+    assert [p for p, e in sm.discovery_errors] == \
+        [p for p, e in eager.discovery_errors]
+    # the positions of the lazy media are updated for the prefetch
+    sm.discover_media(path, lazy=True, prefetch=2)
+    assert sm.media[0].title == 'Clip 0'
+    assert sm.load_media(sm.media[:1]) == 0
+    assert [m.is_loaded for m in sm.media] == [True, False, False, False]
+    assert sm.media[2].title == 'Clip 3'
+    assert [m.is_loaded for m in sm.media] == [True, False, True, True]
+
+    indexed = StockManager(index_search=True)
+    indexed.discover_media(path, lazy=True)
+    assert indexed.search(all_of=['k1']) == []
+    assert [m.filename for m in indexed.media] == \
+        [m.filename for m in eager.media]
+
+
+def test_lazy_discovery_generates_the_same_csv(discovered_media):
+    """testing if the lazy discovered media generate the same CSV content
+    """
+    from stocker.models import StockManager, AdobeStock
+    sm = StockManager(index_search=True)
+    sm.discover_media(discovered_media.media[0].path, lazy=True)
+    assert sm.generate_csv(AdobeStock) == \
+        discovered_media.generate_csv(AdobeStock)
+    assert sm.search(all_of=['k4']) == [sm.media[4]]
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+def test_vocabulary_interns_keywords():
+    """testing if the vocabulary stores each keyword only once
+    """
+    from stocker.vocabulary import KeywordVocabulary
+    vocabulary = KeywordVocabulary()
+    ids = vocabulary.encode(['sky', 'sea', 'sky'])
+    assert list(ids) == [0, 1, 0]
+    assert ids.typecode == 'I'
+    assert len(vocabulary) == 2
+    assert vocabulary.decode(ids) == ['sky', 'sea', 'sky']
+    assert vocabulary.get('sea') == 1
+    assert vocabulary.get('sun') is None
+
+
+def test_keyword_list_behaves_like_a_list():
+    """testing if the KeywordList behaves like a list of strings
+    """
+    from stocker.vocabulary import KeywordVocabulary, KeywordList
+    vocabulary = KeywordVocabulary()
+    keywords = KeywordList(vocabulary, ['sky', 'sea'])
+    assert keywords == ['sky', 'sea']
+    assert ['sky', 'sea'] == keywords
+    assert keywords != ['sky']
+    assert len(keywords) == 2
+    assert keywords[1] == 'sea'
+    assert keywords[-1] == 'sea'
+    assert keywords[:1] == ['sky']
+    assert 'sky' in keywords
+    assert 'sun' not in keywords
+    assert ','.join(keywords) == 'sky,sea'
+
+    keywords.append('sun')
+    keywords[0] = 'cloud'
+    keywords.extend(['sea', 'boat'])
+    del keywords[1]
+    assert keywords == ['cloud', 'sun', 'sea', 'boat']
+    assert list(keywords.ids) == [3, 2, 1, 4]
+    assert repr(keywords) == "KeywordList(['cloud', 'sun', 'sea', 'boat'])"
+
+    other = KeywordList(vocabulary, keywords)
+    assert other == keywords
+    other.append('sky')
+    assert other != keywords
+
+
+def test_discover_media_with_intern_keywords():
+    """testing if the discover_media method stores the keywords in the shared
+    vocabulary if intern_keywords is True
+    """
+    import os
+    here = os.path.abspath(os.path.dirname(__file__))
+    from stocker.models import StockManager
+    from stocker.vocabulary import KeywordList
+    sm = StockManager(intern_keywords=True)
+    sm.discover_media(os.path.join(here, 'test_data'))
+
+    for m in sm.media:
+        assert isinstance(m.keywords, KeywordList)
+        assert m.keywords.vocabulary is sm.vocabulary
+    assert len(sm.vocabulary) == 7
+    assert sm.media[2].keywords == ['keyword 5', 'keyword 6', 'keyword 7']
+
+
+def test_generate_csv_with_intern_keywords():
+    """testing if the generate_csv method expands the interned keywords
+    """
+    import os
+    here = os.path.abspath(os.path.dirname(__file__))
+    from stocker.models import StockManager, ShutterStock, AdobeStock, \
+        GettyImages
+    sm1 = StockManager()
+    sm1.discover_media(os.path.join(here, 'test_data'))
+    sm2 = StockManager(intern_keywords=True)
+    sm2.discover_media(os.path.join(here, 'test_data'))
+    for target_class in [ShutterStock, AdobeStock, GettyImages]:
+        assert sm1.generate_csv(target_class) == \
+            sm2.generate_csv(target_class)
+
+
+def test_compact_keywords_and_keyword_queries():
+    """testing the compact_keywords, keyword_frequencies and find_keyword
+    methods
+    """
+    from stocker.models import StockManager, GenericStock
+    from stocker.vocabulary import KeywordList
+    sm = StockManager()
+    sm.media = [
+        GenericStock(filename='a.mov', keywords=['sky', 'sea']),
+        GenericStock(filename='b.mov', keywords=['sky']),
+        GenericStock(filename='c.mov', keywords=['boat', 'sky']),
+    ]
+    assert sm.keyword_frequencies() == {'sky': 3, 'sea': 1, 'boat': 1}
+    assert [m.filename for m in sm.find_keyword('sea')] == ['a.mov']
+
+    sm.compact_keywords()
+    assert isinstance(sm.media[0].keywords, KeywordList)
+    assert len(sm.vocabulary) == 3
+    assert sm.keyword_frequencies() == {'sky': 3, 'sea': 1, 'boat': 1}
+    assert sm.keyword_frequencies().most_common(1) == [('sky', 3)]
+    assert [m.filename for m in sm.find_keyword('sky')] == \
+        ['a.mov', 'b.mov', 'c.mov']
+    assert sm.find_keyword('sun') == []
+
+
+def test_to_sidecar_file_with_keyword_list(media_with_sidecar):
+    """testing if the to_sidecar_file method writes the KeywordList as a JSON
+    list
+    """
+    import json
+    import os
+    media_file_full_path, sidecar_file_full_path = media_with_sidecar
+    path, filename = os.path.split(media_file_full_path)
+
+    from stocker.models import StockBase
+    from stocker.vocabulary import KeywordVocabulary, KeywordList
+    sb = StockBase(
+        path=path, filename=filename, title='Title',
+        keywords=KeywordList(KeywordVocabulary(), ['sky', 'sea'])
+    )
+    sb.to_sidecar_file()
+    with open(sidecar_file_full_path) as f:
+        assert json.load(f) == {'title': 'Title', 'keywords': ['sky', 'sea']}
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# Stocker a data conversion tool for stock image/video sites.
+# Copyright (C) 2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stocker.
+#
+# Stocker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stocker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stocker.  If not, see <http://www.gnu.org/licenses/>
+
+
+import json
+import os
+import time
+
+import pytest
+
+
+def write_sidecar(path, title, keywords=None):
+    """writes a sidecar file
+    """
+    with open(path, 'w') as f:
+        json.dump({'title': title, 'keywords': keywords or []}, f)
+
+
+@pytest.fixture(scope='function')
+def watched_folder(tmp_path):
+    """creates a folder with two media and a StockManager that discovered
+    them
+    """
+    from stocker.models import StockManager
+    for i in range(2):
+        write_sidecar(str(tmp_path / ('clip_%i.json' % i)), 'Clip %i' % i,
+                      ['k%i' % i])
+        (tmp_path / ('clip_%i.mov' % i)).write_text('')
+    sm = StockManager()
+    sm.discover_media(str(tmp_path))
+    yield sm, str(tmp_path)
+
+
+def test_invalid_backend(watched_folder):
+    """testing if a ValueError will be raised for an unknown backend
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    with pytest.raises(ValueError) as cm:
+        MediaWatcher(sm, path, backend='fsevents')
+    assert str(cm.value) == \
+        "MediaWatcher.backend should be one of polling, watchdog, " \
+        "not 'fsevents'"
+
+
+def test_media_is_added_when_both_files_exist(watched_folder):
+    """testing if a new media is added only after both the media and the
+    sidecar file are created, whichever comes first
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+
+    sidecar_path = os.path.join(path, 'clip_2.json')
+    write_sidecar(sidecar_path, 'Clip 2')
+    watcher.notify(sidecar_path)
+    assert watcher.process() == []
+    assert len(sm.media) == 2
+
+    media_path = os.path.join(path, 'clip_2.mp4')
+    with open(media_path, 'w'):
+        pass
+    watcher.notify(media_path)
+    events = watcher.process()
+    assert [(e.kind, e.stock.title) for e in events] == [('added', 'Clip 2')]
+    assert sm.media[-1] is events[0].stock
+    assert sm.media[-1].filename == 'clip_2.mp4'
+    assert sm.media[-1]._manager is sm
+    assert sm.media[-1].is_dirty is False
+
+
+def test_events_are_debounced(watched_folder):
+    """testing if the events are applied only after the debounce time
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=10, backend='polling')
+    sidecar_path = os.path.join(path, 'clip_0.json')
+    for i in range(5):
+        write_sidecar(sidecar_path, 'Changed %i' % i)
+        watcher.notify(sidecar_path)
+    assert watcher.pending == 1
+    assert watcher.process() == []
+    assert sm.media[0].title == 'Clip 0'
+
+    events = watcher.process(now=time.monotonic() + 10)
+    assert [(e.kind, e.stock) for e in events] == [('modified', sm.media[0])]
+    assert sm.media[0].title == 'Changed 4'
+    assert watcher.pending == 0
+
+
+def test_modified_sidecar_updates_the_media_and_indexes(watched_folder):
+    """testing if changing a sidecar file updates the media and the search
+    index without recording the change in the journal
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    assert sm.search(all_of=['k1']) == [sm.media[1]]
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+
+    sidecar_path = os.path.join(path, 'clip_1.json')
+    write_sidecar(sidecar_path, 'Clip 1', ['tree'])
+    watcher.notify(sidecar_path)
+    assert [e.kind for e in watcher.process()] == ['modified']
+    assert sm.media[1].keywords == ['tree']
+    assert sm.media[1].is_dirty is False
+    assert sm.journal == []
+    assert sm.search(all_of=['k1']) == []
+    assert sm.search(all_of=['tree']) == [sm.media[1]]
+
+    # writing the same content is not a change
+    sm.media[1].to_sidecar_file()
+    watcher.notify(sidecar_path)
+    assert watcher.process() == []
+
+
+def test_modified_sidecar_resets_the_deleted_fields(watched_folder):
+    """testing if the fields that are deleted from a sidecar file get their
+    default values when the media is reloaded
+    """
+    from stocker.models import GenericStock
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    sidecar_path = os.path.join(path, 'clip_1.json')
+    with open(sidecar_path, 'w') as f:
+        json.dump({'title': 'Clip 1', 'category1': 'Nature',
+                   'description': 'Description'}, f)
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+    watcher.notify(sidecar_path)
+    assert [e.kind for e in watcher.process()] == ['modified']
+    stock = sm.media[1]
+    assert stock.category1 == 'Nature'
+    assert stock.keywords == []
+
+    write_sidecar(sidecar_path, 'Clip 1')
+    watcher.notify(sidecar_path)
+    assert [(e.kind, e.stock) for e in watcher.process()] == \
+        [('modified', stock)]
+    default = GenericStock()
+    assert stock.category1 == default.category1
+    assert stock.description == default.description
+    assert stock.path == path
+    assert stock.is_dirty is False
+    assert sm.journal == []
+
+
+def test_deleted_file_removes_the_media(watched_folder):
+    """testing if deleting the media or the sidecar file removes the media
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    sm.build_search_index()
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+    stock = sm.media[0]
+
+    media_path = os.path.join(path, 'clip_0.mov')
+    os.remove(media_path)
+    watcher.notify(media_path)
+    assert [(e.kind, e.stock) for e in watcher.process()] == \
+        [('removed', stock)]
+    assert stock not in sm.media
+    assert stock not in sm.search_index
+    assert sm.search(all_of=['k0']) == []
+
+
+def test_deleted_files_are_removed_together(watched_folder, monkeypatch):
+    """testing if the media that are deleted in the same batch are removed
+    from the StockManager together and the order of the others is kept
+    """
+    from stocker.models import StockManager
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    for i in range(2, 5):
+        write_sidecar(os.path.join(path, 'clip_%i.json' % i), 'Clip %i' % i)
+        with open(os.path.join(path, 'clip_%i.mov' % i), 'w'):
+            pass
+    sm.discover_media(path)
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+    removed = [sm.media[1], sm.media[3]]
+    calls = []
+    remove_media = StockManager.remove_media
+
+    def remove_media_spy(self, *stocks):
+        calls.append(stocks)
+        return remove_media(self, *stocks)
+
+    monkeypatch.setattr(StockManager, 'remove_media', remove_media_spy)
+    for i in [1, 3]:
+        media_path = os.path.join(path, 'clip_%i.mov' % i)
+        os.remove(media_path)
+        watcher.notify(media_path)
+    assert [e.stock for e in watcher.process()] == removed
+    assert calls == [tuple(removed)]
+    assert [m.filename for m in sm.media] == \
+        ['clip_0.mov', 'clip_2.mov', 'clip_4.mov']
+
+
+def test_invalid_sidecar_is_reported(watched_folder):
+    """testing if a sidecar file that can not be parsed is stored in the
+    discovery_errors
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling')
+    sidecar_path = os.path.join(path, 'clip_0.json')
+    with open(sidecar_path, 'w') as f:
+        f.write('{invalid')
+    watcher.notify(sidecar_path)
+    assert watcher.process() == []
+    assert sm.discovery_errors[0][0] == sidecar_path
+    assert sm.media[0].title == 'Clip 0'
+
+
+def test_excluded_and_unrelated_files_are_ignored(watched_folder):
+    """testing if the excluded files, the files that are not media or
+    sidecar files and the sub folders in non recursive mode are ignored
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling',
+                           exclude=['*_proxy*'])
+    os.mkdir(os.path.join(path, 'sub'))
+    for filename in ['clip_proxy.json', 'clip_proxy.mov', 'notes.txt',
+                     'sub/clip_3.json', 'sub/clip_3.mov']:
+        with open(os.path.join(path, filename), 'w') as f:
+            f.write('{}')
+        watcher.notify(os.path.join(path, filename))
+    watcher.notify(os.path.join(path, 'sub'), is_directory=True)
+    assert watcher.pending == 0
+    assert watcher.process() == []
+
+
+def test_new_folder_is_added_in_recursive_mode(watched_folder):
+    """testing if the media in a new or moved sub folder are added and
+    removed with the folder
+    """
+    import shutil
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling',
+                           recursive=True)
+    folder = os.path.join(path, 'shoot', 'day1')
+    os.makedirs(folder)
+    for i in range(2):
+        write_sidecar(os.path.join(folder, 'take_%i.json' % i), 'Take %i' % i)
+        with open(os.path.join(folder, 'take_%i.mov' % i), 'w'):
+            pass
+    watcher.notify(os.path.join(path, 'shoot'), is_directory=True)
+    events = watcher.process()
+    assert [(e.kind, e.stock.title) for e in events] == \
+        [('added', 'Take 0'), ('added', 'Take 1')]
+    assert events[0].stock.path == folder
+
+    shutil.rmtree(os.path.join(path, 'shoot'))
+    watcher.notify(os.path.join(path, 'shoot'), is_directory=True)
+    assert [e.kind for e in watcher.process()] == ['removed', 'removed']
+    assert len(sm.media) == 2
+
+
+def test_folder_scan_skips_excluded_folders(watched_folder, monkeypatch):
+    """testing if the excluded sub folders and the ones deeper than
+    max_depth are not listed when a folder is rescanned
+    """
+    from stocker.watch import MediaWatcher
+    sm, path = watched_folder
+    watcher = MediaWatcher(sm, path, debounce=0, backend='polling',
+                           recursive=True, exclude=['shoot/proxies'],
+                           max_depth=2)
+    # day1/cam1 is deeper than max_depth
+    for folder in ['day1', 'day1/cam1', 'proxies']:
+        folder = os.path.join(path, 'shoot', folder)
+        os.makedirs(folder)
+        write_sidecar(os.path.join(folder, 'take.json'), folder)
+        with open(os.path.join(folder, 'take.mov'), 'w'):
+            pass
+
+    listed_folders = []
+    original_scandir = os.scandir
+
+    def scandir(folder):
+        listed_folders.append(os.path.relpath(folder, path))
+        return original_scandir(folder)
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+    watcher.notify(os.path.join(path, 'shoot'), is_directory=True)
+    events = watcher.process()
+    assert sorted(listed_folders) == ['shoot', os.path.join('shoot', 'day1')]
+    assert [e.stock.path for e in events] == \
+        [os.path.join(path, 'shoot', 'day1')]
+
+
+def wait_for_events(watcher, count, timeout=5):
+    """processes the events until the given number of events are applied
+    """
+    events = []
+    deadline = time.monotonic() + timeout
+    while len(events) < count and time.monotonic() < deadline:
+        events.extend(watcher.process())
+        time.sleep(0.02)
+    return events
+
+
+@pytest.mark.parametrize('backend', ['polling', 'watchdog'])
+def test_watch_collects_the_events_in_background(watched_folder, backend):
+    """testing if the watch method starts a watcher that collects the file
+    system events in the background
+    """
+    if backend == 'watchdog':
+        pytest.importorskip('watchdog')
+    sm, path = watched_folder
+    with sm.watch(path, debounce=0.05, backend=backend,
+                  poll_interval=0.05) as watcher:
+        # let the polling backend take its first snapshot
+        time.sleep(0.1)
+        write_sidecar(os.path.join(path, 'clip_2.json'), 'Clip 2')
+        with open(os.path.join(path, 'clip_2.mov'), 'w'):
+            pass
+        os.remove(os.path.join(path, 'clip_0.json'))
+        events = wait_for_events(watcher, 2)
+
+    assert sorted((e.kind, e.stock.title) for e in events) == \
+        [('added', 'Clip 2'), ('removed', 'Clip 0')]
+    assert [m.title for m in sm.media] == ['Clip 1', 'Clip 2']